@@ -0,0 +1,115 @@
+# _common.py
+"""
+Общие помощники для бенчмарков: запуск сервера в отдельном процессе,
+простой клиент протокола и статистика задержек.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SERVER_DIR = os.path.join(ROOT_DIR, 'server')
+
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+def free_port():
+    """Возвращает свободный TCP-порт на localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, host="127.0.0.1", timeout=15.0):
+    """Ждет, пока сервер начнет принимать соединения."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Сервер не поднялся на порту {port}")
+
+class ServerProcess:
+    """Сервер, запущенный через main.py в отдельном процессе и во временном каталоге."""
+
+    def __init__(self, *args, port=None):
+        self.port = port or free_port()
+        self.args = list(args)
+        self.workdir = None
+        self.proc = None
+
+    def __enter__(self):
+        self.workdir = tempfile.TemporaryDirectory(prefix="fitness-bench-")
+        cmd = [sys.executable, os.path.join(SERVER_DIR, "main.py"),
+               "--host", "127.0.0.1", "--port", str(self.port)] + self.args
+        env = dict(os.environ, PYTHONPATH=SERVER_DIR)
+        self.proc = subprocess.Popen(cmd, cwd=self.workdir.name, env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_port(self.port)
+        return self
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.workdir.cleanup()
+
+    def status(self):
+        """Читает VmRSS и число потоков процесса сервера (Linux)."""
+        result = {}
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        result["rss_kb"] = int(line.split()[1])
+                    elif line.startswith("Threads:"):
+                        result["threads"] = int(line.split()[1])
+        except OSError:
+            pass
+        return result
+
+class LineClient:
+    """Блокирующий клиент протокола JSON-строк: один запрос - один ответ."""
+
+    def __init__(self, port, host="127.0.0.1", timeout=30):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.buffer = b""
+
+    def request(self, data):
+        self.sock.sendall(json.dumps(data).encode("utf-8") + b"\n")
+        while b"\n" not in self.buffer:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Сервер закрыл соединение")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def close(self):
+        self.sock.close()
+
+def percentile(sorted_values, pct):
+    """Перцентиль по уже отсортированному списку."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def latency_summary(samples):
+    """Сводка задержек в миллисекундах."""
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p90_ms": round(percentile(values, 90) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round((values[-1] if values else 0.0) * 1000, 3),
+    }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Сравнение движков сервера: threaded (поток на соединение) и asyncio.
+
+Для каждого движка сервер запускается в отдельном процессе, затем:
+  1. открывается N простаивающих соединений и снимаются RSS и число потоков сервера;
+  2. при открытых соединениях C клиентских потоков гоняют get_exercises,
+     считается пропускная способность и перцентили задержек.
+
+Пример:
+    python benchmarks/bench_engines.py --connections 10000 --clients 32 --requests 200
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+
+from _common import ServerProcess, LineClient, latency_summary
+from connections import raise_nofile_limit
+
+EXERCISES_REQUEST = {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"}
+
+def open_idle_connections(port, count):
+    """Открывает count соединений и ничего по ним не отправляет."""
+    socks = []
+    for _ in range(count):
+        try:
+            s = socket.create_connection(("127.0.0.1", port), timeout=10)
+        except OSError as e:
+            print(f"  остановились на {len(socks)} соединениях: {e}")
+            break
+        socks.append(s)
+    return socks
+
+def run_load(port, clients, requests):
+    """Запускает clients потоков по requests запросов, возвращает (rps, задержки, ошибки)."""
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        try:
+            client = LineClient(port)
+        except OSError:
+            with lock:
+                errors[0] += requests
+            return
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                try:
+                    response = client.request(EXERCISES_REQUEST)
+                except (OSError, ValueError):
+                    with lock:
+                        errors[0] += 1
+                    break
+                local.append(time.perf_counter() - started)
+                if not response.get("success"):
+                    with lock:
+                        errors[0] += 1
+        finally:
+            client.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return len(samples) / elapsed if elapsed else 0.0, samples, errors[0]
+
+def bench_engine(engine, args):
+    with ServerProcess("--engine", engine, "--executor-workers", str(args.executor_workers),
+                       "--max-connections", "0", "--read-rate", "0", "--write-rate", "0") as server:
+        baseline = server.status()
+        socks = open_idle_connections(server.port, args.connections)
+        time.sleep(1.0)  # даем серверу принять все соединения
+        loaded = server.status()
+
+        rps, samples, errors = run_load(server.port, args.clients, args.requests)
+
+        for s in socks:
+            s.close()
+
+    return {
+        "engine": engine,
+        "idle_connections": len(socks),
+        "rss_kb_before": baseline.get("rss_kb"),
+        "rss_kb_idle": loaded.get("rss_kb"),
+        "threads_idle": loaded.get("threads"),
+        "rps": round(rps, 1),
+        "errors": errors,
+        "latency": latency_summary(samples),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", default="threaded,asyncio")
+    parser.add_argument("--connections", type=int, default=2000, help="Простаивающих соединений")
+    parser.add_argument("--clients", type=int, default=32, help="Активных клиентских потоков")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на клиента")
+    parser.add_argument("--executor-workers", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    raise_nofile_limit()
+
+    results = [bench_engine(engine, args) for engine in args.engines.split(",")]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'engine':<10} {'idle':>7} {'RSS idle MB':>12} {'threads':>8} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        rss = (r["rss_kb_idle"] or 0) / 1024
+        print(f"{r['engine']:<10} {r['idle_connections']:>7} {rss:>12.1f} {r['threads_idle'] or 0:>8} "
+              f"{r['rps']:>9} {r['latency']['p50_ms']:>8} {r['latency']['p99_ms']:>8} {r['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
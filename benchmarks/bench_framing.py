@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк разбора кадров: старый способ (recv(1024) -> decode -> str += -> split)
+против FrameDecoder на bytearray.
+
+Сценарии:
+  * pipelined - много небольших кадров (история с кириллицей) подряд;
+  * large     - один большой кадр, пришедший кусками по 1024 байта.
+Каждый сценарий прогоняется в двух кодировках: ascii (json.dumps по умолчанию,
+кириллица экранирована как \\uXXXX) и utf8 (ensure_ascii=False). Для старого способа
+считается, сколько кусков не декодируются из-за разрезанного UTF-8 символа и
+сколько кадров из-за этого испорчено.
+
+Пример:
+    python benchmarks/bench_framing.py --frames 5000 --large-kb 2048
+"""
+import argparse
+import json
+import time
+
+from _common import SERVER_DIR  # noqa: F401 - добавляет server/ в sys.path
+from framing import FrameDecoder
+from models import EXERCISE_CATALOG
+
+def history_payload(records):
+    exercises = EXERCISE_CATALOG["Средний"]["Набор мышц"]["Зал"]
+    history = [{"id": i, "workout_name": f"Тренировка {i}", "exercises": exercises,
+                "duration": 45, "completed_at": "2024-01-01 10:00"} for i in range(records)]
+    return {"action": "workout_history", "success": True, "history": history}
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def legacy_parse(pieces):
+    """Копия старого цикла из handle_client/reader_loop."""
+    buffer = ""
+    frames = 0
+    decode_errors = 0  # испорченные куски и кадры
+    for data in pieces:
+        try:
+            buffer += data.decode("utf-8")
+        except UnicodeDecodeError:
+            decode_errors += 1
+            continue
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if line:
+                try:
+                    json.loads(line)
+                    frames += 1
+                except ValueError:
+                    decode_errors += 1
+    return frames, decode_errors
+
+def decoder_parse(pieces):
+    decoder = FrameDecoder(max_frame_size=64 * 1024 * 1024)
+    frames = 0
+    for data in pieces:
+        decoder.feed(data)
+        for frame in decoder.frames():
+            json.loads(frame)
+            frames += 1
+    return frames, 0
+
+def timed(fn, pieces, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(pieces)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=5000, help="Кадров в сценарии pipelined")
+    parser.add_argument("--large-kb", type=int, default=2048, help="Размер большого кадра, КБ")
+    parser.add_argument("--chunk", type=int, default=1024, help="Размер одного recv()")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<16} {'parser':<13} {'MB/s':>9} {'ms':>9} {'frames':>7} {'corrupted':>10}")
+    for encoding in ("ascii", "utf8"):
+        ensure_ascii = encoding == "ascii"
+        small = (json.dumps(history_payload(1), ensure_ascii=ensure_ascii) + "\n").encode("utf-8")
+        pipelined = chunks(small * args.frames, args.chunk)
+
+        record_size = len(small)
+        large_payload = history_payload(max(1, args.large_kb * 1024 // record_size))
+        large = chunks((json.dumps(large_payload, ensure_ascii=ensure_ascii) + "\n").encode("utf-8"), args.chunk)
+
+        for name, pieces in ((f"pipelined-{encoding}", pipelined), (f"large-{encoding}", large)):
+            total_mb = sum(len(p) for p in pieces) / (1024 * 1024)
+            for label, fn in (("legacy str", legacy_parse), ("FrameDecoder", decoder_parse)):
+                elapsed, (frames, errors) = timed(fn, pieces, args.repeat)
+                print(f"{name:<16} {label:<13} {total_mb / elapsed:>9.1f} {elapsed * 1000:>9.1f} "
+                      f"{frames:>7} {errors:>10}")
+
+if __name__ == "__main__":
+    main()
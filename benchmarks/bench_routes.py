@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки обработчиков routes.handle_* и методов DatabaseManager в одном
+процессе, без сети.
+
+Для каждого размера из --sizes создается временная SQLite база: --users фоновых
+пользователей по --rows-per-user записей истории и прогресса и один измеряемый
+пользователь с size записями истории и прогресса и size/10 сохраненными планами.
+Каждый вызов повторяется, пока не наберется --min-time секунд (не меньше
+--min-runs раз); в результат идут min/медиана/p90 в миллисекундах. Случаи
+чтения измеряются раньше случаев записи, на базе ровно в size записей.
+
+Результат можно сохранить (--save) и сравнить с сохраненным ранее (--baseline):
+случаи, где медиана выросла больше чем на --threshold (и больше чем на
+--min-delta-ms), помечаются как регрессии, и скрипт завершается с кодом 1.
+
+Примеры:
+    python benchmarks/bench_routes.py --sizes 10,100,1000 --save baseline.json
+    python benchmarks/bench_routes.py --sizes 10,100,1000 --baseline baseline.json --threshold 0.2
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from _common import SERVER_DIR, percentile
+
+import routes
+from models import DatabaseManager, Progress, SavedPlan, User, WorkoutHistory
+
+BENCH_USER = "bench-user"
+BENCH_PASSWORD = "bench-password"
+LEVEL, GOAL, CONDITION = "Средний", "Набор мышц", "Зал"
+
+def seed(db_manager, users, rows_per_user, size):
+    """Заполняет базу пачками INSERT (executemany), без ORM-объектов по одному."""
+    exercises = db_manager.get_exercises(CONDITION, LEVEL, GOAL)
+    exercises_json = json.dumps(exercises)
+    started = datetime(2024, 1, 1)
+    session = db_manager.Session()
+    try:
+        session.execute(User.__table__.insert(), [
+            {"username": f"user-{i}", "password": "pw", "phone": "+375290000000", "dob": "1990-01-01"}
+            for i in range(users)
+        ] + [{"username": BENCH_USER, "password": BENCH_PASSWORD, "phone": "+375290000000", "dob": "1990-01-01"}])
+        bench_id = session.query(User.id).filter_by(username=BENCH_USER).scalar()
+
+        def rows_for(user_id, count):
+            history = [{"user_id": user_id, "workout_name": f"Тренировка {n}", "exercises": exercises_json,
+                        "duration": 45, "completed_at": started + timedelta(hours=n)} for n in range(count)]
+            progress = [{"user_id": user_id, "exercise_name": exercises[n % len(exercises)],
+                         "timestamp": started + timedelta(minutes=n)} for n in range(count)]
+            return history, progress
+
+        for user_id in itertools.chain(range(1, users + 1), [bench_id]):
+            history, progress = rows_for(user_id, size if user_id == bench_id else rows_per_user)
+            if history:
+                session.execute(WorkoutHistory.__table__.insert(), history)
+                session.execute(Progress.__table__.insert(), progress)
+        session.execute(SavedPlan.__table__.insert(), [
+            {"user_id": bench_id, "plan_name": f"План {n}", "level": LEVEL, "goal": GOAL, "condition": CONDITION,
+             "exercises": exercises_json, "created_at": started + timedelta(days=n)}
+            for n in range(max(1, size // 10))
+        ])
+        session.commit()
+        plan_id = session.query(SavedPlan.id).filter_by(user_id=bench_id).limit(1).scalar()
+        return bench_id, plan_id, exercises
+    finally:
+        session.close()
+
+def read_cases(db_manager, user_id, plan_id, exercises):
+    """(имя, вызов) для обработчиков и методов, которые только читают базу."""
+    db = db_manager
+    u = BENCH_USER
+    page = routes.DEFAULT_PAGE_SIZE
+    # Курсор второй страницы - чтобы мерить чтение не только с начала списка
+    cursor = routes.handle_get_progress_history(db, u, limit=page).get("next_cursor")
+    return [
+        ("routes.handle_login", lambda: routes.handle_login(db, u, BENCH_PASSWORD)),
+        ("routes.handle_get_exercises", lambda: routes.handle_get_exercises(db, CONDITION, LEVEL, GOAL)),
+        ("routes.handle_get_nutrition_plan", lambda: routes.handle_get_nutrition_plan(db, GOAL)),
+        ("routes.handle_get_workout_history", lambda: routes.handle_get_workout_history(db, u)),
+        ("routes.handle_get_workout_history(limit)", lambda: routes.handle_get_workout_history(db, u, limit=page)),
+        ("routes.handle_get_user_plans", lambda: routes.handle_get_user_plans(db, u)),
+        ("routes.handle_load_existing_plan", lambda: routes.handle_load_existing_plan(db, u, plan_id)),
+        ("routes.handle_get_progress_history", lambda: routes.handle_get_progress_history(db, u)),
+        ("routes.handle_get_progress_history(limit)", lambda: routes.handle_get_progress_history(db, u, limit=page)),
+        ("routes.handle_get_progress_history(cursor)",
+         lambda: routes.handle_get_progress_history(db, u, limit=page, cursor=cursor)),
+        ("db.get_exercises", lambda: db.get_exercises(CONDITION, LEVEL, GOAL)),
+        ("db.get_workout_history", lambda: db.get_workout_history(user_id)),
+        ("db.get_user_plans", lambda: db.get_user_plans(user_id)),
+        ("db.get_saved_plan_by_id", lambda: db.get_saved_plan_by_id(plan_id, user_id)),
+    ]
+
+def write_cases(db_manager, user_id, plan_id, exercises):
+    """(имя, вызов) для обработчиков и методов, которые пишут в базу."""
+    db = db_manager
+    u = BENCH_USER
+    # Каждая регистрация - новое имя, иначе мерился бы отказ "пользователь существует"
+    new_users = (f"bench-new-{n}" for n in itertools.count())
+    return [
+        ("routes.handle_register",
+         lambda: routes.handle_register(db, next(new_users), BENCH_PASSWORD, "+375290000000", "1990-01-01")),
+        ("routes.handle_track_progress", lambda: routes.handle_track_progress(db, u, exercises[0])),
+        ("routes.handle_batch", lambda: routes.handle_batch(db, [
+            {"action": "track_progress", "username": u, "exercise": name} for name in exercises])),
+        ("routes.handle_save_workout_history",
+         lambda: routes.handle_save_workout_history(db, u, "Тренировка", exercises, 45)),
+        ("routes.handle_save_plan", lambda: routes.handle_save_plan(db, u, "План", LEVEL, GOAL, CONDITION, exercises)),
+        ("routes.handle_save_plan_with_history",
+         lambda: routes.handle_save_plan_with_history(db, u, "План", LEVEL, GOAL, CONDITION, exercises)),
+        ("db.save_workout_history", lambda: db.save_workout_history(user_id, "Тренировка", exercises, 45)),
+        ("db.save_user_plan", lambda: db.save_user_plan(user_id, "План", LEVEL, GOAL, CONDITION, exercises)),
+    ]
+
+def measure(fn, min_time, min_runs, max_runs):
+    fn()  # прогрев: кэши SQLAlchemy, подготовленные запросы
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(percentile(samples, 50) * 1000, 4),
+        "p90_ms": round(percentile(samples, 90) * 1000, 4),
+    }
+
+def run_size(size, args):
+    """Все случаи на свежей базе с size записями у измеряемого пользователя."""
+    workdir = tempfile.mkdtemp(prefix="fitness-bench-routes-")
+    cwd = os.getcwd()
+    try:
+        # handle_get_nutrition_plan читает файл из текущего каталога
+        shutil.copy(os.path.join(SERVER_DIR, routes.NUTRITION_PLANS_FILE), workdir)
+        os.chdir(workdir)
+        db_manager = DatabaseManager(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        seeded = time.perf_counter()
+        user_id, plan_id, exercises = seed(db_manager, args.users, args.rows_per_user, size)
+        print(f"  size={size}: база заполнена за {time.perf_counter() - seeded:.1f} с", file=sys.stderr)
+        results = {}
+        # Сначала чтение: записи случаев ниже растят историю измеряемого пользователя,
+        # и чтение после них шло бы уже не на size записях
+        cases = (read_cases(db_manager, user_id, plan_id, exercises)
+                 + write_cases(db_manager, user_id, plan_id, exercises))
+        for name, fn in cases:
+            result = measure(fn, args.min_time, args.min_runs, args.max_runs)
+            result.update(name=name, size=size)
+            results[f"{name}[{size}]"] = result
+        db_manager.engine.dispose()
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Добавляет к результатам изменение медианы относительно baseline; возвращает регрессии."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or not base.get("median_ms"):
+            continue
+        result["baseline_median_ms"] = base["median_ms"]
+        result["change"] = round(result["median_ms"] / base["median_ms"] - 1, 4)
+        result["regression"] = (result["change"] > threshold
+                                and result["median_ms"] - base["median_ms"] > min_delta_ms)
+        if result["regression"]:
+            regressions.append(key)
+    return regressions
+
+def print_table(results):
+    print(f"{'case':<44} {'size':>6} {'runs':>6} {'min ms':>9} {'median ms':>10} {'p90 ms':>9} {'baseline':>9} {'change':>8}")
+    for result in results.values():
+        change = f"{result['change'] * 100:+.1f}%" if "change" in result else ""
+        base = result.get("baseline_median_ms", "")
+        flag = "  РЕГРЕССИЯ" if result.get("regression") else ""
+        print(f"{result['name']:<44} {result['size']:>6} {result['runs']:>6} {result['min_ms']:>9} "
+              f"{result['median_ms']:>10} {result['p90_ms']:>9} {base:>9} {change:>8}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="Записей истории и прогресса у измеряемого пользователя")
+    parser.add_argument("--users", type=int, default=1000, help="Фоновых пользователей в базе")
+    parser.add_argument("--rows-per-user", type=int, default=5, help="Записей истории и прогресса у фонового пользователя")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Минимальное время замера одного случая, сек")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--max-runs", type=int, default=1000)
+    parser.add_argument("--save", help="Сохранить результат в JSON-файл")
+    parser.add_argument("--baseline", help="JSON-файл прошлого запуска (--save) для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустимый рост медианы (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="Рост медианы меньше этого не считается регрессией (шум)")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.update(run_size(size, args))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold, args.min_delta_ms)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "rows_per_user": args.rows_per_user,
+        },
+        "results": results,
+        "regressions": regressions,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+        if args.baseline:
+            print(f"Регрессий: {len(regressions)} (порог {args.threshold * 100:.0f}%)")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
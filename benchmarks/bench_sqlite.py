@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Параллельные чтение и запись в SQLite через DatabaseManager: настройки SQLite
+по умолчанию против SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout,
+mmap_size, cache_size, temp_store) и пула по числу потоков.
+
+Для каждого профиля создается временная база с --users пользователями по
+--rows-per-user записей истории и прогресса. Затем --writers потоков вызывают
+routes.handle_track_progress, а --readers потоков - handle_get_workout_history и
+handle_get_progress_history, как обработчики сервера, в течение --duration
+секунд. В результате - операций в секунду, p50/p99 и ошибки (например,
+"database is locked" или таймаут пула) отдельно для чтения и записи.
+
+Примеры:
+    python benchmarks/bench_sqlite.py --writers 8 --readers 8 --duration 10
+    python benchmarks/bench_sqlite.py --profiles tuned --writers 32 --readers 0 --json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from _common import SERVER_DIR, latency_summary  # noqa: F401 - добавляет server/ в sys.path
+
+import routes
+from models import DatabaseManager, Progress, User, WorkoutHistory
+
+# Профили DatabaseManager: как было до настройки (умолчания SQLite и SQLAlchemy) и текущий
+PROFILES = {
+    "default": {"pragmas": {}, "pool_size": 5, "max_overflow": 10, "pool_timeout": 30.0},
+    "tuned": {},
+}
+EXERCISES = ["Приседания", "Отжимания", "Планка", "Выпады", "Скручивания"]
+
+def seed(db_manager, users, rows_per_user):
+    """Пользователи user-0..N с историей и прогрессом, пачками INSERT."""
+    started = datetime(2024, 1, 1)
+    exercises_json = json.dumps(EXERCISES)
+    session = db_manager.Session()
+    try:
+        session.execute(User.__table__.insert(), [
+            {"username": f"user-{i}", "password": "pw", "phone": "+375290000000", "dob": "1990-01-01"}
+            for i in range(users)
+        ])
+        for user_id in range(1, users + 1):
+            if not rows_per_user:
+                break
+            session.execute(WorkoutHistory.__table__.insert(), [
+                {"user_id": user_id, "workout_name": f"Тренировка {n}", "exercises": exercises_json,
+                 "duration": 45, "completed_at": started + timedelta(hours=n)} for n in range(rows_per_user)])
+            session.execute(Progress.__table__.insert(), [
+                {"user_id": user_id, "exercise_name": EXERCISES[n % len(EXERCISES)],
+                 "timestamp": started + timedelta(minutes=n)} for n in range(rows_per_user)])
+        session.commit()
+    finally:
+        session.close()
+
+class Worker(threading.Thread):
+    """Поток, повторяющий свою операцию до deadline."""
+
+    def __init__(self, index, operation, deadline, start_event):
+        super().__init__(daemon=True)
+        self.index = index
+        self.operation = operation
+        self.deadline = deadline
+        self.start_event = start_event
+        self.samples = []
+        self.errors = {}
+
+    def run(self):
+        self.start_event.wait()
+        i = self.index
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                response = self.operation(i)
+                if not response.get("success"):
+                    raise RuntimeError(response.get("message", "success=False"))
+            except Exception as e:
+                # Первая строка сообщения достаточно группирует ошибки ("database is locked", таймаут пула)
+                reason = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"[:120]
+                self.errors[reason] = self.errors.get(reason, 0) + 1
+                continue
+            finally:
+                i += 1
+            self.samples.append(time.perf_counter() - started)
+
+def summarize(workers, elapsed):
+    samples = [s for w in workers for s in w.samples]
+    errors = {}
+    for w in workers:
+        for reason, count in w.errors.items():
+            errors[reason] = errors.get(reason, 0) + count
+    summary = latency_summary(samples)
+    summary.update(ops=round(len(samples) / elapsed, 1) if elapsed else 0.0,
+                   errors=sum(errors.values()), error_reasons=errors)
+    return summary
+
+def run_profile(name, args):
+    workdir = tempfile.mkdtemp(prefix="fitness-bench-sqlite-")
+    try:
+        options = dict(PROFILES[name])
+        if name == "tuned":
+            options.setdefault("pool_size", args.writers + args.readers)
+        db_manager = DatabaseManager(f"sqlite:///{os.path.join(workdir, 'bench.db')}", **options)
+        seed(db_manager, args.users, args.rows_per_user)
+        users = args.users
+
+        def write(i):
+            return routes.handle_track_progress(db_manager, f"user-{i % users}", EXERCISES[i % len(EXERCISES)])
+
+        def read(i):
+            username = f"user-{i % users}"
+            if i % 2:
+                return routes.handle_get_progress_history(db_manager, username)
+            return routes.handle_get_workout_history(db_manager, username)
+
+        start_event = threading.Event()
+        deadline = time.monotonic() + args.duration
+        # Разные стартовые i - потоки работают с разными пользователями
+        writers = [Worker(n * 7919, write, deadline, start_event) for n in range(args.writers)]
+        readers = [Worker(n * 7919, read, deadline, start_event) for n in range(args.readers)]
+        for worker in writers + readers:
+            worker.start()
+        started = time.monotonic()
+        start_event.set()
+        for worker in writers + readers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        settings = db_manager.sqlite_settings()
+        pool = db_manager.pool_stats()
+        db_manager.engine.dispose()
+        return {
+            "profile": name,
+            "settings": settings,
+            "pool": {"size": pool.get("size"), "overflow": pool.get("overflow"), "timeout": pool.get("timeout")},
+            "write": summarize(writers, elapsed),
+            "read": summarize(readers, elapsed),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(results):
+    print(f"{'profile':<9} {'kind':<6} {'ops/s':>9} {'count':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>9} {'max ms':>9}")
+    for result in results:
+        for kind in ("write", "read"):
+            r = result[kind]
+            print(f"{result['profile']:<9} {kind:<6} {r['ops']:>9} {r['count']:>8} {r['errors']:>7} "
+                  f"{r['p50_ms']:>8} {r['p99_ms']:>9} {r['max_ms']:>9}")
+            for reason, count in r["error_reasons"].items():
+                print(f"{'':<16} {count:>6} x {reason}")
+    for result in results:
+        print(f"{result['profile']}: {result['settings']}, пул {result['pool']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default="default,tuned", help=f"Через запятую из: {', '.join(PROFILES)}")
+    parser.add_argument("--writers", type=int, default=8, help="Потоков track_progress")
+    parser.add_argument("--readers", type=int, default=8, help="Потоков чтения истории и прогресса")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rows-per-user", type=int, default=50, help="Записей истории и прогресса у пользователя")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность замера одного профиля, сек")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(",")
+    unknown = [name for name in profiles if name not in PROFILES]
+    if unknown:
+        parser.error(f"Неизвестные профили: {', '.join(unknown)}")
+
+    results = [run_profile(name, args) for name in profiles]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+
+if __name__ == "__main__":
+    main()
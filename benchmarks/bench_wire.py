@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Байты на проводе и CPU кодирования/декодирования: JSON-строки против
+кадров с префиксом длины, компактной кодировки (server/compact.py) и сжатия zlib.
+
+Полезная нагрузка - ответы get_workout_history и get_user_plans из случайных
+тренировок каталога упражнений, как у реальных пользователей.
+
+Пример:
+    python benchmarks/bench_wire.py --records 10,100,1000
+"""
+import argparse
+import random
+import time
+import zlib
+
+from _common import SERVER_DIR  # noqa: F401 - добавляет server/ в sys.path
+from models import EXERCISE_CATALOG
+from protocol import JsonCodec, CompactCodec
+from framing import encode_line, encode_length_prefixed
+from protocol import COMPRESS_LEVEL
+
+def catalog_workouts():
+    for level, goals in EXERCISE_CATALOG.items():
+        for goal, places in goals.items():
+            for condition, exercises in places.items():
+                yield level, goal, condition, exercises
+
+def history_response(records, rng):
+    workouts = list(catalog_workouts())
+    history = []
+    for i in range(records):
+        _, _, _, exercises = rng.choice(workouts)
+        done = exercises[:rng.randint(3, len(exercises))]
+        history.append({
+            "id": 100000 + i,
+            "workout_name": f"Тренировка {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024 18:30",
+            "exercises": done,
+            "duration": rng.randint(15, 90),
+            "completed_at": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 18:30",
+        })
+    return {"action": "workout_history", "success": True, "history": history}
+
+def plans_response(records, rng):
+    workouts = list(catalog_workouts())
+    plans = []
+    for i in range(records):
+        level, goal, condition, exercises = rng.choice(workouts)
+        plans.append({"id": 5000 + i, "name": f"План {i}", "date": "2024-05-01",
+                      "level": level, "goal": goal, "condition": condition, "exercises": exercises})
+    return {"action": "user_plans", "success": True, "plans": plans}
+
+def best_time(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def encode_zlib(payload):
+    # Первый кадр нового соединения - словарь потокового контекста еще пуст
+    compressor = zlib.compressobj(COMPRESS_LEVEL)
+    data = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return encode_length_prefixed(data, compressed=True)
+
+FORMATS = (
+    ("newline+json", JsonCodec, encode_line),
+    ("length+compact", CompactCodec, encode_length_prefixed),
+    ("json+zlib", JsonCodec, encode_zlib),
+    ("compact+zlib", CompactCodec, encode_zlib),
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'payload':<18} {'format':<16} {'bytes':>10} {'ratio':>6} {'encode ms':>10} {'decode ms':>10}")
+    for records in (int(n) for n in args.records.split(",")):
+        for name, builder in (("history", history_response), ("plans", plans_response)):
+            payload = builder(records, rng)
+            base = None
+            for label, codec, framer in FORMATS:
+                frame = framer(codec.encode(payload))
+                body = codec.encode(payload)
+                base = base or len(frame)
+                encode_ms = best_time(lambda p: framer(codec.encode(p)), payload, args.repeat) * 1000
+                decode_ms = best_time(codec.decode, body, args.repeat) * 1000
+                print(f"{name + ' x' + str(records):<18} {label:<16} {len(frame):>10} "
+                      f"{len(frame) / base:>6.2f} {encode_ms:>10.2f} {decode_ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
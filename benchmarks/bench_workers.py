@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Масштабирование пропускной способности по числу процессов-воркеров (--workers).
+
+Для каждого N из списка сервер запускается с --workers N, затем несколько
+клиентских процессов (чтобы GIL клиента не стал узким местом) в течение
+--duration секунд гоняют смесь get_exercises и login.
+
+Пример:
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --client-procs 8 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+
+from _common import ServerProcess, LineClient, latency_summary
+
+REQUESTS = [
+    {"action": "get_exercises", "level": "Средний", "goal": "Набор мышц", "condition": "Зал"},
+    {"action": "login", "username": "bench", "password": "bench"},
+]
+
+def client_process(port, threads, duration, result_queue):
+    """Один клиентский процесс: threads соединений до истечения duration."""
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        local = []
+        local_errors = 0
+        client = LineClient(port)
+        i = 0
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    client.request(REQUESTS[i % len(REQUESTS)])
+                except (OSError, ValueError):
+                    local_errors += 1
+                    client.close()
+                    client = LineClient(port)
+                    continue
+                local.append(time.perf_counter() - started)
+                i += 1
+        finally:
+            client.close()
+        with lock:
+            samples.extend(local)
+            errors[0] += local_errors
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    result_queue.put((samples, errors[0]))
+
+def bench_workers(workers, args):
+    with ServerProcess("--workers", str(workers), "--engine", args.engine,
+                       "--read-rate", "0", "--write-rate", "0") as server:
+        # Пользователь для login-запросов
+        client = LineClient(server.port)
+        client.request({"action": "register", "username": "bench", "password": "bench",
+                        "phone": "", "dob": ""})
+        client.close()
+        time.sleep(0.5)
+
+        result_queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client_process,
+                                         args=(server.port, args.threads, args.duration, result_queue))
+                 for _ in range(args.client_procs)]
+        started = time.perf_counter()
+        for p in procs:
+            p.start()
+        results = [result_queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - started
+
+    samples = [s for part, _ in results for s in part]
+    errors = sum(e for _, e in results)
+    return {
+        "workers": workers,
+        "rps": round(len(samples) / elapsed, 1),
+        "errors": errors,
+        "latency": latency_summary(samples),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="Список значений --workers")
+    parser.add_argument("--engine", default="asyncio", choices=("threaded", "asyncio"))
+    parser.add_argument("--client-procs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--threads", type=int, default=8, help="Соединений на клиентский процесс")
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд нагрузки на каждое N")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [bench_workers(int(n), args) for n in args.workers.split(",")]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    base = results[0]["rps"] or 1.0
+    print(f"{'workers':>7} {'rps':>9} {'scale':>6} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['rps']:>9} {r['rps'] / base:>6.2f} "
+              f"{r['latency']['p50_ms']:>8} {r['latency']['p99_ms']:>8} {r['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
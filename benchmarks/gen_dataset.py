@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетической базы в схеме models.py: пользователи, планы, прогресс и
+история тренировок в объемах рабочей базы.
+
+Число тренировок у пользователя - логнормальное (--mean-workouts, --sigma):
+большинство делает десятки тренировок, а "тяжелый хвост" - тысячи. У каждого
+пользователя свой основной план из каталога DatabaseManager.exercises; в
+тренировке отмечается большая часть упражнений плана (строки Progress), сама
+тренировка пишется в WorkoutHistory. Время тренировок - за --days дней до
+--end-date, поэтому результат зависит только от --seed и параметров.
+
+Строки пишутся пачками executemany напрямую через sqlite3 (без ORM-объектов),
+журнал и fsync на время загрузки отключены. 100 тыс. пользователей со средним
+в 50 тренировок - около 5 млн строк истории и 30 млн строк прогресса.
+
+Пример:
+    python benchmarks/gen_dataset.py --db synthetic.db --users 100000 --seed 1
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from _common import SERVER_DIR  # noqa: F401 - добавляет server/ в sys.path
+from models import DatabaseManager, Progress, SavedPlan, TrainingPlan, User, WorkoutHistory
+
+# Доля упражнений плана, которые пользователь отмечает в тренировке
+CHECK_PROBABILITY = 0.85
+# Вероятность тренировки не по основному плану
+SWITCH_PROBABILITY = 0.15
+MAX_WORKOUTS_PER_USER = 20000
+
+class Catalog:
+    """Планы каталога: (уровень, цель, условия) -> упражнения и их JSON (как в models.py)."""
+
+    def __init__(self, exercises):
+        self.plans = [
+            (level, goal, condition, names, json.dumps(names))
+            for level, goals in sorted(exercises.items())
+            for goal, conditions in sorted(goals.items())
+            for condition, names in sorted(conditions.items())
+        ]
+
+class Timestamps:
+    """Строки DateTime в формате SQLAlchemy для SQLite без strftime на каждую строку."""
+
+    def __init__(self, end_date, days):
+        start = end_date - timedelta(days=days)
+        self.days = [(start + timedelta(days=d)).isoformat() for d in range(days + 1)]
+
+    def format(self, day, seconds):
+        h, rest = divmod(seconds, 3600)
+        m, s = divmod(rest, 60)
+        return f"{self.days[day]} {h:02d}:{m:02d}:{s:02d}.000000"
+
+def insert_sql(table, columns):
+    return f"INSERT INTO {table.__tablename__} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+USER_SQL = insert_sql(User, ("id", "username", "password", "phone", "dob"))
+TRAINING_PLAN_SQL = insert_sql(TrainingPlan, ("user_id", "level", "goal", "condition"))
+SAVED_PLAN_SQL = insert_sql(SavedPlan, ("user_id", "plan_name", "level", "goal", "condition", "exercises", "created_at"))
+HISTORY_SQL = insert_sql(WorkoutHistory, ("user_id", "workout_name", "exercises", "duration", "completed_at"))
+PROGRESS_SQL = insert_sql(Progress, ("user_id", "exercise_name", "timestamp"))
+
+class Generator:
+    def __init__(self, args, catalog):
+        self.args = args
+        self.catalog = catalog
+        self.rng = random.Random(args.seed)
+        self.timestamps = Timestamps(args.end_date, args.days)
+        # Параметры логнормального распределения с заданным средним
+        self.mu = math.log(args.mean_workouts) - args.sigma ** 2 / 2
+        self.counts = dict.fromkeys(("users", "training_plans", "saved_plans", "workout_history", "progress"), 0)
+
+    def workouts_count(self):
+        return min(MAX_WORKOUTS_PER_USER, int(self.rng.lognormvariate(self.mu, self.args.sigma)))
+
+    def user_rows(self, user_id, rows):
+        """Добавляет в rows все строки одного пользователя."""
+        rng = self.rng
+        args = self.args
+        plans = self.catalog.plans
+        users, training_plans, saved_plans, history, progress = rows
+
+        users.append((user_id, f"user{user_id:07d}", "password", f"+37529{rng.randrange(10 ** 7):07d}",
+                      f"{rng.randint(1960, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"))
+        main_plan = rng.choice(plans)
+        training_plans.append((user_id, main_plan[0], main_plan[1], main_plan[2]))
+
+        workouts = self.workouts_count()
+        # Активные пользователи занимаются дольше: начало - не позже чем за workouts дней до конца
+        first_day = rng.randint(0, max(0, args.days - min(args.days, workouts)))
+        span = args.days - first_day
+        days = sorted(first_day + rng.randrange(span + 1) for _ in range(workouts))
+
+        for n in range(rng.randint(0, 2) + workouts // 100):
+            level, goal, condition, _, exercises_json = main_plan if n == 0 else rng.choice(plans)
+            created = self.timestamps.format(days[0] if days else first_day, rng.randrange(86400))
+            saved_plans.append((user_id, f"План {n + 1}", level, goal, condition, exercises_json, created))
+
+        for day in days:
+            level, goal, condition, names, exercises_json = (
+                rng.choice(plans) if rng.random() < SWITCH_PROBABILITY else main_plan)
+            started = rng.randint(6 * 3600, 21 * 3600)
+            duration = max(10, int(rng.gauss(45, 15)))
+            offset = started
+            for name in names:
+                offset += rng.randint(120, 600)
+                if rng.random() < CHECK_PROBABILITY and offset < 86400:
+                    progress.append((user_id, name, self.timestamps.format(day, offset)))
+            history.append((user_id, f"{goal} ({condition})", exercises_json, duration,
+                            self.timestamps.format(day, min(86399, started + duration * 60))))
+
+    def run(self, conn):
+        rows = ([], [], [], [], [])
+        statements = (USER_SQL, TRAINING_PLAN_SQL, SAVED_PLAN_SQL, HISTORY_SQL, PROGRESS_SQL)
+        names = ("users", "training_plans", "saved_plans", "workout_history", "progress")
+        started = time.perf_counter()
+
+        def flush():
+            for sql, name, batch in zip(statements, names, rows):
+                if batch:
+                    conn.executemany(sql, batch)
+                    self.counts[name] += len(batch)
+                    batch.clear()
+            conn.commit()
+
+        for user_id in range(1, self.args.users + 1):
+            self.user_rows(user_id, rows)
+            if len(rows[4]) >= self.args.batch:
+                flush()
+            if user_id % 10000 == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {user_id} пользователей, {self.counts['progress']} строк прогресса, {elapsed:.0f} с",
+                      file=sys.stderr)
+        flush()
+
+def open_for_bulk_load(path):
+    conn = sqlite3.connect(path)
+    # Загрузка одноразовая: при сбое файл просто создается заново
+    for pragma in ("journal_mode=OFF", "synchronous=OFF", "temp_store=MEMORY",
+                   "cache_size=-262144", "locking_mode=EXCLUSIVE"):
+        conn.execute(f"PRAGMA {pragma}")
+    return conn
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="synthetic.db", help="Файл SQLite (будет создан)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--mean-workouts", type=float, default=50.0, help="Среднее число тренировок на пользователя")
+    parser.add_argument("--sigma", type=float, default=1.5, help="Разброс (логнормальный): больше - тяжелее хвост")
+    parser.add_argument("--days", type=int, default=730, help="За сколько дней распределены тренировки")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=200000, help="Строк прогресса в одной пачке INSERT")
+    parser.add_argument("--force", action="store_true", help="Перезаписать существующий файл")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} уже существует (--force, чтобы перезаписать)")
+        os.remove(args.db)
+
+    # Схема и каталог - из models.py, как у сервера
+    db_manager = DatabaseManager(f"sqlite:///{os.path.abspath(args.db)}")
+    catalog = Catalog(db_manager.exercises)
+    db_manager.engine.dispose()
+
+    started = time.perf_counter()
+    conn = open_for_bulk_load(args.db)
+    generator = Generator(args, catalog)
+    try:
+        generator.run(conn)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(args.db) / 1024 / 1024
+    for name, count in generator.counts.items():
+        print(f"{name:<16} {count:>12}")
+    print(f"Файл {args.db}: {size_mb:.0f} МБ за {elapsed:.0f} с")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Генератор нагрузки: N виртуальных пользователей приложения на реальных соединениях.
+
+Каждый пользователь держит свое соединение и повторяет сессию GUI-клиента:
+регистрация (один раз), вход, мастер плана (get_exercises), track_progress на
+каждое упражнение плана, save_workout_history, затем просмотр истории и прогресса.
+Между шагами - пауза "на размышление" (экспоненциальная со средним --think-ms).
+В конце - пропускная способность, доля ошибок и перцентили задержек по действиям.
+
+Примеры:
+    python benchmarks/loadgen.py --spawn --engine asyncio --users 2000 --duration 60
+    python benchmarks/loadgen.py --port 65432 --users 200 --sessions 3 --think-ms 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from _common import ServerProcess, latency_summary
+from connections import raise_nofile_limit
+
+LEVELS = ("Новичок", "Средний", "Продвинутый")
+GOALS = ("Похудение", "Набор мышц", "Выносливость")
+CONDITIONS = ("Дом", "Зал")
+# Ответы, после которых запрос повторяется через retry_after_ms
+THROTTLED_ACTIONS = ("busy", "rate_limited")
+# История тренировок растет с каждой сессией - ответ может быть большим
+STREAM_LIMIT = 64 * 1024 * 1024
+
+class ActionStats:
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+        self.timeouts = 0
+        self.throttled = 0
+
+class Recorder:
+    """Задержки и ошибки по действиям для всех виртуальных пользователей."""
+
+    def __init__(self):
+        self.actions = {}
+        self.connect_errors = 0
+
+    def stats(self, action):
+        stats = self.actions.get(action)
+        if stats is None:
+            stats = self.actions[action] = ActionStats()
+        return stats
+
+    def report(self, elapsed):
+        rows = {}
+        total = ActionStats()
+        for action in sorted(self.actions):
+            stats = self.actions[action]
+            rows[action] = _summary(stats, elapsed)
+            total.samples.extend(stats.samples)
+            total.errors += stats.errors
+            total.timeouts += stats.timeouts
+            total.throttled += stats.throttled
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "connect_errors": self.connect_errors,
+            "actions": rows,
+            "total": _summary(total, elapsed),
+        }
+
+def _summary(stats, elapsed):
+    count = len(stats.samples)
+    summary = latency_summary(stats.samples)
+    summary.update(
+        rps=round(count / elapsed, 1) if elapsed else 0.0,
+        errors=stats.errors,
+        error_rate=round(stats.errors / (count + stats.timeouts), 4) if count + stats.timeouts else 0.0,
+        timeouts=stats.timeouts,
+        throttled=stats.throttled,
+    )
+    return summary
+
+class VirtualUser:
+    """Один пользователь приложения: свое соединение и свой сценарий."""
+
+    def __init__(self, index, run_id, args, recorder):
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(f"{run_id}-{index}")
+        self.username = f"load-{run_id}-{index}"
+        self.password = "load-password"
+        self.reader = None
+        self.writer = None
+
+    async def think(self):
+        if self.args.think_ms > 0:
+            await asyncio.sleep(self.rng.expovariate(1000.0 / self.args.think_ms))
+
+    async def request(self, data):
+        """Отправляет запрос и ждет ответа; при busy/rate_limited повторяет после паузы.
+
+        Ответ, не пришедший за --timeout секунд, считается ошибкой, и соединение
+        пользователя закрывается: зависший сервер не должен подвесить замер.
+        """
+        stats = self.recorder.stats(data["action"])
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        while True:
+            started = time.perf_counter()
+            self.writer.write(line)
+            await self.writer.drain()
+            try:
+                raw = await asyncio.wait_for(self.reader.readline(), self.args.timeout)
+            except asyncio.TimeoutError:
+                stats.errors += 1
+                stats.timeouts += 1
+                raise ConnectionError("Нет ответа сервера")
+            elapsed = time.perf_counter() - started
+            if not raw:
+                stats.errors += 1
+                raise ConnectionError("Сервер закрыл соединение")
+            response = json.loads(raw)
+            if response.get("action") in THROTTLED_ACTIONS:
+                stats.throttled += 1
+                await asyncio.sleep(response.get("retry_after_ms", 200) / 1000)
+                continue
+            stats.samples.append(elapsed)
+            if "error" in response or response.get("success") is False:
+                stats.errors += 1
+            return response
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.args.host, self.args.port, limit=STREAM_LIMIT)
+
+    async def session(self):
+        """Вход, тренировка по плану из мастера, просмотр истории."""
+        await self.request({"action": "login", "username": self.username, "password": self.password})
+        await self.think()
+
+        level, goal, condition = self.rng.choice(LEVELS), self.rng.choice(GOALS), self.rng.choice(CONDITIONS)
+        response = await self.request({"action": "get_exercises", "level": level, "goal": goal,
+                                       "condition": condition})
+        exercises = response.get("exercises") or []
+        await self.think()
+
+        for exercise in exercises:
+            await self.request({"action": "track_progress", "username": self.username, "exercise": exercise})
+            await self.think()
+
+        await self.request({"action": "save_workout_history", "username": self.username,
+                            "workout_name": f"{goal} ({condition})", "exercises": exercises,
+                            "duration": self.rng.randint(600, 3600)})
+        await self.think()
+
+        await self.request({"action": "get_workout_history", "username": self.username})
+        await self.think()
+        await self.request({"action": "get_progress_history", "username": self.username})
+        await self.think()
+
+    async def run(self, start_delay, deadline):
+        await asyncio.sleep(start_delay)
+        try:
+            await self.connect()
+        except OSError:
+            self.recorder.connect_errors += 1
+            return
+        try:
+            await self.request({"action": "register", "username": self.username, "password": self.password,
+                                "phone": "+375290000000", "dob": "1990-01-01"})
+            sessions = 0
+            while time.monotonic() < deadline and (not self.args.sessions or sessions < self.args.sessions):
+                await self.session()
+                sessions += 1
+        except (OSError, ValueError):
+            # Обрыв соединения уже учтен как ошибка действия
+            pass
+        finally:
+            self.writer.close()
+
+async def run_load(args):
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    started = time.monotonic()
+    # С --sessions сессии не ограничены по времени
+    deadline = started + args.duration if not args.sessions else float("inf")
+    ramp_step = args.ramp_up / args.users if args.users else 0
+    users = [VirtualUser(i, run_id, args, recorder) for i in range(args.users)]
+    await asyncio.gather(*(user.run(i * ramp_step, deadline) for i, user in enumerate(users)))
+    return recorder.report(time.monotonic() - started)
+
+def print_report(report):
+    print(f"{'action':<22} {'count':>8} {'rps':>8} {'errors':>7} {'err %':>6} {'timeouts':>8} {'throttled':>9} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>9}")
+    rows = list(report["actions"].items()) + [("ИТОГО", report["total"])]
+    for action, r in rows:
+        print(f"{action:<22} {r['count']:>8} {r['rps']:>8} {r['errors']:>7} {r['error_rate'] * 100:>6.2f} "
+              f"{r['timeouts']:>8} {r['throttled']:>9} {r['p50_ms']:>8} {r['p90_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>9}")
+    print(f"Время: {report['elapsed_s']} с, ошибок подключения: {report['connect_errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--spawn", action="store_true",
+                        help="Запустить свой сервер (без лимитов частоты) во временном каталоге")
+    parser.add_argument("--engine", default="threaded", help="Движок сервера для --spawn")
+    parser.add_argument("--executor-workers", type=int, default=16, help="Для --spawn")
+    parser.add_argument("--users", type=int, default=100, help="Виртуальных пользователей (соединений)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность нагрузки, сек")
+    parser.add_argument("--sessions", type=int, default=0,
+                        help="Сессий на пользователя вместо --duration (0 - до конца --duration)")
+    parser.add_argument("--think-ms", type=float, default=1000.0,
+                        help="Средняя пауза между действиями пользователя, мс (0 - без пауз)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Сколько ждать ответа на запрос, сек")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="За сколько секунд подключаются все пользователи")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    raise_nofile_limit()
+
+    if args.spawn:
+        with ServerProcess("--engine", args.engine, "--executor-workers", str(args.executor_workers),
+                           "--max-connections", "0", "--read-rate", "0", "--write-rate", "0") as server:
+            args.host, args.port = "127.0.0.1", server.port
+            report = asyncio.run(run_load(args))
+    else:
+        report = asyncio.run(run_load(args))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Воспроизведение записанного трафика (python main.py --capture-file capture.jsonl).
+
+Запросы каждого записанного соединения идут по своему соединению и строго по
+порядку: следующий отправляется после ответа на предыдущий. Соединения
+воспроизводятся параллельно, с теми же интервалами, что при записи (--speed 1),
+в N раз быстрее (--speed N) или без пауз (--speed 0).
+
+Пароли и телефоны в записи заменены на "***" - при воспроизведении вместо них
+подставляются --password и фиксированный телефон, поэтому register и login
+записанных пользователей на чистой базе проходят.
+
+Примеры:
+    python benchmarks/replay.py capture.jsonl --spawn --speed 0
+    python benchmarks/replay.py capture.jsonl --port 65432 --speed 2 --json
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from _common import ServerProcess
+from connections import raise_nofile_limit
+from loadgen import THROTTLED_ACTIONS, STREAM_LIMIT, Recorder, print_report
+
+REDACTED = "***"
+REPLAY_PHONE = "+375290000000"
+
+def load_capture(path):
+    """Читает запись: {id соединения: [(время, запрос), ...]} и время первого запроса."""
+    connections = {}
+    first = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            connections.setdefault(record["conn"], []).append((record["ts"], record["request"]))
+            first = record["ts"] if first is None else min(first, record["ts"])
+    return connections, first
+
+def restore(value, password, token):
+    """Подставляет значения вместо полей, скрытых при записи."""
+    if isinstance(value, dict):
+        restored = {}
+        for key, item in value.items():
+            if item == REDACTED and key == "password":
+                item = password
+            elif item == REDACTED and key == "phone":
+                item = REPLAY_PHONE
+            elif item == REDACTED and key == "token":
+                if token is None:
+                    continue
+                item = token
+            restored[key] = restore(item, password, token)
+        return restored
+    if isinstance(value, list):
+        return [restore(item, password, token) for item in value]
+    return value
+
+async def replay_connection(requests, args, recorder, origin, first_ts, lag):
+    """Воспроизводит одно записанное соединение."""
+
+    def due(ts):
+        return origin + (ts - first_ts) / args.speed if args.speed > 0 else 0.0
+
+    delay = due(requests[0][0]) - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port, limit=STREAM_LIMIT)
+    except OSError:
+        recorder.connect_errors += 1
+        return
+    try:
+        for ts, request in requests:
+            delay = due(ts) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif args.speed > 0:
+                # Сервер не успевает за записанным темпом
+                lag[0] = max(lag[0], -delay)
+            request = restore(request, args.password, args.token)
+            stats = recorder.stats(str(request.get("action")) if isinstance(request, dict) else "invalid")
+            line = json.dumps(request).encode("utf-8") + b"\n"
+            while True:
+                started = time.perf_counter()
+                writer.write(line)
+                await writer.drain()
+                try:
+                    raw = await asyncio.wait_for(reader.readline(), args.timeout)
+                except asyncio.TimeoutError:
+                    stats.errors += 1
+                    stats.timeouts += 1
+                    return
+                elapsed = time.perf_counter() - started
+                if not raw:
+                    stats.errors += 1
+                    return
+                response = json.loads(raw)
+                if response.get("action") in THROTTLED_ACTIONS:
+                    stats.throttled += 1
+                    await asyncio.sleep(response.get("retry_after_ms", 200) / 1000)
+                    continue
+                stats.samples.append(elapsed)
+                if "error" in response or response.get("success") is False:
+                    stats.errors += 1
+                break
+    except (OSError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def run_replay(connections, first_ts, args):
+    recorder = Recorder()
+    lag = [0.0]
+    origin = time.monotonic()
+    await asyncio.gather(*(replay_connection(requests, args, recorder, origin, first_ts, lag)
+                           for requests in connections.values()))
+    report = recorder.report(time.monotonic() - origin)
+    report["connections"] = len(connections)
+    report["max_lag_s"] = round(lag[0], 3)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="JSONL-файл, записанный сервером с --capture-file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--spawn", action="store_true",
+                        help="Запустить свой сервер (чистая база, без лимитов частоты) во временном каталоге")
+    parser.add_argument("--engine", default="threaded", help="Движок сервера для --spawn")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Множитель скорости: 1 - как при записи, N - в N раз быстрее, 0 - без пауз")
+    parser.add_argument("--password", default="replay-password", help="Пароль вместо скрытого в записи")
+    parser.add_argument("--token", default=None, help="Токен server_stats вместо скрытого в записи")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Сколько ждать ответа на запрос, сек")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    connections, first_ts = load_capture(args.capture)
+    if not connections:
+        parser.error("В файле нет запросов")
+    raise_nofile_limit()
+
+    if args.spawn:
+        with ServerProcess("--engine", args.engine, "--max-connections", "0",
+                           "--read-rate", "0", "--write-rate", "0") as server:
+            args.host, args.port = "127.0.0.1", server.port
+            report = asyncio.run(run_replay(connections, first_ts, args))
+    else:
+        report = asyncio.run(run_replay(connections, first_ts, args))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+        print(f"Соединений: {report['connections']}, наибольшее отставание от записи: {report['max_lag_s']} с")
+
+if __name__ == "__main__":
+    main()
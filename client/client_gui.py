@@ -5,6 +5,9 @@ import customtkinter as ctk
 import json
 from tkinter import messagebox
 import sys
+import os
+import hashlib
+import zlib
 from datetime import datetime
 
 # Импортируем новые красивые UI классы из styles
@@ -15,6 +18,10 @@ from client_styles import (
 )
 from localization import LocalizationManager
 
+# Кодек кадров общий с сервером: server/framing.py импортируется как server.framing
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.framing import FrameDecoder, FrameError, LengthPrefixDecoder, encode_line, encode_length_prefixed
+
 # --- ЗАГЛУШКИ ДЛЯ СЕРВЕРА ---
 try:
     from server.server import run_server, HOST, PORT, LoggerObserver
@@ -27,31 +34,102 @@ except ImportError:
 
 class Client:
     """Класс клиента для сетевого взаимодействия."""
-    def __init__(self, host=HOST, port=PORT):
+    # Сколько неотвеченных запросов помнить (старый сервер id не возвращает)
+    MAX_PENDING = 256
+    # Запросы, создающие записи. Ключ идемпотентности - хэш содержимого запроса:
+    # пользователь, повторивший сохранение после обрыва соединения, отправит тот же
+    # ключ, и сервер вернет прежний ответ вместо второй записи
+    IDEMPOTENT_ACTIONS = ("save_workout_history", "save_plan", "save_plan_with_history")
+
+    def __init__(self, host=HOST, port=PORT, on_connected=None):
         self.host = host
         self.port = port
         self.sock = None
+        # Вызывается с (sock, decoder) после каждого нового подключения - запуск чтения ответов
+        self.on_connected = on_connected
+        # id запроса -> запрос; сервер возвращает id в ответе
+        self.pending = {}
+        self.next_id = 0
+        # Сервер прислал server_shutdown: новые запросы пойдут по новому соединению
+        self.draining = False
+        # Формат кадров соединения; hello может сменить его на кадры с длиной и zlib
+        self.decoder = FrameDecoder()
+        self.encode_frame = encode_line
 
     def connect(self):
+        if self.sock and self.draining:
+            self.detach()
         if self.sock: return True
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((self.host, self.port))
             self.sock.settimeout(5)
+            self.negotiate()
+            if self.on_connected:
+                self.on_connected(self.sock, self.decoder)
             return True
         except Exception as e:
             print(f"CLIENT: Connection error: {e}")
+            self.close()
             return False
 
+    def negotiate(self):
+        """Просит сервер сжимать большие ответы (история, планы).
+
+        Старый сервер ответит ошибкой на hello - тогда остаемся на JSON-строках.
+        """
+        self.decoder = FrameDecoder()
+        self.encode_frame = encode_line
+        hello = {"action": "hello", "framing": "length", "encoding": "json", "compression": "zlib"}
+        self.sock.sendall(encode_line(json.dumps(hello).encode("utf-8")))
+
+        frame = self.decoder.next_frame()
+        while frame is None:
+            if not self.decoder.recv_from(self.sock):
+                raise ConnectionError("Сервер закрыл соединение")
+            frame = self.decoder.next_frame()
+
+        reply = json.loads(frame)
+        if reply.get("action") == "server_full":
+            raise ConnectionError(reply.get("message", "Сервер перегружен"))
+        if reply.get("action") != "hello" or not reply.get("success"):
+            return
+        decoder = LengthPrefixDecoder()
+        if reply.get("compression") == "zlib":
+            decoder.decompressor = zlib.decompressobj()
+        decoder.feed(self.decoder.take_pending())
+        self.decoder = decoder
+        self.encode_frame = encode_length_prefixed
+
+    @staticmethod
+    def idempotency_key(request):
+        content = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
     def send(self, data):
+        if data.get("action") in self.IDEMPOTENT_ACTIONS and "idempotency_key" not in data:
+            data = dict(data, idempotency_key=self.idempotency_key(data))
         if not self.connect(): return
         try:
-            json_data = json.dumps(data).encode("utf-8") + b"\n"
-            self.sock.sendall(json_data)
+            self.next_id += 1
+            data = dict(data, id=self.next_id)
+            self.pending[self.next_id] = data
+            if len(self.pending) > self.MAX_PENDING:
+                self.pending.pop(next(iter(self.pending)))
+            self.sock.sendall(self.encode_frame(json.dumps(data).encode("utf-8")))
         except Exception as e:
             print(f"CLIENT: Send error: {e}")
             self.close()
 
+    def detach(self):
+        """Оставляет текущее соединение его потоку чтения: он дочитает ответы и закроет сокет."""
+        self.sock = None
+        self.draining = False
+
+    def take_request(self, response):
+        """Возвращает запрос, на который пришел ответ (по id), или None."""
+        return self.pending.pop(response.get("id"), None)
+
     def close(self):
         if self.sock:
             try:
@@ -59,9 +137,18 @@ class Client:
             except Exception:
                 pass
             self.sock = None
+        self.pending.clear()
+        self.draining = False
 
 class AppController(ctk.CTk):
     """Главный контроллер приложения."""
+    # Ответ со страницей списка -> (ключ фрейма, поле со списком)
+    LIST_RESPONSES = {
+        "workout_history": ("workout_history", "history"),
+        "user_plans": ("existing_plans", "plans"),
+        "progress_history": ("progress", "progress"),
+    }
+    
     def __init__(self):
         super().__init__()
         self.loc = LocalizationManager()
@@ -76,7 +163,7 @@ class AppController(ctk.CTk):
         self.stop_event = threading.Event()
         self.server_thread = None
         self.server_running = False
-        self.client = Client()
+        self.client = Client(on_connected=self.start_reader)
         self.authenticated = False
         self.username = None
         
@@ -152,6 +239,7 @@ class AppController(ctk.CTk):
     def on_use_existing_workout_plan(self):
         """Открывает окно выбора существующего плана тренировок."""
         self.show_frame(ExistingPlansFrame, "existing_plans")
+        self.frames["existing_plans"].load_first_page()
         
     def set_nutrition_goal(self, goal):
         """Устанавливает цель питания и загружает план."""
@@ -173,11 +261,7 @@ class AppController(ctk.CTk):
     def open_workout_history(self):
         """Открывает историю тренировок."""
         self.show_frame(WorkoutHistoryFrame, "workout_history")
-        if self.username:
-            self.client.send({
-                "action": "get_workout_history",
-                "username": self.username
-            })
+        self.frames["workout_history"].load_first_page()
 
     def save_workout_history(self, workout_name, exercises, duration):
         """Сохраняет историю тренировки."""
@@ -294,7 +378,6 @@ class AppController(ctk.CTk):
             messagebox.showerror("Ошибка", self.loc.get("connection_error"))
             return
         self.client.send({"action": "login", "username": username, "password": password})
-        threading.Thread(target=self.reader_loop, daemon=True).start()
 
     def on_register(self, username, password, phone, dob):
         if not self.client.connect():
@@ -306,35 +389,63 @@ class AppController(ctk.CTk):
         })
         return True
 
-    def reader_loop(self):
+    def start_reader(self, sock, decoder):
+        """Поток чтения ответов запускается на каждое новое соединение (и после переподключения)."""
+        threading.Thread(target=self.reader_loop, args=(sock, decoder), daemon=True).start()
+
+    def reader_loop(self, sock, decoder):
+        # Читаем до закрытия соединения, даже если клиент уже перешел на новое
         try:
-            buffer = ""
             while True:
-                if not self.client.sock: break
                 try:
-                    data = self.client.sock.recv(1024).decode("utf-8")
-                    if not data: break
-                    buffer += data
-                    while "\n" in buffer:
-                        line, buffer = buffer.split("\n", 1)
-                        if line:
-                            response = json.loads(line)
-                            self.after(0, lambda r=response: self.handle_server_response(r))
+                    if not decoder.recv_from(sock): break
+                    for frame in decoder.frames():
+                        response = json.loads(frame)
+                        self.after(0, lambda r=response: self.handle_server_response(r))
                 except socket.timeout:
                     continue
+                except FrameError as e:
+                     print(f"Frame error: {e}")
+                     break
                 except Exception as e:
                      print(f"Socket error in loop: {e}")
                      break
         except Exception as e:
             print(f"Reader loop critical error: {e}")
         finally:
-            self.client.close()
+            # Клиент мог уже переподключиться - новое соединение не трогаем
+            if self.client.sock is sock:
+                self.client.close()
+            else:
+                sock.close()
+
+    def reconnect(self):
+        if not self.client.draining:
+            return
+        self.client.detach()
+        if self.authenticated and not self.client.connect():
+            self.log("Сервер недоступен, переподключение при следующем запросе.")
 
     def handle_server_response(self, response):
         action = response.get("action")
+        request = self.client.take_request(response)
         print(f"Server response: {response}")
         
-        if action == "auth":
+        if action in ("busy", "rate_limited"):
+            # Сервер перегружен или запросы идут слишком часто: повторяем именно
+            # тот запрос, который он отклонил, через предложенную паузу
+            if request:
+                retry = {k: v for k, v in request.items() if k != "id"}
+                self.after(response.get("retry_after_ms", 200), lambda r=retry: self.client.send(r))
+        
+        elif action == "server_shutdown":
+            # Сервер допишет ответы на отправленные запросы и закроет соединение сам.
+            # Переподключаемся через выданную им случайную паузу, чтобы не прийти
+            # всем клиентам сразу
+            self.client.draining = True
+            self.after(response.get("retry_after_ms", 1000), self.reconnect)
+            
+        elif action == "auth":
             if response["success"]:
                 self.authenticated = True
                 self.username = response["username"]
@@ -357,15 +468,12 @@ class AppController(ctk.CTk):
             self.current_exercises = response.get("exercises", [])
             self.show_frame(ExerciseFrame, "exercise")
             
-        elif action == "workout_history":
-            history = response.get("history", [])
-            if "workout_history" in self.frames:
-                self.frames["workout_history"].update_history(history)
-                
-        elif action == "user_plans":
-            plans = response.get("plans", [])
-            if "existing_plans" in self.frames:
-                self.frames["existing_plans"].update_plans(plans)
+        elif action in self.LIST_RESPONSES:
+            # Страница списка: cursor запроса показывает, первая это страница или следующая
+            frame_key, items_key = self.LIST_RESPONSES[action]
+            if frame_key in self.frames and response.get("success"):
+                cursor = request.get("cursor") if request else None
+                self.frames[frame_key].show_page(response.get(items_key, []), response.get("next_cursor"), cursor)
                 
         elif action == "nutrition_plan":
             if response["success"]:
@@ -404,8 +512,20 @@ class AppController(ctk.CTk):
                 "exercise": exercise_name
             })
 
+    def on_stage_completed(self, exercise_names):
+        """Отмечает все упражнения этапа одним запросом batch (одна транзакция на сервере)."""
+        if exercise_names and self.username:
+            self.client.send({
+                "action": "batch",
+                "requests": [
+                    {"action": "track_progress", "username": self.username, "exercise": name}
+                    for name in exercise_names
+                ]
+            })
+
     def on_open_progress(self):
         self.show_frame(ProgressFrame, "progress")
+        self.frames["progress"].load_first_page()
 
     def on_back_to_main(self):
         self.show_frame(LandingFrame, "landing")
@@ -469,8 +469,76 @@ class NutritionPlanFrame(BaseFrame):
 # ФРЕЙМЫ ДЛЯ СУЩЕСТВУЮЩИХ ПЛАНОВ И ИСТОРИИ
 # ==========================================
 
-class ExistingPlansFrame(BaseFrame):
+class PagedListFrame(BaseFrame):
+    """Фрейм со списком, который сервер отдает страницами (limit + cursor).
+    
+    Первая страница запрашивается при каждом открытии экрана, следующие - по
+    кнопке "Показать еще" в конце списка. Подклассы задают действие запроса,
+    контейнер списка (list_frame) и add_item для одной записи.
+    """
+    LIST_ACTION = None
+    PAGE_SIZE = 20
+    EMPTY_TEXT_KEY = "no_history"
+    
+    def __init__(self, master, controller, **kwargs):
+        super().__init__(master, controller, **kwargs)
+        self.list_frame = None
+        self.more_btn = None
+        self.next_cursor = None
+        # Курсор страницы, ответ на которую ждем (None - первая страница)
+        self.requested_cursor = None
+    
+    def load_first_page(self):
+        self._request_page(None)
+    
+    def load_next_page(self):
+        if self.next_cursor:
+            self.more_btn.configure(state="disabled")
+            self._request_page(self.next_cursor)
+    
+    def _request_page(self, cursor):
+        if not self.controller.username:
+            return
+        self.requested_cursor = cursor
+        request = {"action": self.LIST_ACTION, "username": self.controller.username, "limit": self.PAGE_SIZE}
+        if cursor:
+            request["cursor"] = cursor
+        self.controller.client.send(request)
+    
+    def show_page(self, items, next_cursor, cursor=None):
+        """Показывает страницу, запрошенную с cursor (None - первую, список очищается)."""
+        if cursor != self.requested_cursor:
+            # Ответ на устаревший запрос (экран открыли заново, пока он шел)
+            return
+        if cursor is None:
+            for widget in self.list_frame.winfo_children():
+                widget.destroy()
+            self.more_btn = None
+        elif self.more_btn is not None:
+            self.more_btn.destroy()
+            self.more_btn = None
+        
+        if cursor is None and not items:
+            ctk.CTkLabel(self.list_frame, text=self.controller.loc.get(self.EMPTY_TEXT_KEY), 
+                        font=BODY_FONT, text_color=TEXT_BODY_COLOR).pack(pady=20)
+        for item in items:
+            self.add_item(item)
+        
+        self.next_cursor = next_cursor
+        if next_cursor:
+            self.more_btn = ctk.CTkButton(self.list_frame, text=self.controller.loc.get("load_more"), font=BODY_FONT,
+                                         fg_color="transparent", text_color=ACCENT_COLOR, hover_color="#2C2C2E",
+                                         command=self.load_next_page)
+            self.more_btn.pack(pady=10)
+    
+    def add_item(self, item):
+        raise NotImplementedError
+
+class ExistingPlansFrame(PagedListFrame):
     """Фрейм выбора существующего плана тренировок."""
+    LIST_ACTION = "get_user_plans"
+    EMPTY_TEXT_KEY = "no_saved_plans"
+    
     def __init__(self, master, controller, **kwargs):
         super().__init__(master, controller, **kwargs)
         self.back_btn = None
@@ -498,33 +566,11 @@ class ExistingPlansFrame(BaseFrame):
         # Список планов
         self.plans_frame = ctk.CTkScrollableFrame(self, fg_color=CARD_BG_COLOR, corner_radius=15)
         self.plans_frame.pack(pady=10, padx=40, fill="both", expand=True)
+        self.list_frame = self.plans_frame
         
         self.update_texts()
-        # Загрузка планов
-        self.load_plans()
-    
-    def load_plans(self):
-        """Загружает список сохраненных планов."""
-        if self.controller.username:
-            self.controller.client.send({
-                "action": "get_user_plans",
-                "username": self.controller.username
-            })
     
-    def update_plans(self, plans):
-        """Обновляет список планов."""
-        for widget in self.plans_frame.winfo_children():
-            widget.destroy()
-        
-        if not plans:
-            ctk.CTkLabel(self.plans_frame, text=self.controller.loc.get("no_saved_plans"), 
-                        font=BODY_FONT, text_color=TEXT_BODY_COLOR).pack(pady=20)
-            return
-        
-        for plan in plans:
-            self.add_plan_card(plan)
-    
-    def add_plan_card(self, plan):
+    def add_item(self, plan):
         """Добавляет карточку плана."""
         card = ctk.CTkFrame(self.plans_frame, fg_color="#2C2C2E", corner_radius=10)
         card.pack(fill="x", pady=5, padx=5)
@@ -573,8 +619,11 @@ class ExistingPlansFrame(BaseFrame):
         self.title_label.configure(text="📁 " + self.controller.loc.get("your_workout_plans"))
         self.subtitle_label.configure(text=self.controller.loc.get("select_saved_plan"))
 
-class WorkoutHistoryFrame(BaseFrame):
+class WorkoutHistoryFrame(PagedListFrame):
     """Фрейм истории тренировок."""
+    LIST_ACTION = "get_workout_history"
+    EMPTY_TEXT_KEY = "no_workout_history"
+    
     def __init__(self, master, controller, **kwargs):
         super().__init__(master, controller, **kwargs)
         self.back_btn = None
@@ -598,33 +647,11 @@ class WorkoutHistoryFrame(BaseFrame):
         # Список истории
         self.history_frame = ctk.CTkScrollableFrame(self, fg_color=CARD_BG_COLOR, corner_radius=15)
         self.history_frame.pack(pady=10, padx=40, fill="both", expand=True)
+        self.list_frame = self.history_frame
         
         self.update_texts()
-        # Загрузка истории
-        self.load_history()
-    
-    def load_history(self):
-        """Загружает историю тренировок."""
-        if self.controller.username:
-            self.controller.client.send({
-                "action": "get_workout_history",
-                "username": self.controller.username
-            })
-    
-    def update_history(self, history):
-        """Обновляет список истории."""
-        for widget in self.history_frame.winfo_children():
-            widget.destroy()
-        
-        if not history:
-            ctk.CTkLabel(self.history_frame, text=self.controller.loc.get("no_workout_history"), 
-                        font=BODY_FONT, text_color=TEXT_BODY_COLOR).pack(pady=20)
-            return
-        
-        for record in history:
-            self.add_history_card(record)
     
-    def add_history_card(self, record):
+    def add_item(self, record):
         """Добавляет карточку истории тренировки."""
         card = ctk.CTkFrame(self.history_frame, fg_color="#2C2C2E", corner_radius=10)
         card.pack(fill="x", pady=5, padx=5)
@@ -835,11 +862,14 @@ class ExerciseFrame(BaseFrame):
         """Переход к следующему этапу или завершение."""
         # Сохраняем выполненные упражнения
         stage_data = self.get_current_stage_data()
+        stage_completed = []
         for i, var in enumerate(self.checkbox_vars):
             if var.get() == "on":
                 ex_name = stage_data[i]
                 self.completed_exercises.append(ex_name)
-                self.controller.on_check_exercise(ex_name, True)
+                stage_completed.append(ex_name)
+        # Весь этап отправляется одним пакетом
+        self.controller.on_stage_completed(stage_completed)
 
         if self.current_stage_idx < len(self.stages) - 1:
             self.current_stage_idx += 1
@@ -911,8 +941,11 @@ class ExerciseFrame(BaseFrame):
         self.btn_save_plan.configure(text="💾 " + self.controller.loc.get("save_plan"))
         self.btn_save_history.configure(text="📊 " + self.controller.loc.get("save_workout"))
 
-class ProgressFrame(BaseFrame):
+class ProgressFrame(PagedListFrame):
     """Экран истории прогресса."""
+    LIST_ACTION = "get_progress_history"
+    PAGE_SIZE = 50
+    
     def __init__(self, master, controller, **kwargs):
         super().__init__(master, controller, **kwargs)
         self.back_btn = None
@@ -935,30 +968,22 @@ class ProgressFrame(BaseFrame):
         
         self.progress_display = ctk.CTkScrollableFrame(self, fg_color=CARD_BG_COLOR, corner_radius=15)
         self.progress_display.pack(pady=10, padx=40, fill="both", expand=True)
+        self.list_frame = self.progress_display
         
         self.update_texts()
 
-    def load_progress(self, progress_data):
-        for widget in self.progress_display.winfo_children():
-            widget.destroy()
+    def add_item(self, entry):
+        row = ctk.CTkFrame(self.progress_display, fg_color="transparent")
+        row.pack(fill="x", pady=5)
         
-        if not progress_data:
-            ctk.CTkLabel(self.progress_display, text=self.controller.loc.get("no_history"), 
-                        font=BODY_FONT, text_color=TEXT_BODY_COLOR).pack(pady=20)
-            return
-
-        for entry in progress_data:
-            row = ctk.CTkFrame(self.progress_display, fg_color="transparent")
-            row.pack(fill="x", pady=5)
-            
-            date_str = entry.get('timestamp', '???')[:16].replace('T', ' ')
-            ex_name = entry.get('exercise_name', self.controller.loc.get("unknown"))
-            
-            ctk.CTkLabel(row, text=f"📅 {date_str}", font=("Helvetica Neue", 12), 
-                        text_color=HIGHLIGHT_COLOR).pack(anchor="w")
-            ctk.CTkLabel(row, text=f"✅ {self.controller.loc.get('completed')}: {ex_name}", 
-                        font=("Helvetica Neue", 14, "bold"), text_color=TEXT_HEADER_COLOR).pack(anchor="w", pady=(2, 10))
-            ctk.CTkFrame(row, height=1, fg_color=CARD_BG_COLOR).pack(fill="x")
+        date_str = entry.get('timestamp', '???')[:16].replace('T', ' ')
+        ex_name = entry.get('exercise_name', self.controller.loc.get("unknown"))
+        
+        ctk.CTkLabel(row, text=f"📅 {date_str}", font=("Helvetica Neue", 12), 
+                    text_color=HIGHLIGHT_COLOR).pack(anchor="w")
+        ctk.CTkLabel(row, text=f"✅ {self.controller.loc.get('completed')}: {ex_name}", 
+                    font=("Helvetica Neue", 14, "bold"), text_color=TEXT_HEADER_COLOR).pack(anchor="w", pady=(2, 10))
+        ctk.CTkFrame(row, height=1, fg_color=CARD_BG_COLOR).pack(fill="x")
     
     def update_texts(self):
         """Обновляет тексты на фрейме."""
@@ -54,6 +54,7 @@ class LocalizationManager:
                 'workout_complete': 'Тренировка успешно завершена!',
                 'workout_history': 'История тренировок',
                 'no_history': 'История тренировок пуста',
+                'load_more': 'Показать еще',
                 'progress': 'Прогресс',
                 'logout': 'Выйти',
                 'lang_btn': 'EN',
@@ -100,6 +101,7 @@ class LocalizationManager:
                 'workout_complete': 'Workout successfully completed!',
                 'workout_history': 'Workout History',
                 'no_history': 'Workout history is empty',
+                'load_more': 'Load more',
                 'progress': 'Progress',
                 'logout': 'Logout',
                 'lang_btn': 'RU',
@@ -0,0 +1,257 @@
+# async_server.py
+import asyncio
+import json
+import time
+from models import DatabaseManager
+import routes
+from server import (execute_request, attach_request_id, check_rate_limit, encode_response,
+                    handler_error_response, start_capture, start_metrics, LoggerObserver)
+from worker_pool import RequestWorkerPool, ServerBusy, busy_response
+from framing import FrameError, RECV_SIZE
+from protocol import ConnectionProtocol, is_hello
+from server_log import log
+from metrics import registry as metrics
+from connections import (ConnectionRegistry, configure_keepalive, raise_nofile_limit,
+                         server_full_response)
+from rate_limit import RateLimiter
+from response_cache import ResponseCache
+
+# Буфер StreamReader: кадры режет FrameDecoder, здесь только запас под одно чтение
+STREAM_LIMIT = 2 * RECV_SIZE
+
+class AsyncClient:
+    """Состояние соединения для ConnectionRegistry."""
+
+    def __init__(self, reader, writer, protocol):
+        self.reader = reader
+        self.writer = writer
+        self.protocol = protocol
+        self.tasks = set()
+        self.executing = False
+        self.last_activity = time.monotonic()
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def is_busy(self):
+        return self.executing or bool(self.tasks)
+
+    def close_idle(self):
+        # reader.read() в задаче соединения завершится, и она закроется сама
+        self.writer.transport.abort()
+
+    def begin_drain(self, notice):
+        """Уведомляет клиента об остановке; reader.read() вернет b"" после уже полученных данных."""
+        self.writer.write(self.protocol.encode(notice))
+        self.writer.transport.pause_reading()
+        self.reader.feed_eof()
+
+class AsyncServer:
+    """Сервер на asyncio: все соединения обслуживает один цикл событий,
+    блокирующие обработчики routes.* выполняются в RequestWorkerPool."""
+
+    def __init__(self, config, db_manager, logger, nofile_limit=None):
+        self.config = config
+        self.db_manager = db_manager
+        self.logger = logger
+        self.pool = RequestWorkerPool(config.executor_workers, config.queue_size, config.retry_after_ms)
+        self.connections = ConnectionRegistry(config.connection_limit(nofile_limit), config.idle_timeout)
+        self.limiter = RateLimiter(config.rate_limits())
+        self.cache = ResponseCache(db_manager, routes.NUTRITION_PLANS_FILE)
+        self.capture = start_capture(config)
+        self.writers = set()
+
+    async def execute(self, request):
+        """Выполняет запрос в пуле; при переполненной очереди возвращает ответ busy."""
+        try:
+            future = self.pool.submit(execute_request, request, self.db_manager)
+        except ServerBusy as busy:
+            return attach_request_id(request, busy_response(busy))
+        return await asyncio.wrap_future(future)
+
+    def encode(self, protocol, request, response):
+        return protocol.frame(encode_response(self.cache, protocol.codec, request, response))
+
+    def send_cached(self, writer, protocol, request, request_bytes):
+        """Пишет ответ из кэша готовых ответов; False, если ответа там нет."""
+        payload = self.cache.lookup(request, protocol.codec)
+        if payload is None:
+            return False
+        data = protocol.frame(payload)
+        writer.write(data)
+        metrics.record_payload(request, request_bytes, len(data))
+        return True
+
+    async def run_pipelined(self, request, writer, protocol, inflight, request_bytes):
+        try:
+            try:
+                response = await self.execute(request)
+            except Exception as e:
+                response = handler_error_response(request, e)
+            data = self.encode(protocol, request, response)
+            writer.write(data)
+            metrics.record_payload(request, request_bytes, len(data))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            inflight.release()
+
+    async def handle_connection(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        if not self.connections.acquire():
+            # Сверх лимита - сразу отказ, без чтения запросов
+            writer.write(json.dumps(server_full_response(self.config.retry_after_ms)).encode("utf-8") + b"\n")
+            writer.close()
+            return
+        configure_keepalive(writer.get_extra_info("socket"), self.config.keepalive_idle)
+        self.writers.add(writer)
+        metrics.counter("connections_accepted").inc()
+        protocol = ConnectionProtocol(self.config.compress_threshold)
+        client = AsyncClient(reader, writer, protocol)
+        self.connections.add(client)
+
+        # Запросы с id в режиме pipelining выполняются параллельно, не более max_inflight
+        inflight = asyncio.Semaphore(self.config.max_inflight)
+        rate_buckets = self.limiter.new_connection()
+        capture_id = self.capture.new_connection() if self.capture is not None else None
+        tasks = client.tasks
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                client.touch()
+
+                protocol.decoder.feed(data)
+                while True:
+                    # Декодер берется заново: рукопожатие hello может его заменить
+                    frame = protocol.decoder.next_frame()
+                    if frame is None:
+                        break
+
+                    try:
+                        request = protocol.decode(frame)
+                    except ValueError:
+                        writer.write(protocol.encode(protocol.decode_error()))
+                        await writer.drain()
+                        continue
+
+                    log.info("Получен запрос", sampled=True, addr=addr, request=request)
+                    if self.capture is not None and not is_hello(request):
+                        self.capture.record(capture_id, request)
+                    pipelined = self.config.pipelining and isinstance(request, dict) and "id" in request
+                    if pipelined and not is_hello(request):
+                        throttled = check_rate_limit(self.limiter, rate_buckets, request)
+                        if throttled:
+                            writer.write(protocol.encode(throttled))
+                            await writer.drain()
+                            continue
+                        if self.send_cached(writer, protocol, request, len(frame)):
+                            await writer.drain()
+                            continue
+                        await inflight.acquire()
+                        task = asyncio.create_task(self.run_pipelined(request, writer, protocol, inflight, len(frame)))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                        continue
+
+                    # Запрос без id (и hello) выполняется строго после всех предыдущих
+                    if tasks:
+                        await asyncio.gather(*tasks, return_exceptions=True)
+                    throttled = None if is_hello(request) else check_rate_limit(self.limiter, rate_buckets, request)
+                    if is_hello(request):
+                        writer.write(protocol.negotiate(request))
+                    elif throttled:
+                        writer.write(protocol.encode(throttled))
+                    elif not self.send_cached(writer, protocol, request, len(frame)):
+                        client.executing = True
+                        try:
+                            data = self.encode(protocol, request, await self.execute(request))
+                        finally:
+                            client.executing = False
+                        writer.write(data)
+                        metrics.record_payload(request, len(frame), len(data))
+                    await writer.drain()
+        except FrameError as e:
+            writer.write(protocol.encode({"error": e.message}))
+        except ConnectionError:
+            pass
+        except Exception as e:
+            log.error("Ошибка с клиентом", addr=addr, error=e)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.writers.discard(writer)
+            writer.close()
+            self.connections.release(client)
+
+    async def reap_idle(self):
+        """Периодически закрывает простаивающие соединения (в цикле событий, без потока)."""
+        while True:
+            await asyncio.sleep(self.connections.reap_interval())
+            self.connections.reap()
+
+    async def serve(self, stop_event):
+        server = await asyncio.start_server(
+            self.handle_connection,
+            self.config.host,
+            self.config.port,
+            limit=STREAM_LIMIT,
+            backlog=self.config.backlog,
+            reuse_address=True,
+            reuse_port=self.config.reuse_port or None
+        )
+        log.info(f"Сервер запущен на {self.config.host}:{self.config.port} (asyncio)")
+        reaper = asyncio.create_task(self.reap_idle()) if self.connections.idle_timeout else None
+
+        try:
+            # stop_event - это threading.Event, поэтому опрашиваем его, не блокируя цикл
+            while not stop_event.is_set():
+                await asyncio.sleep(0.5)
+        finally:
+            if reaper:
+                reaper.cancel()
+            server.close()
+            await self.drain()
+            for writer in list(self.writers):
+                writer.close()
+            await server.wait_closed()
+            self.pool.shutdown()
+
+    async def drain(self):
+        """Плавная остановка: server_shutdown клиентам, ожидание запросов в работе до drain_timeout."""
+        started = time.monotonic()
+        notified = self.connections.begin_drain(self.config.reconnect_jitter_ms)
+        deadline = started + self.config.drain_timeout
+        while self.connections.count() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        remaining = self.connections.count()
+        if remaining:
+            self.connections.abort_all()
+        log.info("Соединения закрыты", notified=notified, forced=remaining,
+                 seconds=round(time.monotonic() - started, 3))
+
+def run_async_server(stop_event, logger_func, config):
+    limit = raise_nofile_limit()
+    if limit is not None:
+        log.info("Лимит открытых дескрипторов", limit=limit)
+
+    db_manager = DatabaseManager(**config.database_options())
+    logger = LoggerObserver()
+    server = AsyncServer(config, db_manager, logger, limit)
+    snapshots = start_metrics(config, server.pool, server.connections, server.limiter, server.cache,
+                              server.capture, db_manager)
+
+    asyncio.run(server.serve(stop_event))
+    db_manager.engine.dispose()
+    if snapshots:
+        snapshots.stop()
+    if server.capture is not None:
+        server.capture.stop()
+    log.info("Пул запросов", **server.pool.stats())
+    log.info("Соединения", **server.connections.stats())
+    log.info("Кэш ответов", **server.cache.stats())
+    log.info("Задержки по действиям:\n" + metrics.format_action_table())
+    log.info("Сервер остановлен", log_dropped=log.dropped)
+    log.flush()
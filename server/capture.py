@@ -0,0 +1,83 @@
+# capture.py
+# Запись входящих запросов в JSONL-файл для последующего воспроизведения
+# (benchmarks/replay.py). Включается флагом --capture-file; пароли, телефоны и
+# токены в файл не попадают. Запись выполняет фоновый поток, обработчики только
+# кладут запрос в очередь.
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+from server_log import log, redact
+
+QUEUE_SIZE = 10000
+
+class TrafficCapture:
+    """Дописывает в файл строки {"ts": время, "conn": id соединения, "request": запрос}.
+
+    Файл открывается на дозапись: перезапуск сервера продолжает тот же файл.
+    {pid} в пути заменяется на pid процесса (у каждого воркера свой файл).
+    Если очередь переполнена, запрос не записывается и учитывается в dropped.
+    """
+
+    def __init__(self, path, queue_size=QUEUE_SIZE):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self._queue = queue.Queue(queue_size)
+        self._connections = itertools.count(1)
+        self._prefix = f"{os.getpid()}-"
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+        log.info("Запись запросов", file=self.path)
+        return self
+
+    def new_connection(self):
+        """id соединения в файле; уникален и между воркерами."""
+        return self._prefix + str(next(self._connections))
+
+    def record(self, connection_id, request):
+        try:
+            self._queue.put_nowait((time.time(), connection_id, request))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        """Дописывает очередь и закрывает файл."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                lines = []
+                # Забираем все, что накопилось, и пишем одним вызовом
+                while item is not None:
+                    created, connection_id, request = item
+                    record = {"ts": round(created, 6), "conn": connection_id, "request": redact(request)}
+                    try:
+                        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+                    except (TypeError, ValueError):
+                        self.dropped += 1
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.write("".join(lines))
+                f.flush()
+                self.written += len(lines)
+                if item is None:
+                    return
+
+    def stats(self):
+        return {"file": self.path, "written": self.written, "dropped": self.dropped,
+                "queue_depth": self._queue.qsize()}
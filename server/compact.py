@@ -0,0 +1,201 @@
+# compact.py
+# Компактная двоичная кодировка сообщений протокола (только стандартная библиотека).
+#
+# Типы JSON кодируются тегом в один байт; целые - zigzag varint; строки - UTF-8 с длиной.
+# Каждая новая строка получает номер, и ее повтор в том же сообщении кодируется ссылкой
+# на номер. В истории тренировок одни и те же ключи и названия упражнений повторяются
+# в каждой записи, поэтому ссылки дают основную экономию.
+import struct
+
+TAG_NONE = 0x00
+TAG_FALSE = 0x01
+TAG_TRUE = 0x02
+TAG_INT = 0x03
+TAG_FLOAT = 0x04
+TAG_STR = 0x05
+TAG_STR_REF = 0x06
+TAG_LIST = 0x07
+TAG_DICT = 0x08
+
+# Защита декодера от враждебных данных
+MAX_DEPTH = 64
+
+_DOUBLE = struct.Struct(">d")
+
+class CompactDecodeError(ValueError):
+    """Некорректное или обрезанное сообщение."""
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def encode(obj):
+    """Кодирует JSON-совместимый объект в bytes."""
+    out = bytearray()
+    strings = {}
+    _encode(obj, out, strings, 0)
+    return bytes(out)
+
+def _encode_str(value, out, strings):
+    ref = strings.get(value)
+    if ref is not None:
+        out.append(TAG_STR_REF)
+        _write_varint(out, ref)
+        return
+    strings[value] = len(strings)
+    data = value.encode("utf-8")
+    out.append(TAG_STR)
+    _write_varint(out, len(data))
+    out += data
+
+def _encode(obj, out, strings, depth):
+    if depth > MAX_DEPTH:
+        raise ValueError("Слишком глубокая вложенность")
+
+    if isinstance(obj, str):
+        _encode_str(obj, out, strings)
+    elif obj is None:
+        out.append(TAG_NONE)
+    elif obj is True:
+        out.append(TAG_TRUE)
+    elif obj is False:
+        out.append(TAG_FALSE)
+    elif isinstance(obj, int):
+        out.append(TAG_INT)
+        _write_varint(out, (obj << 1) if obj >= 0 else ((-obj << 1) - 1))
+    elif isinstance(obj, float):
+        out.append(TAG_FLOAT)
+        out += _DOUBLE.pack(obj)
+    elif isinstance(obj, (list, tuple)):
+        out.append(TAG_LIST)
+        _write_varint(out, len(obj))
+        for item in obj:
+            _encode(item, out, strings, depth + 1)
+    elif isinstance(obj, dict):
+        out.append(TAG_DICT)
+        _write_varint(out, len(obj))
+        for key, value in obj.items():
+            # Как и в JSON, ключи всегда строки
+            _encode_str(key if isinstance(key, str) else str(key), out, strings)
+            _encode(value, out, strings, depth + 1)
+    else:
+        raise TypeError(f"Тип {type(obj).__name__} не поддерживается")
+
+class _NoRefs(dict):
+    """Таблица строк, которая никогда не находит повторов: все строки пишутся целиком."""
+
+    def get(self, key, default=None):
+        return None
+
+def append_field(encoded, key, value):
+    """Добавляет пару key: value в конец уже закодированного словаря, не декодируя его.
+
+    Номера строк исходного сообщения без разбора неизвестны, поэтому строки
+    добавки пишутся целиком, без ссылок.
+    """
+    reader = _Reader(memoryview(encoded))
+    if reader.byte() != TAG_DICT:
+        raise ValueError("Ожидался закодированный словарь")
+    count = reader.varint()
+    out = bytearray([TAG_DICT])
+    _write_varint(out, count + 1)
+    out += reader.data[reader.pos:]
+    strings = _NoRefs()
+    _encode_str(key, out, strings)
+    _encode(value, out, strings, 0)
+    return bytes(out)
+
+class _Reader:
+    __slots__ = ("data", "pos", "strings")
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+
+    def byte(self):
+        if self.pos >= len(self.data):
+            raise CompactDecodeError("Неожиданный конец сообщения")
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self):
+        result = 0
+        shift = 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+            if shift > 70 * 7:
+                raise CompactDecodeError("Слишком длинное целое")
+
+    def take(self, size):
+        end = self.pos + size
+        if end > len(self.data):
+            raise CompactDecodeError("Неожиданный конец сообщения")
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+def decode(data):
+    """Декодирует bytes, полученные из encode()."""
+    reader = _Reader(memoryview(data))
+    value = _decode(reader, 0)
+    if reader.pos != len(reader.data):
+        raise CompactDecodeError("Лишние байты после сообщения")
+    return value
+
+def _decode_str(reader, tag):
+    if tag == TAG_STR:
+        try:
+            value = str(reader.take(reader.varint()), "utf-8")
+        except UnicodeDecodeError as e:
+            raise CompactDecodeError(f"Некорректный UTF-8: {e}")
+        reader.strings.append(value)
+        return value
+    if tag == TAG_STR_REF:
+        index = reader.varint()
+        if index >= len(reader.strings):
+            raise CompactDecodeError("Ссылка на несуществующую строку")
+        return reader.strings[index]
+    raise CompactDecodeError(f"Ожидалась строка, тег {tag:#x}")
+
+def _decode(reader, depth):
+    if depth > MAX_DEPTH:
+        raise CompactDecodeError("Слишком глубокая вложенность")
+
+    tag = reader.byte()
+    if tag == TAG_STR or tag == TAG_STR_REF:
+        return _decode_str(reader, tag)
+    if tag == TAG_NONE:
+        return None
+    if tag == TAG_TRUE:
+        return True
+    if tag == TAG_FALSE:
+        return False
+    if tag == TAG_INT:
+        raw = reader.varint()
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1)
+    if tag == TAG_FLOAT:
+        return _DOUBLE.unpack(reader.take(8))[0]
+    if tag == TAG_LIST:
+        count = reader.varint()
+        # Каждый элемент занимает хотя бы байт - не даем выделить огромный список
+        if count > len(reader.data) - reader.pos:
+            raise CompactDecodeError("Длина списка больше сообщения")
+        return [_decode(reader, depth + 1) for _ in range(count)]
+    if tag == TAG_DICT:
+        count = reader.varint()
+        if count * 2 > len(reader.data) - reader.pos:
+            raise CompactDecodeError("Длина словаря больше сообщения")
+        result = {}
+        for _ in range(count):
+            key = _decode_str(reader, reader.byte())
+            result[key] = _decode(reader, depth + 1)
+        return result
+    raise CompactDecodeError(f"Неизвестный тег {tag:#x}")
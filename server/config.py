@@ -0,0 +1,103 @@
+# config.py
+
+HOST = '0.0.0.0'
+PORT = 65432
+
+ENGINES = ("threaded", "asyncio")
+# Дескрипторы, не занятые соединениями: слушающий сокет, база, журналы, файлы снимков
+FD_RESERVE = 64
+
+class ServerConfig:
+    """Настройки запуска сервера (движок, адрес, размеры пулов)."""
+
+    def __init__(self, host=HOST, port=PORT, engine="threaded", executor_workers=16, backlog=1024,
+                 queue_size=256, retry_after_ms=200, reuse_port=False, pipelining=False, max_inflight=32,
+                 compress_threshold=1024, log_level="info", log_sample_rate=1.0,
+                 stats_file=None, stats_interval=10.0, max_connections=None, idle_timeout=300,
+                 keepalive_idle=60, drain_timeout=10.0, reconnect_jitter_ms=5000,
+                 read_rate=50.0, write_rate=10.0, rate_burst_seconds=4.0, idempotency_ttl=600,
+                 capture_file=None, db_pool_size=None, db_max_overflow=4, db_pool_timeout=10.0,
+                 user_cache_size=100000):
+        if engine not in ENGINES:
+            raise ValueError(f"Неизвестный движок сервера: {engine}")
+        self.host = host
+        self.port = port
+        # threaded - поток на соединение, asyncio - один цикл событий на все соединения
+        self.engine = engine
+        # Сколько блокирующих обработчиков routes.* может выполняться одновременно
+        self.executor_workers = executor_workers
+        # Сколько запросов может ждать свободного обработчика; сверх этого - ответ "busy"
+        self.queue_size = queue_size
+        # Через сколько миллисекунд клиенту предлагается повторить отклоненный запрос
+        self.retry_after_ms = retry_after_ms
+        # Очередь ожидающих accept() соединений
+        self.backlog = backlog
+        # SO_REUSEPORT: несколько процессов слушают один порт, ядро распределяет соединения
+        self.reuse_port = reuse_port
+        # Запросы с полем id из одного соединения выполняются параллельно,
+        # ответы уходят по готовности (порядок не гарантирован, сопоставление по id)
+        self.pipelining = pipelining
+        # Сколько запросов одного соединения может выполняться одновременно
+        self.max_inflight = max_inflight if pipelining else 1
+        # Ответы от этого размера (байт) сжимаются, если клиент согласовал zlib в hello
+        self.compress_threshold = compress_threshold
+        # Журнал: минимальный уровень и доля запросов, попадающих в журнал
+        self.log_level = log_level
+        self.log_sample_rate = log_sample_rate
+        # Файл, куда периодически пишется снимок показателей (как ответ server_stats)
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        # Сверх этого числа соединений новые сразу получают отказ server_full (0 - без лимита,
+        # None - по лимиту открытых файлов процесса, см. connection_limit)
+        self.max_connections = max_connections
+        # Соединение без входящих данных и запросов в работе дольше этого (сек) закрывается (0 - никогда)
+        self.idle_timeout = idle_timeout
+        # Через сколько секунд тишины ядро начинает проверять, жив ли клиент (TCP keepalive)
+        self.keepalive_idle = keepalive_idle
+        # При остановке: сколько ждать завершения запросов в работе (сек)
+        self.drain_timeout = drain_timeout
+        # Клиентам предлагается переподключиться через случайную паузу до N мс
+        self.reconnect_jitter_ms = reconnect_jitter_ms
+        # Лимиты запросов в секунду на соединение и на пользователя (0 - без лимита);
+        # запас ведра - rate_burst_seconds секунд такого потока
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+        self.rate_burst_seconds = rate_burst_seconds
+        # Сколько секунд помнить ответы на запросы записи с idempotency_key (0 - не помнить)
+        self.idempotency_ttl = idempotency_ttl
+        # Файл JSONL, куда записываются входящие запросы для benchmarks/replay.py (None - не писать)
+        self.capture_file = capture_file
+        # Пул соединений с БД: по умолчанию по соединению на каждый обработчик, чтобы
+        # занятый пул не стал очередью перед пулом обработчиков
+        self.db_pool_size = db_pool_size if db_pool_size else executor_workers
+        self.db_max_overflow = db_max_overflow
+        # Сколько секунд обработчик ждет свободного соединения с БД
+        self.db_pool_timeout = db_pool_timeout
+        # Сколько имен пользователей помнить в кэше username -> id (0 - без кэша)
+        self.user_cache_size = user_cache_size
+
+    def rate_limits(self):
+        return {
+            "read": (self.read_rate, self.read_rate * self.rate_burst_seconds),
+            "write": (self.write_rate, self.write_rate * self.rate_burst_seconds),
+        }
+
+    def database_options(self):
+        """Параметры DatabaseManager."""
+        return {"pool_size": self.db_pool_size, "max_overflow": self.db_max_overflow,
+                "pool_timeout": self.db_pool_timeout, "user_cache_size": self.user_cache_size}
+
+    def connection_limit(self, nofile_limit):
+        """Лимит соединений: заданный явно или лимит открытых файлов за вычетом FD_RESERVE.
+
+        Сверх лимита дескрипторов accept() все равно упал бы с EMFILE, а так клиент
+        получает server_full. nofile_limit None (Windows) - без лимита.
+        """
+        if self.max_connections is not None:
+            return self.max_connections
+        if nofile_limit is None:
+            return 0
+        return max(1, nofile_limit - FD_RESERVE)
+
+    def __repr__(self):
+        return f"<ServerConfig({self.engine} {self.host}:{self.port})>"
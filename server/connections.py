@@ -0,0 +1,209 @@
+# connections.py
+# Учет открытых соединений: лимит одновременных соединений, закрытие простаивающих
+# и настройка TCP keepalive, чтобы "мертвые" клиенты не держали поток и сокет.
+import random
+import socket
+import threading
+import time
+
+from metrics import registry as metrics
+from server_log import log
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Проверки keepalive после keepalive_idle секунд тишины: раз в KEEPALIVE_INTERVAL
+# секунд, после KEEPALIVE_COUNT неотвеченных проверок ядро закрывает соединение
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 5
+
+def raise_nofile_limit():
+    """Поднимает мягкий лимит открытых файлов до жесткого: каждое соединение - это дескриптор."""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        target = hard if hard != resource.RLIM_INFINITY else max(soft, 65536)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return soft
+
+def configure_keepalive(sock, idle):
+    """Включает TCP keepalive; idle <= 0 оставляет системные настройки."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if idle <= 0:
+        return
+    # TCP_KEEPIDLE есть в Linux, в macOS аналог - TCP_KEEPALIVE
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPALIVE", idle),
+                        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL), ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        option = getattr(socket, name, None)
+        if option is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError:
+                pass
+
+def server_full_response(retry_after_ms):
+    """Ответ новому клиенту, когда достигнут лимит соединений."""
+    return {
+        "action": "server_full",
+        "success": False,
+        "retry_after_ms": retry_after_ms,
+        "message": "Слишком много подключений, повторите позже"
+    }
+
+def shutdown_notice(reconnect_jitter_ms):
+    """Уведомление клиенту об остановке сервера.
+
+    Задержка переподключения у каждого клиента своя (случайная), чтобы после
+    перезапуска они не пришли все одновременно.
+    """
+    return {
+        "action": "server_shutdown",
+        "success": False,
+        "retry_after_ms": random.randint(reconnect_jitter_ms // 10, reconnect_jitter_ms),
+        "message": "Сервер перезапускается, соединение будет закрыто после текущих запросов"
+    }
+
+class ConnectionRegistry:
+    """Открытые соединения сервера.
+
+    Соединение - любой объект с полем last_activity (time.monotonic()), методом
+    is_busy() (есть запросы в работе), методом close_idle(), который закрывает
+    его так, чтобы поток или задача соединения завершились сами, и методом
+    begin_drain(notice): отправить уведомление и перестать читать запросы,
+    дописав ответы на уже принятые.
+    """
+
+    def __init__(self, max_connections=0, idle_timeout=0):
+        # 0 - без ограничения
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.closed = threading.Condition(self.lock)
+        self.connections = set()
+        self.draining = None
+        self.reserved = 0
+        self.rejected = 0
+        self.reaped = 0
+        self.peak = 0
+
+    def acquire(self):
+        """Занимает место под новое соединение; False, если лимит исчерпан."""
+        with self.lock:
+            if self.max_connections and self.reserved >= self.max_connections:
+                self.rejected += 1
+                return False
+            self.reserved += 1
+            self.peak = max(self.peak, self.reserved)
+        metrics.gauge("connections").inc()
+        return True
+
+    def add(self, connection):
+        """Начинает следить за простоем соединения, место под которое уже занято."""
+        with self.lock:
+            self.connections.add(connection)
+            notice = self.draining
+        if notice is not None:
+            # Соединение принято перед самой остановкой - сразу переводим в остановку
+            self._drain_one(connection, notice)
+
+    def release(self, connection=None):
+        with self.lock:
+            self.connections.discard(connection)
+            self.reserved -= 1
+            self.closed.notify_all()
+        metrics.gauge("connections").dec()
+
+    def begin_drain(self, reconnect_jitter_ms):
+        """Уведомляет все соединения об остановке; новые запросы они больше не читают."""
+        with self.lock:
+            self.draining = reconnect_jitter_ms
+            connections = list(self.connections)
+        for connection in connections:
+            self._drain_one(connection, reconnect_jitter_ms)
+        return len(connections)
+
+    def _drain_one(self, connection, reconnect_jitter_ms):
+        try:
+            connection.begin_drain(shutdown_notice(reconnect_jitter_ms))
+        except OSError:
+            pass
+
+    def wait_closed(self, timeout):
+        """Ждет закрытия всех соединений (для движка threaded); возвращает число оставшихся."""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.reserved > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.closed.wait(remaining)
+            return self.reserved
+
+    def abort_all(self):
+        """Закрывает соединения, не успевшие завершиться за время остановки."""
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.close_idle()
+            except OSError:
+                pass
+        return len(connections)
+
+    def count(self):
+        return self.reserved
+
+    def reap(self, now=None):
+        """Закрывает соединения без входящих данных дольше idle_timeout; возвращает их число."""
+        if not self.idle_timeout:
+            return 0
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            idle = [c for c in self.connections
+                    if now - c.last_activity > self.idle_timeout and not c.is_busy()]
+            # Место освобождается в release(), когда соединение действительно закроется
+            self.connections.difference_update(idle)
+        for connection in idle:
+            try:
+                connection.close_idle()
+            except OSError:
+                pass
+        if idle:
+            with self.lock:
+                self.reaped += len(idle)
+            log.info("Закрыты простаивающие соединения", count=len(idle), open=self.reserved)
+        return len(idle)
+
+    def reap_interval(self):
+        return max(0.5, min(self.idle_timeout / 4, 5.0))
+
+    def start_reaper(self, stop_event):
+        """Фоновый поток, периодически вызывающий reap(); для движка threaded."""
+        if not self.idle_timeout:
+            return None
+
+        def run():
+            while not stop_event.wait(self.reap_interval()):
+                self.reap()
+
+        thread = threading.Thread(target=run, name="connection-reaper", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self.lock:
+            return {
+                "open": self.reserved,
+                "peak": self.peak,
+                "max_connections": self.max_connections,
+                "idle_timeout": self.idle_timeout,
+                "rejected": self.rejected,
+                "reaped": self.reaped,
+            }
@@ -0,0 +1,162 @@
+# framing.py
+# Общий для сервера и клиента разбор потока байт на кадры протокола.
+# Модуль не импортирует ничего из сервера, чтобы клиент мог подключать его как server.framing.
+
+# Максимальный размер одного кадра (байт); больше - ошибка протокола
+MAX_FRAME_SIZE = 4 * 1024 * 1024
+# Размер одного чтения из сокета
+RECV_SIZE = 64 * 1024
+# Размер префикса длины в формате "length"
+LENGTH_PREFIX_SIZE = 4
+
+# Старший бит префикса длины помечает кадр, сжатый потоковым zlib соединения
+COMPRESSED_FLAG = 0x80000000
+
+class FrameError(ValueError):
+    """Нарушение формата кадров; соединение дальше читать нельзя."""
+    message = "Invalid frame"
+
+class FrameTooLarge(FrameError):
+    """Кадр превысил max_frame_size."""
+    message = "Frame too large"
+
+class _BufferedDecoder:
+    """Общая часть декодеров: накопление байт в bytearray и выдача целых кадров."""
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, recv_size=RECV_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+        self.recv_size = recv_size
+        # Буфер под recv_into выделяется при первом чтении: asyncio-движок его не использует
+        self._chunk = None
+        self._chunk_view = None
+
+    def recv_from(self, sock):
+        """Читает из сокета через recv_into; возвращает число байт (0 - соединение закрыто)."""
+        if self._chunk is None:
+            self._chunk = bytearray(self.recv_size)
+            self._chunk_view = memoryview(self._chunk)
+        n = sock.recv_into(self._chunk)
+        if n:
+            self._buffer += self._chunk_view[:n]
+        return n
+
+    def feed(self, data):
+        """Добавляет уже прочитанные байты (например, из asyncio.StreamReader)."""
+        self._buffer += data
+
+    def next_frame(self):
+        """Возвращает следующий целый кадр (bytes) или None, если его еще нет."""
+        raise NotImplementedError
+
+    def frames(self):
+        """Возвращает список готовых непустых кадров; неполный хвост остается в буфере."""
+        result = []
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return result
+            result.append(frame)
+
+    def pending(self):
+        """Сколько байт неполного кадра ждет продолжения."""
+        return len(self._buffer)
+
+    def take_pending(self):
+        """Забирает необработанные байты - при смене формата кадров после рукопожатия."""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+class FrameDecoder(_BufferedDecoder):
+    """Инкрементальный декодер кадров, разделенных b"\\n".
+
+    Байты копятся в одном bytearray, поиск разделителя продолжается с места,
+    где закончился прошлый поиск, поэтому разбор линеен по объему данных.
+    Наружу отдаются только целые кадры (bytes): многобайтовый UTF-8 символ,
+    разрезанный границей recv(), больше не портится - json.loads декодирует
+    кадр целиком.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, recv_size=RECV_SIZE, delimiter=b"\n"):
+        super().__init__(max_frame_size, recv_size)
+        self.delimiter = delimiter
+        self._scan_from = 0
+
+    def next_frame(self):
+        buffer = self._buffer
+        while True:
+            end = buffer.find(self.delimiter, self._scan_from)
+            if end == -1:
+                # Разделитель мог прийти не полностью - его начало ищем заново
+                self._scan_from = max(0, len(buffer) - len(self.delimiter) + 1)
+                if len(buffer) > self.max_frame_size:
+                    raise FrameTooLarge(f"Кадр больше {self.max_frame_size} байт")
+                return None
+            if end > self.max_frame_size:
+                raise FrameTooLarge(f"Кадр {end} байт больше {self.max_frame_size}")
+
+            frame = bytes(buffer[:end])
+            # Удаление из начала bytearray в CPython не перекладывает весь буфер каждый раз
+            del buffer[:end + len(self.delimiter)]
+            self._scan_from = 0
+            if frame:
+                return frame
+
+    def take_pending(self):
+        self._scan_from = 0
+        return super().take_pending()
+
+class LengthPrefixDecoder(_BufferedDecoder):
+    """Декодер кадров вида: длина (4 байта, big-endian) + содержимое.
+
+    Если задан decompressor (zlib.decompressobj), кадры с флагом COMPRESSED_FLAG
+    распаковываются одним потоковым контекстом на все соединение.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, recv_size=RECV_SIZE):
+        super().__init__(max_frame_size, recv_size)
+        self.decompressor = None
+
+    def next_frame(self):
+        buffer = self._buffer
+        while len(buffer) >= LENGTH_PREFIX_SIZE:
+            header = int.from_bytes(buffer[:LENGTH_PREFIX_SIZE], "big")
+            size = header & ~COMPRESSED_FLAG
+            if size > self.max_frame_size:
+                raise FrameTooLarge(f"Кадр {size} байт больше {self.max_frame_size}")
+            end = LENGTH_PREFIX_SIZE + size
+            if len(buffer) < end:
+                return None
+
+            frame = bytes(buffer[LENGTH_PREFIX_SIZE:end])
+            del buffer[:end]
+            if header & COMPRESSED_FLAG:
+                frame = self._decompress(frame)
+            if frame:
+                return frame
+        return None
+
+    def _decompress(self, frame):
+        if self.decompressor is None:
+            raise FrameError("Сжатый кадр без согласованного сжатия")
+        # Ограничение на распакованный размер - защита от "zip-бомбы"
+        data = self.decompressor.decompress(frame, self.max_frame_size + 1)
+        if len(data) > self.max_frame_size or self.decompressor.unconsumed_tail:
+            raise FrameTooLarge(f"Распакованный кадр больше {self.max_frame_size}")
+        return data
+
+def encode_line(payload):
+    """Кадр протокола JSON-строк."""
+    return payload + b"\n"
+
+def encode_length_prefixed(payload, compressed=False):
+    """Кадр с префиксом длины; compressed ставит флаг сжатия."""
+    header = len(payload) | (COMPRESSED_FLAG if compressed else 0)
+    return header.to_bytes(LENGTH_PREFIX_SIZE, "big") + payload
+
+# Форматы кадров, которые можно выбрать рукопожатием: имя -> (декодер, кодировщик кадра)
+FRAMINGS = {
+    "newline": (FrameDecoder, encode_line),
+    "length": (LengthPrefixDecoder, encode_length_prefixed),
+}
@@ -0,0 +1,129 @@
+# idempotency.py
+# Ключи идемпотентности для изменяющих действий. Клиент, не получивший ответ
+# (оборвалось соединение), повторяет запрос с тем же ключом - и получает первый
+# ответ, а не вторую запись WorkoutHistory или SavedPlan.
+import threading
+import time
+from collections import OrderedDict
+
+# Поле запроса с ключом; ключ выбирает клиент (например, uuid4().hex)
+IDEMPOTENCY_FIELD = "idempotency_key"
+MAX_KEY_LENGTH = 128
+# Сколько секунд помнить ответ по ключу
+DEFAULT_TTL = 600
+# Ограничения памяти: ключей на пользователя и пользователей всего
+MAX_KEYS_PER_USER = 64
+MAX_USERS = 10000
+# Сколько повтор ждет ответа на тот же запрос, если он еще выполняется (сек)
+IN_PROGRESS_WAIT = 30.0
+
+def is_valid_key(key):
+    return isinstance(key, str) and 0 < len(key) <= MAX_KEY_LENGTH
+
+class _Entry:
+    __slots__ = ("response", "expires", "done")
+
+    def __init__(self, expires):
+        self.response = None
+        self.expires = expires
+        self.done = threading.Event()
+
+class IdempotencyStore:
+    """Ответы на запросы с ключом идемпотентности за последние ttl секунд.
+
+    Ключи хранятся отдельно для каждого пользователя: (действие, ключ) -> ответ.
+    Запоминаются только успешные ответы - после ошибки повтор выполняется заново.
+    Хранилище свое у каждого процесса-воркера.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.replayed = 0
+
+    def configure(self, ttl):
+        with self.lock:
+            self.ttl = ttl
+            self.users.clear()
+
+    def execute(self, username, action, key, run):
+        """Выполняет run() один раз на (пользователь, действие, ключ); повтор получает копию ответа."""
+        if self.ttl <= 0:
+            return run()
+        while True:
+            entry, owner = self._claim(username, (action, key))
+            if owner:
+                return self._run(username, (action, key), entry, run)
+            # Тот же запрос еще выполняется (повтор пришел по новому соединению)
+            if not entry.done.wait(IN_PROGRESS_WAIT):
+                return {"action": action, "success": False,
+                        "message": "Запрос с этим ключом еще выполняется, повторите позже"}
+            if entry.response is not None:
+                with self.lock:
+                    self.replayed += 1
+                return dict(entry.response, replayed=True)
+            # Первая попытка завершилась ошибкой - выполняем заново
+
+    def _claim(self, username, entry_key):
+        now = time.monotonic()
+        with self.lock:
+            entries = self.users.get(username)
+            if entries is None:
+                entries = self.users[username] = OrderedDict()
+                if len(self.users) > MAX_USERS:
+                    self.users.popitem(last=False)
+            else:
+                self.users.move_to_end(username)
+            # Ключи добавляются по порядку, поэтому истекшие - в начале
+            while entries:
+                oldest = next(iter(entries.values()))
+                if oldest.expires > now or not oldest.done.is_set():
+                    break
+                entries.popitem(last=False)
+
+            entry = entries.get(entry_key)
+            if entry is not None and (entry.expires > now or not entry.done.is_set()):
+                return entry, False
+            entry = entries[entry_key] = _Entry(now + self.ttl)
+            entries.move_to_end(entry_key)
+            if len(entries) > MAX_KEYS_PER_USER:
+                entries.popitem(last=False)
+            return entry, True
+
+    def _run(self, username, entry_key, entry, run):
+        try:
+            response = run()
+        except Exception:
+            self._forget(username, entry_key, entry)
+            raise
+        if isinstance(response, dict) and response.get("success") is True:
+            entry.response = dict(response)
+            entry.expires = time.monotonic() + self.ttl
+            with self.lock:
+                self.executed += 1
+            entry.done.set()
+        else:
+            self._forget(username, entry_key, entry)
+        return response
+
+    def _forget(self, username, entry_key, entry):
+        with self.lock:
+            entries = self.users.get(username)
+            if entries is not None and entries.get(entry_key) is entry:
+                del entries[entry_key]
+        entry.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "ttl": self.ttl,
+                "users": len(self.users),
+                "keys": sum(len(entries) for entries in self.users.values()),
+                "executed": self.executed,
+                "replayed": self.replayed,
+            }
+
+# Общее хранилище процесса: ключи проверяются в routes для действий kind="write"
+store = IdempotencyStore()
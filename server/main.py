@@ -1,10 +1,14 @@
 # main.py
+import argparse
+import signal
 import threading
 import sys
 import os
 
 # Импортируем Server, константы и функции для запуска из server.py
-from server import run_server, HOST, PORT, LoggerObserver 
+from server import run_server, HOST, PORT, LoggerObserver
+from config import ServerConfig, ENGINES, FD_RESERVE
+from server_log import LEVELS
 # Импортируем DatabaseManager, чтобы гарантировать создание таблиц перед запуском сервера
 from models import DatabaseManager
 
@@ -12,20 +16,131 @@ def mock_log(message):
     """Простая функция логирования для консоли."""
     print(f"[LOG] {message}")
 
-def start_server():
+def parse_args(argv=None):
+    """Разбирает параметры командной строки сервера."""
+    parser = argparse.ArgumentParser(description="Fitness App Server")
+    parser.add_argument("--host", default=HOST, help="Адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=PORT, help="Порт для прослушивания")
+    parser.add_argument("--engine", choices=ENGINES, default="threaded",
+                        help="threaded - поток на соединение, asyncio - цикл событий")
+    parser.add_argument("--executor-workers", type=int, default=16,
+                        help="Размер пула обработчиков запросов")
+    parser.add_argument("--queue-size", type=int, default=256,
+                        help="Длина очереди запросов, сверх нее сервер отвечает busy")
+    parser.add_argument("--retry-after-ms", type=int, default=200,
+                        help="Подсказка клиенту, когда повторить отклоненный запрос")
+    parser.add_argument("--backlog", type=int, default=1024, help="Очередь listen()")
+    parser.add_argument("--pipelining", action="store_true",
+                        help="Выполнять запросы с id параллельно и отвечать по готовности")
+    parser.add_argument("--max-inflight", type=int, default=32,
+                        help="Лимит параллельных запросов одного соединения (--pipelining)")
+    parser.add_argument("--compress-threshold", type=int, default=1024,
+                        help="Сжимать ответы от этого размера, если клиент согласовал zlib")
+    parser.add_argument("--log-level", choices=LEVELS, default="info", help="Минимальный уровень журнала")
+    parser.add_argument("--log-sample-rate", type=float, default=1.0,
+                        help="Доля запросов, записываемых в журнал (0..1)")
+    parser.add_argument("--stats-file", default=None,
+                        help="JSON-файл снимков показателей; {pid} заменяется на pid воркера")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Период записи --stats-file, сек")
+    parser.add_argument("--max-connections", type=int, default=None,
+                        help="Лимит одновременных соединений, 0 - без лимита; по умолчанию - "
+                             f"лимит открытых файлов (ulimit -n, поднимается до жесткого) минус {FD_RESERVE}")
+    parser.add_argument("--idle-timeout", type=float, default=300,
+                        help="Закрывать соединения без активности дольше N секунд, 0 - никогда")
+    parser.add_argument("--keepalive-idle", type=int, default=60,
+                        help="TCP keepalive: секунд тишины до первой проверки клиента")
+    parser.add_argument("--drain-timeout", type=float, default=10.0,
+                        help="При остановке ждать завершения запросов в работе не дольше N секунд")
+    parser.add_argument("--read-rate", type=float, default=50.0,
+                        help="Лимит запросов чтения в секунду на соединение и на пользователя, 0 - без лимита")
+    parser.add_argument("--write-rate", type=float, default=10.0,
+                        help="Лимит запросов записи в секунду на соединение и на пользователя, 0 - без лимита")
+    parser.add_argument("--rate-burst-seconds", type=float, default=4.0,
+                        help="Допустимый всплеск запросов: лимит за N секунд сразу")
+    parser.add_argument("--idempotency-ttl", type=float, default=600,
+                        help="Сколько секунд повтор запроса записи с тем же idempotency_key получает прежний ответ")
+    parser.add_argument("--capture-file", default=None,
+                        help="Записывать входящие запросы в JSONL-файл (без паролей) для benchmarks/replay.py")
+    parser.add_argument("--db-pool-size", type=int, default=0,
+                        help="Соединений с БД в пуле, 0 - по числу --executor-workers")
+    parser.add_argument("--db-max-overflow", type=int, default=4,
+                        help="Сколько соединений с БД можно открыть сверх пула при пиках")
+    parser.add_argument("--db-pool-timeout", type=float, default=10.0,
+                        help="Сколько секунд ждать свободного соединения с БД")
+    parser.add_argument("--user-cache-size", type=int, default=100000,
+                        help="Сколько имен пользователей помнить в кэше username -> id, 0 - без кэша")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Число процессов-воркеров на одном порту (SO_REUSEPORT)")
+    return parser.parse_args(argv)
+
+def start_server(config=None, workers=1):
     """Инициализирует и запускает сервер в главном потоке."""
-    print(f"--- Запуск Fitness App Server на {HOST}:{PORT} ---")
-    
+    config = config or ServerConfig()
+    print(f"--- Запуск Fitness App Server на {config.host}:{config.port} ({config.engine}, воркеров: {workers}) ---")
+
     # Инициализация DatabaseManager, которая создает файл БД ('fitness_app.db') и таблицы.
     try:
-        DatabaseManager() 
+        # Соединения родителя не должны достаться воркерам после fork()
+        DatabaseManager().engine.dispose()
         print(f"[INFO] База данных инициализирована. Файл: fitness_app.db")
     except Exception as e:
         print(f"[FATAL] Ошибка инициализации базы данных: {e}")
         return
 
+    if workers > 1:
+        from supervisor import WorkerSupervisor
+        WorkerSupervisor(config, workers, mock_log).run()
+        return
+
     stop_event = threading.Event()
-    run_server(stop_event, mock_log)
+    
+    def request_stop(signum, frame):
+        # Первый сигнал - плавная остановка, повторный Ctrl+C прерывает ее
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("[INFO] Остановка: дорабатываем запросы в работе...")
+        stop_event.set()
+    
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    try:
+        run_server(stop_event, mock_log, config)
+    except KeyboardInterrupt:
+        stop_event.set()
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    args = parse_args()
+    if args.stats_file and args.workers > 1 and "{pid}" not in args.stats_file:
+        # Каждый воркер пишет свой файл
+        args.stats_file += ".{pid}"
+    if args.capture_file and args.workers > 1 and "{pid}" not in args.capture_file:
+        args.capture_file += ".{pid}"
+    start_server(ServerConfig(
+        host=args.host,
+        port=args.port,
+        engine=args.engine,
+        executor_workers=args.executor_workers,
+        backlog=args.backlog,
+        queue_size=args.queue_size,
+        retry_after_ms=args.retry_after_ms,
+        pipelining=args.pipelining,
+        max_inflight=args.max_inflight,
+        compress_threshold=args.compress_threshold,
+        log_level=args.log_level,
+        log_sample_rate=args.log_sample_rate,
+        stats_file=args.stats_file,
+        stats_interval=args.stats_interval,
+        max_connections=args.max_connections,
+        idle_timeout=args.idle_timeout,
+        keepalive_idle=args.keepalive_idle,
+        drain_timeout=args.drain_timeout,
+        read_rate=args.read_rate,
+        write_rate=args.write_rate,
+        rate_burst_seconds=args.rate_burst_seconds,
+        idempotency_ttl=args.idempotency_ttl,
+        capture_file=args.capture_file,
+        db_pool_size=args.db_pool_size,
+        db_max_overflow=args.db_max_overflow,
+        db_pool_timeout=args.db_pool_timeout,
+        user_cache_size=args.user_cache_size
+    ), workers=args.workers)
@@ -0,0 +1,266 @@
+# metrics.py
+# Показатели сервера: гистограммы задержек по действиям протокола и запросам к БД,
+# счетчики, датчики (соединения, потоки) и размер запросов/ответов.
+# Обновляются из потоков пула, поэтому каждое значение под своей блокировкой.
+import json
+import os
+import threading
+import time
+
+# Гистограмма в духе HdrHistogram: 64 линейных корзины на каждую степень двойки,
+# относительная погрешность не больше 1/64 (~1.6%) во всем диапазоне
+SUB_BUCKET_BITS = 6
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Значения в микросекундах, верхняя граница ~ 1 час
+MAX_TRACKABLE_US = 3600 * 1000 * 1000
+PERCENTILES = (50, 90, 99, 99.9)
+
+def _bucket_index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+def _bucket_value(index):
+    """Середина диапазона значений корзины."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    low = (index - shift * SUB_BUCKETS) << shift
+    return low + (1 << shift) // 2
+
+class LatencyHistogram:
+    """Распределение длительностей с постоянной памятью и быстрыми перцентилями."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (_bucket_index(MAX_TRACKABLE_US) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1_000_000), 0), MAX_TRACKABLE_US)
+        index = _bucket_index(value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_us += value
+            if value > self.max_us:
+                self.max_us = value
+
+    def snapshot(self):
+        """count, среднее, перцентили и максимум в миллисекундах."""
+        with self.lock:
+            counts = list(self.counts)
+            count, total_us, max_us = self.count, self.total_us, self.max_us
+
+        result = {"count": count, "avg_ms": round(total_us / count / 1000, 3) if count else 0.0}
+        targets = [(p, count * p / 100) for p in PERCENTILES]
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if not bucket_count:
+                continue
+            seen += bucket_count
+            while targets and seen >= targets[0][1]:
+                p, _ = targets.pop(0)
+                result[f"p{p:g}_ms".replace(".", "_")] = round(min(_bucket_value(index), max_us) / 1000, 3)
+            if not targets:
+                break
+        for p, _ in targets:
+            result[f"p{p:g}_ms".replace(".", "_")] = 0.0
+        result["max_ms"] = round(max_us / 1000, 3)
+        return result
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+class Gauge:
+    """Текущее значение (например, число открытых соединений)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+class ActionMetrics:
+    """Накопленные показатели одного действия."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        # Исключения в обработчике
+        self.errors = 0
+        # Ответы с success=False (пользователь не найден и т.п.)
+        self.failures = 0
+        self.payloads = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def observe(self, seconds, error=False, failure=False):
+        self.latency.record(seconds)
+        if error or failure:
+            with self.lock:
+                if error:
+                    self.errors += 1
+                else:
+                    self.failures += 1
+
+    def add_payload(self, request_bytes, response_bytes):
+        with self.lock:
+            self.payloads += 1
+            self.request_bytes += request_bytes
+            self.response_bytes += response_bytes
+
+    def snapshot(self):
+        result = self.latency.snapshot()
+        with self.lock:
+            payloads = self.payloads or 1
+            result.update(
+                errors=self.errors,
+                failures=self.failures,
+                avg_request_bytes=self.request_bytes // payloads,
+                avg_response_bytes=self.response_bytes // payloads,
+            )
+        return result
+
+class MetricsRegistry:
+    """Показатели процесса.
+
+    Кроме собственных значений, снимок включает "поставщиков" - функции,
+    которые движок регистрирует при запуске (статистика пула запросов, журнала).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.actions = {}
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.providers = {}
+
+    def _get(self, table, name, factory):
+        item = table.get(name)
+        if item is None:
+            with self.lock:
+                item = table.setdefault(name, factory())
+        return item
+
+    def action(self, name):
+        return self._get(self.actions, name, lambda: ActionMetrics(name))
+
+    def histogram(self, name):
+        return self._get(self.histograms, name, LatencyHistogram)
+
+    def counter(self, name):
+        return self._get(self.counters, name, Counter)
+
+    def gauge(self, name):
+        return self._get(self.gauges, name, Gauge)
+
+    def register_provider(self, name, fn):
+        self.providers[name] = fn
+
+    def record_payload(self, request, request_bytes, response_bytes):
+        """Размер кадров запроса и ответа; вызывается сервером после отправки."""
+        action = request.get("action") if isinstance(request, dict) else None
+        if isinstance(action, str) and action in self.actions:
+            self.actions[action].add_payload(request_bytes, response_bytes)
+
+    def action_table(self):
+        return {name: metrics.snapshot() for name, metrics in sorted(self.actions.items())}
+
+    def snapshot(self):
+        """Все показатели одним словарем (ответ server_stats и файл снимков)."""
+        actions = self.action_table()
+        counters = {name: counter.value for name, counter in sorted(self.counters.items())}
+        counters["requests"] = sum(row["count"] for row in actions.values())
+        counters["errors"] = sum(row["errors"] for row in actions.values())
+        gauges = {name: gauge.value for name, gauge in sorted(self.gauges.items())}
+        gauges["threads"] = threading.active_count()
+
+        result = {
+            "time": round(time.time(), 3),
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "counters": counters,
+            "gauges": gauges,
+            "actions": actions,
+            "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+        }
+        for name, fn in list(self.providers.items()):
+            try:
+                result[name] = fn()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
+
+    def format_action_table(self):
+        """Таблица задержек по действиям для журнала."""
+        lines = [f"{'action':<24} {'count':>8} {'errors':>7} {'fail':>6} {'p50 ms':>8} {'p99 ms':>8} "
+                 f"{'max ms':>9} {'req B':>8} {'resp B':>9}"]
+        for name, row in self.action_table().items():
+            if not row["count"]:
+                continue
+            lines.append(f"{name:<24} {row['count']:>8} {row['errors']:>7} {row['failures']:>6} "
+                         f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['max_ms']:>9.3f} "
+                         f"{row['avg_request_bytes']:>8} {row['avg_response_bytes']:>9}")
+        return "\n".join(lines)
+
+class SnapshotWriter:
+    """Периодически записывает снимок показателей в JSON-файл.
+
+    Файл заменяется атомарно (запись во временный и os.replace), поэтому внешний
+    скрипт может читать его в любой момент. "{pid}" в пути заменяется на pid
+    процесса - для режима --workers, где каждый воркер пишет свой файл.
+    """
+
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+        self.write()
+
+    def write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.registry.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+# Общий реестр процесса
+registry = MetricsRegistry()
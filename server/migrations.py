@@ -0,0 +1,106 @@
+# migrations.py
+# Версионные миграции схемы SQLite. Base.metadata.create_all создает только
+# отсутствующие таблицы, а к существующим не добавляет ни индексы, ни столбцы:
+# рабочий fitness_app.db догоняет models.py миграциями из этого списка.
+# Номер примененной миграции хранится в PRAGMA user_version файла базы.
+#
+# Правила для новой миграции:
+# - номер на 1 больше последнего, уже выпущенные миграции не меняются;
+# - после нее существующая база совпадает с тем, что create_all создает для
+#   новой базы (новая база сразу получает последний номер, см. upgrade);
+# - DDL только через IF NOT EXISTS / add_column: миграцию можно повторить.
+import argparse
+import os
+import time
+
+from server_log import log
+
+def add_column(conn, table, name, ddl):
+    """ALTER TABLE ADD COLUMN, если столбца еще нет. ddl - тип и ограничения ("INTEGER DEFAULT 0")."""
+    columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+    if name not in columns:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+def _user_time_indexes(conn):
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_progress_user_timestamp "
+                         "ON progress (user_id, timestamp DESC)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_saved_plans_user_created_at "
+                         "ON saved_plans (user_id, created_at DESC)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_workout_history_user_completed_at "
+                         "ON workout_history (user_id, completed_at DESC)")
+
+# (номер, описание, функция(conn)); после функции в user_version записывается
+# номер. pysqlite выполняет DDL вне транзакции: если процесс прервется между
+# ними, при следующем запуске миграция повторится
+MIGRATIONS = [
+    (1, "Индексы (user_id, время desc) для прогресса, планов и истории", _user_time_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def current_version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def pending(engine):
+    """Миграции, еще не примененные к базе."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def upgrade(engine, fresh=False):
+    """Применяет недостающие миграции по порядку; возвращает итоговый номер.
+
+    fresh - база только что создана create_all по текущим моделям: миграции ей
+    не нужны, записывается последний номер.
+    """
+    if engine.dialect.name != "sqlite":
+        return None
+    if fresh:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {LATEST_VERSION}")
+        return LATEST_VERSION
+
+    version = None
+    for number, description, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            # Номер перечитывается перед каждой миграцией: другой процесс мог ее уже применить
+            version = current_version(conn)
+            if number <= version:
+                continue
+            started = time.monotonic()
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+            version = number
+        log.info("Миграция базы применена", version=number, description=description,
+                 seconds=round(time.monotonic() - started, 3))
+    if version is None:
+        with engine.connect() as conn:
+            version = current_version(conn)
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы сервера")
+    parser.add_argument("--db", default="fitness_app.db", help="Файл SQLite")
+    parser.add_argument("--status", action="store_true", help="Только показать версию и недостающие миграции")
+    args = parser.parse_args()
+
+    # Миграции не создают базу (это делает DatabaseManager при запуске сервера)
+    if not os.path.exists(args.db):
+        parser.error(f"Файл базы не найден: {args.db}")
+
+    from sqlalchemy import create_engine
+    engine = create_engine(f"sqlite:///{args.db}")
+    try:
+        todo = pending(engine)
+        for number, description, _ in todo:
+            print(f"{number}: {description}")
+        if args.status:
+            print(f"Недостающих миграций: {len(todo)} (последняя - {LATEST_VERSION})")
+            return
+        print(f"Версия схемы: {upgrade(engine)}")
+    finally:
+        engine.dispose()
+        log.flush()
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,35 @@
 # models.py
 import json
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, make_url, tuple_, Column, Index, Integer, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
+from metrics import registry as metrics
+from user_cache import MAX_ENTRIES as USER_CACHE_SIZE, UserIdCache
+import migrations
 
 # --- SQLAlchemy Setup ---
 DATABASE_URL = "sqlite:///fitness_app.db"
+
+# Настройки SQLite для каждого соединения пула. WAL: читатели не блокируют
+# писателя и друг друга; synchronous=NORMAL в WAL не теряет целостность при сбое
+# процесса (только последние транзакции при отключении питания); busy_timeout -
+# писатель ждет блокировку, а не получает сразу "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,           # мс
+    "cache_size": -16384,           # КиБ (16 МиБ на соединение)
+    "mmap_size": 256 * 1024 * 1024, # байт
+    "temp_store": "MEMORY",
+}
+# Пул соединений: по умолчанию по одному на обработчик (--executor-workers)
+POOL_SIZE = 16
+POOL_MAX_OVERFLOW = 4
+# Сколько секунд запрос ждет свободного соединения, прежде чем получить ошибку
+POOL_TIMEOUT = 10.0
 Base = declarative_base()
 
 # 1. Модель пользователя
@@ -71,298 +94,451 @@ class WorkoutHistory(Base):
     
     user = relationship("User", back_populates="workout_history")
 
+# Прогресс, планы и история всегда читаются по пользователю от новых к старым:
+# составной индекс отдает строки уже в нужном порядке, без полного просмотра
+# таблицы и сортировки. В существующие базы их добавляет migrations.py
+Index("ix_progress_user_timestamp", Progress.user_id, Progress.timestamp.desc())
+Index("ix_saved_plans_user_created_at", SavedPlan.user_id, SavedPlan.created_at.desc())
+Index("ix_workout_history_user_completed_at", WorkoutHistory.user_id, WorkoutHistory.completed_at.desc())
+
+# --- БАЗА ТРЕНИРОВОК В СТИЛЕ NIKE TRAINING CLUB ---
+EXERCISE_CATALOG = {
+    "Новичок": {
+        "Похудение": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Суставная гимнастика (2 мин)",
+                "🔥 РАЗМИНКА: Бег на месте с высоким бедром (1 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с весом тела (3 подхода по 15 повторений)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания от колен (3 подхода по 10 повторений)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады на месте (3 подхода по 12 повторений на ногу)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка (3 подхода по 30 секунд)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Скручивания (3 подхода по 15 повторений)",
+                "🧘 ЗАМИНКА: Растяжка всего тела (5 мин)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Эллипсоид легкий темп (5 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим ногами в тренажере (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга верхнего блока к груди (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим гантелей сидя (3x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Разгибание ног в тренажере (3x15)",
+                "🔴 КАРДИО-ФИНИШЕР: Гребной тренажер (3 интервала по 30 сек)",
+                "🧘 ЗАМИНКА: Растяжка квадрицепса у стены"
+            ]
+        },
+        "Набор мышц": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Вращения руками и наклоны (3 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Классические отжимания (4 подхода по максимуму)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Болгарские выпады (со стулом) (3x10 на ногу)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Обратные отжимания от стула (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания с резиной (3x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Скручивания 'Бабочка' (3x15)",
+                "🧘 ЗАМИНКА: Растяжка грудных мышц в проеме"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Велотренажер (5 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим штанги лежа (3x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с гантелей (Кубок) (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга штанги в наклоне (3x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Сгибание рук на бицепс (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Французский жим (3x12)",
+                "🧘 ЗАМИНКА: Вис на перекладине (30 сек)"
+            ]
+        },
+        "Выносливость": {
+            "Дом": [
+                "🔥 FLOW: Приветствие солнцу (Yoga) (3 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Джампинг Джеки (40 сек работа / 20 отдых) x 5",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Берпи (без отжимания) (30 сек работа / 30 отдых) x 5",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Боксирование с тенью (40 сек работа / 20 отдых) x 5",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Прыжки на месте (1 мин работа / 30 отдых) x 3",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Альпинист (40 сек работа / 20 отдых) x 5",
+                "🧘 ЗАМИНКА: Глубокое дыхание (2 мин)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Беговая дорожка (шаг в гору) (5 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Трастеры с легкими гантелями (4x15)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Махи гирей (русский стиль) (4x15)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Прыжки на тумбу (или зашагивания) (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Бёрпи с прыжком (4x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (500м на время)",
+                "🧘 ЗАМИНКА: МФР ролл на спину (3 мин)"
+            ]
+        }
+    },
+    "Средний": {
+        "Похудение": {
+            "Дом": [
+                "🔥 ACTIVATION: Ягодичный мостик (20 раз)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с выпрыгиванием (4x15)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания с касанием плеча (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады в прыжке (3x12 на ногу)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка-паук (3x45 сек)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Русские скручивания (3x20)",
+                "🧘 ЗАМИНКА: Растяжка ягодиц лежа (2 мин)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Скакалка (3 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга (4x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим гантелей на наклонной скамье (4x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания широким хватом (3xMAX)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим ногами (4x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: МЕТКОН: 500м гребля на время",
+                "🧘 ЗАМИНКА: Растяжка задней поверхности бедра"
+            ]
+        },
+        "Набор мышц": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Динамическая планка (2 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания ноги на возвышении (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания пистолетик (с опорой) (3x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга бутылок с водой/гантелей в наклоне (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания домиком (Pike pushups) (3x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъем ног в висе (3x15)",
+                "🧘 ЗАМИНКА: 'Кобра' (растяжка пресса)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Разминка ротаторной манжеты (2 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания со штангой (5x5)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Армейский жим стоя (4x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания с весом (4x6)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга штанги к подбородку (3x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гиперэкстензия (3x15)",
+                "🧘 ЗАМИНКА: МФР квадрицепсов (3 мин)"
+            ]
+        },
+        "Выносливость": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Бег на месте с захлестом (2 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: AMRAP 15 мин (Как можно больше раундов):",
+                "➡️ 20 Выпадов",
+                "➡️ 15 Ситапов (пресс)",
+                "➡️ 10 Берпи",
+                "➡️ 5 Подтягиваний",
+                "➡️ 30 Скакалка",
+                "🧘 ЗАМИНКА: Медитация (3 мин)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: 1 км легкий бег",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Беговая дорожка (1 мин спринт / 2 мин шаг) x 6",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Круг: Подтягивания (5) -> Отжимания (10) -> Приседания (15) x 5",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (2 мин максимально) x 3",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Велотренажер (5 мин высокое сопротивление)",
+                "🧘 ЗАМИНКА: Статическая растяжка всего тела (5 мин)"
+            ]
+        }
+    },
+    "Продвинутый": {
+        "Похудение": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Скакалка двойные прыжки (2 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Берпи с прыжком в длину (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Взрывные отжимания (с хлопком) (4x10)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады со сменой ног в прыжке (4x12 на ногу)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка с касанием плеч (3x60 сек)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъемы корпуса (4x20)",
+                "🧘 ЗАМИНКА: Йога 'Собака мордой вниз' (2 мин)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Эйрбайк (Assault Bike) (3 мин)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: КОМПЛЕКС 'BEAR': Взятие на грудь + Фронтальный присед + Жим (5x5)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Запрыгивания на коробку (4x15)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга сумо (4x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (1000м на время)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Бёрпи с перепрыгиванием через штангу (3x15)",
+                "🧘 ЗАМИНКА: Глубокая растяжка с резиной"
+            ]
+        },
+        "Набор мышц": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Мобильность плеч и таза",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания в стойке на руках (у стены) (4xMAX)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания на одной руке (прогрессия) (4x3)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания 'Креветка' (4x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания на брусьях (4x12)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъемы ног к перекладине (4x10)",
+                "🧘 ЗАМИНКА: Расслабление шеи и трапеции"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: 500м гребля",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга (классика) (5x3)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим лежа с паузой (5x5)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания со штангой на груди (4x6)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга Т-грифа (4x8)",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Суперсет Бицепс/Трицепс (4x12)",
+                "🧘 ЗАМИНКА: Вис вниз головой (инверсионный стол)"
+            ]
+        },
+        "Выносливость": {
+            "Дом": [
+                "🔥 РАЗМИНКА: Суставная 3 мин",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: CHALLENGE '100':",
+                "➡️ 100 Приседаний",
+                "➡️ 100 Отжиманий",
+                "➡️ 100 Пресс",
+                "➡️ 100 Берпи (разбить на подходы)",
+                "➡️ 100 Подтягиваний",
+                "➡️ 100 Выпадов",
+                "🧘 ЗАМИНКА: Полное расслабление (Шавасана)"
+            ],
+            "Зал": [
+                "🔥 РАЗМИНКА: Бег 10 мин",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: CROSSFIT WOD 'MURPH' (Адаптация):",
+                "➡️ 800м бег",
+                "➡️ 50 подтягиваний",
+                "➡️ 100 отжиманий",
+                "➡️ 150 приседаний",
+                "➡️ 800м бег",
+                "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Эйрбайк (5 мин максимальное усилие)",
+                "🧘 ЗАМИНКА: МФР всего тела"
+            ]
+        }
+    }
+}
+
+def _instrument_queries(engine):
+    """Время каждого SQL-запроса попадает в гистограмму db.<тип запроса>."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        words = statement.split(None, 1)
+        kind = words[0].lower() if words else "other"
+        metrics.histogram(f"db.{kind}").record(time.perf_counter() - context._query_started)
+
+def _apply_pragmas(engine, pragmas):
+    """Выполняет PRAGMA на каждом новом соединении пула (до первого запроса)."""
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def _track_user_changes(session_factory, cache):
+    """Сбрасывает в cache имена пользователей, измененных в сессии, после ее commit или rollback."""
+    @event.listens_for(session_factory, "after_flush")
+    def after_flush(session, flush_context):
+        names = session.info.setdefault("changed_usernames", set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User):
+                names.add(obj.username)
+                # При переименовании сбрасывается и старое имя
+                names.update(inspect(obj).attrs.username.history.deleted or ())
+
+    def flush_names(session):
+        names = session.info.pop("changed_usernames", None)
+        if names:
+            cache.invalidate(names)
+
+    # После rollback тоже: get_user_id мог закэшировать id, видимый только внутри транзакции
+    event.listen(session_factory, "after_commit", flush_names)
+    event.listen(session_factory, "after_rollback", flush_names)
+
+def _keyset_page(query, time_column, id_column, limit, before):
+    """Строки от новых к старым по (время, id), строго после ключа before.
+    
+    Следующая страница начинается там, где закончилась предыдущая, по индексу
+    (user_id, время desc), без OFFSET: стоимость не зависит от ее номера.
+    Возвращает (строки, ключ следующей страницы или None); limit=None - все строки.
+    """
+    if before is not None:
+        query = query.filter(tuple_(time_column, id_column) < before)
+    query = query.order_by(time_column.desc(), id_column.desc())
+    if limit is None:
+        return query.all(), None
+    # Лишняя строка показывает, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, (getattr(last, time_column.key), last.id)
+
+def _engine_options(url, pool_size, max_overflow, pool_timeout):
+    """Параметры пула для create_engine: у SQLite в памяти свой пул без размеров."""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {"pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": pool_timeout}
+
 class DatabaseManager:
     """Управление БД и хранение данных в стиле Nike Training Club."""
-    def __init__(self, db_url=DATABASE_URL):
-        self.engine = create_engine(db_url)
+    def __init__(self, db_url=DATABASE_URL, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 pool_timeout=POOL_TIMEOUT, pragmas=None, user_cache_size=USER_CACHE_SIZE):
+        """pragmas - настройки SQLite поверх SQLITE_PRAGMAS ({} - оставить умолчания SQLite);
+        user_cache_size - сколько имен пользователей помнить в кэше id (0 - без кэша)."""
+        url = make_url(db_url)
+        self.engine = create_engine(url, **_engine_options(url, pool_size, max_overflow, pool_timeout))
+        self.pragmas = {}
+        if url.get_backend_name() == "sqlite":
+            self.pragmas = dict(SQLITE_PRAGMAS) if pragmas is None else dict(pragmas)
+            _apply_pragmas(self.engine, self.pragmas)
+        _instrument_queries(self.engine)
+        # Новая база создается сразу по текущим моделям, существующая догоняет их миграциями
+        fresh = not inspect(self.engine).has_table(User.__tablename__)
         Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        migrations.upgrade(self.engine, fresh=fresh)
+        # Сессия живет один запрос, и ответ строится до commit: истекать после
+        # commit объектам незачем (это обход всей identity map на каждом запросе)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.user_ids = UserIdCache(user_cache_size)
+        _track_user_changes(self.Session, self.user_ids)
         
-        # --- БАЗА ТРЕНИРОВОК В СТИЛЕ NIKE TRAINING CLUB ---
-        self.exercises = {
-            "Новичок": {
-                "Похудение": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Суставная гимнастика (2 мин)",
-                        "🔥 РАЗМИНКА: Бег на месте с высоким бедром (1 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с весом тела (3 подхода по 15 повторений)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания от колен (3 подхода по 10 повторений)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады на месте (3 подхода по 12 повторений на ногу)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка (3 подхода по 30 секунд)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Скручивания (3 подхода по 15 повторений)",
-                        "🧘 ЗАМИНКА: Растяжка всего тела (5 мин)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Эллипсоид легкий темп (5 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим ногами в тренажере (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга верхнего блока к груди (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим гантелей сидя (3x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Разгибание ног в тренажере (3x15)",
-                        "🔴 КАРДИО-ФИНИШЕР: Гребной тренажер (3 интервала по 30 сек)",
-                        "🧘 ЗАМИНКА: Растяжка квадрицепса у стены"
-                    ]
-                },
-                "Набор мышц": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Вращения руками и наклоны (3 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Классические отжимания (4 подхода по максимуму)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Болгарские выпады (со стулом) (3x10 на ногу)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Обратные отжимания от стула (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания с резиной (3x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Скручивания 'Бабочка' (3x15)",
-                        "🧘 ЗАМИНКА: Растяжка грудных мышц в проеме"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Велотренажер (5 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим штанги лежа (3x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с гантелей (Кубок) (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга штанги в наклоне (3x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Сгибание рук на бицепс (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Французский жим (3x12)",
-                        "🧘 ЗАМИНКА: Вис на перекладине (30 сек)"
-                    ]
-                },
-                "Выносливость": {
-                    "Дом": [
-                        "🔥 FLOW: Приветствие солнцу (Yoga) (3 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Джампинг Джеки (40 сек работа / 20 отдых) x 5",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Берпи (без отжимания) (30 сек работа / 30 отдых) x 5",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Боксирование с тенью (40 сек работа / 20 отдых) x 5",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Прыжки на месте (1 мин работа / 30 отдых) x 3",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Альпинист (40 сек работа / 20 отдых) x 5",
-                        "🧘 ЗАМИНКА: Глубокое дыхание (2 мин)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Беговая дорожка (шаг в гору) (5 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Трастеры с легкими гантелями (4x15)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Махи гирей (русский стиль) (4x15)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Прыжки на тумбу (или зашагивания) (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Бёрпи с прыжком (4x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (500м на время)",
-                        "🧘 ЗАМИНКА: МФР ролл на спину (3 мин)"
-                    ]
-                }
-            },
-            "Средний": {
-                "Похудение": {
-                    "Дом": [
-                        "🔥 ACTIVATION: Ягодичный мостик (20 раз)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания с выпрыгиванием (4x15)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания с касанием плеча (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады в прыжке (3x12 на ногу)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка-паук (3x45 сек)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Русские скручивания (3x20)",
-                        "🧘 ЗАМИНКА: Растяжка ягодиц лежа (2 мин)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Скакалка (3 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга (4x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим гантелей на наклонной скамье (4x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания широким хватом (3xMAX)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим ногами (4x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: МЕТКОН: 500м гребля на время",
-                        "🧘 ЗАМИНКА: Растяжка задней поверхности бедра"
-                    ]
-                },
-                "Набор мышц": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Динамическая планка (2 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания ноги на возвышении (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания пистолетик (с опорой) (3x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга бутылок с водой/гантелей в наклоне (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания домиком (Pike pushups) (3x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъем ног в висе (3x15)",
-                        "🧘 ЗАМИНКА: 'Кобра' (растяжка пресса)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Разминка ротаторной манжеты (2 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания со штангой (5x5)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Армейский жим стоя (4x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания с весом (4x6)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга штанги к подбородку (3x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гиперэкстензия (3x15)",
-                        "🧘 ЗАМИНКА: МФР квадрицепсов (3 мин)"
-                    ]
-                },
-                "Выносливость": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Бег на месте с захлестом (2 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: AMRAP 15 мин (Как можно больше раундов):",
-                        "➡️ 20 Выпадов",
-                        "➡️ 15 Ситапов (пресс)",
-                        "➡️ 10 Берпи",
-                        "➡️ 5 Подтягиваний",
-                        "➡️ 30 Скакалка",
-                        "🧘 ЗАМИНКА: Медитация (3 мин)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: 1 км легкий бег",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Беговая дорожка (1 мин спринт / 2 мин шаг) x 6",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Круг: Подтягивания (5) -> Отжимания (10) -> Приседания (15) x 5",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (2 мин максимально) x 3",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Велотренажер (5 мин высокое сопротивление)",
-                        "🧘 ЗАМИНКА: Статическая растяжка всего тела (5 мин)"
-                    ]
-                }
-            },
-            "Продвинутый": {
-                "Похудение": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Скакалка двойные прыжки (2 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Берпи с прыжком в длину (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Взрывные отжимания (с хлопком) (4x10)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Выпады со сменой ног в прыжке (4x12 на ногу)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Планка с касанием плеч (3x60 сек)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъемы корпуса (4x20)",
-                        "🧘 ЗАМИНКА: Йога 'Собака мордой вниз' (2 мин)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Эйрбайк (Assault Bike) (3 мин)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: КОМПЛЕКС 'BEAR': Взятие на грудь + Фронтальный присед + Жим (5x5)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Запрыгивания на коробку (4x15)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга сумо (4x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Гребной тренажер (1000м на время)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Бёрпи с перепрыгиванием через штангу (3x15)",
-                        "🧘 ЗАМИНКА: Глубокая растяжка с резиной"
-                    ]
-                },
-                "Набор мышц": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Мобильность плеч и таза",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания в стойке на руках (у стены) (4xMAX)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подтягивания на одной руке (прогрессия) (4x3)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания 'Креветка' (4x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Отжимания на брусьях (4x12)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Подъемы ног к перекладине (4x10)",
-                        "🧘 ЗАМИНКА: Расслабление шеи и трапеции"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: 500м гребля",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга (классика) (5x3)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Жим лежа с паузой (5x5)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Приседания со штангой на груди (4x6)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Тяга Т-грифа (4x8)",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Суперсет Бицепс/Трицепс (4x12)",
-                        "🧘 ЗАМИНКА: Вис вниз головой (инверсионный стол)"
-                    ]
-                },
-                "Выносливость": {
-                    "Дом": [
-                        "🔥 РАЗМИНКА: Суставная 3 мин",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: CHALLENGE '100':",
-                        "➡️ 100 Приседаний",
-                        "➡️ 100 Отжиманий",
-                        "➡️ 100 Пресс",
-                        "➡️ 100 Берпи (разбить на подходы)",
-                        "➡️ 100 Подтягиваний",
-                        "➡️ 100 Выпадов",
-                        "🧘 ЗАМИНКА: Полное расслабление (Шавасана)"
-                    ],
-                    "Зал": [
-                        "🔥 РАЗМИНКА: Бег 10 мин",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: CROSSFIT WOD 'MURPH' (Адаптация):",
-                        "➡️ 800м бег",
-                        "➡️ 50 подтягиваний",
-                        "➡️ 100 отжиманий",
-                        "➡️ 150 приседаний",
-                        "➡️ 800м бег",
-                        "⚡ ОСНОВНАЯ ТРЕНИРОВКА: Эйрбайк (5 мин максимальное усилие)",
-                        "🧘 ЗАМИНКА: МФР всего тела"
-                    ]
-                }
-            }
-        }
+        # Каталог общий для всех экземпляров: при --workers он создается до fork()
+        self.exercises = EXERCISE_CATALOG
         
+    def pool_stats(self):
+        """Соединения пула: сколько открыто, выдано обработчикам и создано сверх pool_size."""
+        pool = self.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {"class": type(pool).__name__}
+        return {
+            "class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "timeout": pool.timeout(),
+        }
+
+    def sqlite_settings(self):
+        """Фактические значения настроек из SQLITE_PRAGMAS на соединении пула."""
+        with self.engine.connect() as conn:
+            return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in SQLITE_PRAGMAS}
+
     def get_exercises(self, condition, level, goal):
         return self.exercises.get(level, {}).get(goal, {}).get(condition, None)
     
-    def save_training_plan(self, user_id, level, goal, condition):
+    @contextmanager
+    def unit_of_work(self):
+        """Одна сессия (и одно соединение пула) на весь запрос.
+        
+        В конце блока - один commit, при исключении - rollback; сессия закрывается
+        всегда, и соединение возвращается в пул даже на путях с ошибкой.
+        """
         session = self.Session()
-        new_plan = TrainingPlan(user_id=user_id, level=level, goal=goal, condition=condition)
-        session.add(new_plan)
-        session.commit()
-        session.close()
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @contextmanager
+    def _session(self, session):
+        """Сессия вызывающего (изменения войдут в его commit) или своя единица работы."""
+        if session is not None:
+            yield session
+        else:
+            with self.unit_of_work() as own:
+                yield own
+
+    def get_user_id(self, username, session=None):
+        """id пользователя по имени или None; повторные запросы отвечает кэш user_ids."""
+        found, user_id, generation = self.user_ids.get(username)
+        if found:
+            return user_id
+        with self._session(session) as session:
+            user_id = session.query(User.id).filter_by(username=username).scalar()
+        self.user_ids.put(username, user_id, generation)
+        return user_id
+
+    def save_training_plan(self, user_id, level, goal, condition, session=None):
+        with self._session(session) as session:
+            session.add(TrainingPlan(user_id=user_id, level=level, goal=goal, condition=condition))
     
-    def save_user_plan(self, user_id, plan_name, level, goal, condition, exercises):
+    def save_user_plan(self, user_id, plan_name, level, goal, condition, exercises, session=None):
         """Сохраняет план пользователя для повторного использования."""
-        session = self.Session()
-        saved_plan = SavedPlan(
-            user_id=user_id,
-            plan_name=plan_name,
-            level=level,
-            goal=goal,
-            condition=condition,
-            exercises=json.dumps(exercises)  # Сохраняем как JSON строку
-        )
-        session.add(saved_plan)
-        session.commit()
-        session.close()
-        return saved_plan.id
+        with self._session(session) as session:
+            saved_plan = SavedPlan(
+                user_id=user_id,
+                plan_name=plan_name,
+                level=level,
+                goal=goal,
+                condition=condition,
+                exercises=json.dumps(exercises)  # Сохраняем как JSON строку
+            )
+            session.add(saved_plan)
+            # id нужен до commit: его делает вызывающий (или _session в конце блока)
+            session.flush()
+            return saved_plan.id
     
-    def get_user_plans(self, user_id):
+    def get_user_plans(self, user_id, session=None):
         """Получает все сохраненные планы пользователя."""
-        session = self.Session()
-        plans = session.query(SavedPlan).filter_by(user_id=user_id).order_by(SavedPlan.created_at.desc()).all()
-        session.close()
-        
-        result = []
-        for plan in plans:
-            result.append({
-                "id": plan.id,
-                "name": plan.plan_name,
-                "date": plan.created_at.strftime("%Y-%m-%d"),
-                "level": plan.level,
-                "goal": plan.goal,
-                "condition": plan.condition,
-                "exercises": json.loads(plan.exercises)
-            })
-        return result
+        return self.get_user_plans_page(user_id, None, session=session)[0]
+    
+    def get_user_plans_page(self, user_id, limit, before=None, session=None):
+        """Страница планов от новых к старым: (планы, ключ следующей страницы или None)."""
+        with self._session(session) as session:
+            query = session.query(SavedPlan).filter_by(user_id=user_id)
+            plans, next_key = _keyset_page(query, SavedPlan.created_at, SavedPlan.id, limit, before)
+            return [self._plan_dict(plan) for plan in plans], next_key
     
-    def save_workout_history(self, user_id, workout_name, exercises, duration):
+    def save_workout_history(self, user_id, workout_name, exercises, duration, session=None):
         """Сохраняет историю тренировки."""
-        session = self.Session()
-        history = WorkoutHistory(
-            user_id=user_id,
-            workout_name=workout_name,
-            exercises=json.dumps(exercises),
-            duration=duration
-        )
-        session.add(history)
-        session.commit()
-        session.close()
-        return history.id
+        with self._session(session) as session:
+            history = WorkoutHistory(
+                user_id=user_id,
+                workout_name=workout_name,
+                exercises=json.dumps(exercises),
+                duration=duration
+            )
+            session.add(history)
+            session.flush()
+            return history.id
     
-    def get_workout_history(self, user_id):
+    def get_workout_history(self, user_id, session=None):
         """Получает историю тренировок пользователя."""
-        session = self.Session()
-        history = session.query(WorkoutHistory).filter_by(user_id=user_id).order_by(WorkoutHistory.completed_at.desc()).all()
-        session.close()
-        
-        result = []
-        for record in history:
-            result.append({
-                "id": record.id,
-                "workout_name": record.workout_name,
-                "exercises": json.loads(record.exercises),
-                "duration": record.duration,
-                "completed_at": record.completed_at.strftime("%Y-%m-%d %H:%M")
-            })
-        return result
+        return self.get_workout_history_page(user_id, None, session=session)[0]
+    
+    def get_workout_history_page(self, user_id, limit, before=None, session=None):
+        """Страница истории от новых к старым: (записи, ключ следующей страницы или None)."""
+        with self._session(session) as session:
+            query = session.query(WorkoutHistory).filter_by(user_id=user_id)
+            history, next_key = _keyset_page(query, WorkoutHistory.completed_at, WorkoutHistory.id, limit, before)
+            
+            result = []
+            for record in history:
+                result.append({
+                    "id": record.id,
+                    "workout_name": record.workout_name,
+                    "exercises": json.loads(record.exercises),
+                    "duration": record.duration,
+                    "completed_at": record.completed_at.strftime("%Y-%m-%d %H:%M")
+                })
+            return result, next_key
+    
+    def get_progress_history_page(self, user_id, limit, before=None, session=None):
+        """Страница отмеченных упражнений от новых к старым: (записи, ключ следующей страницы или None)."""
+        with self._session(session) as session:
+            query = session.query(Progress).filter_by(user_id=user_id)
+            records, next_key = _keyset_page(query, Progress.timestamp, Progress.id, limit, before)
+            return [{
+                "exercise_name": record.exercise_name,
+                "timestamp": record.timestamp.strftime("%Y-%m-%d %H:%M")
+            } for record in records], next_key
     
-    def get_saved_plan_by_id(self, plan_id, user_id):
+    def get_saved_plan_by_id(self, plan_id, user_id, session=None):
         """Получает сохраненный план по ID."""
-        session = self.Session()
-        plan = session.query(SavedPlan).filter_by(id=plan_id, user_id=user_id).first()
-        session.close()
-        
-        if plan:
-            return {
-                "id": plan.id,
-                "name": plan.plan_name,
-                "date": plan.created_at.strftime("%Y-%m-%d"),
-                "level": plan.level,
-                "goal": plan.goal,
-                "condition": plan.condition,
-                "exercises": json.loads(plan.exercises)
-            }
-        return None
\ No newline at end of file
+        with self._session(session) as session:
+            plan = session.query(SavedPlan).filter_by(id=plan_id, user_id=user_id).first()
+            if plan:
+                return self._plan_dict(plan)
+
+    @staticmethod
+    def _plan_dict(plan):
+        return {
+            "id": plan.id,
+            "name": plan.plan_name,
+            "date": plan.created_at.strftime("%Y-%m-%d"),
+            "level": plan.level,
+            "goal": plan.goal,
+            "condition": plan.condition,
+            "exercises": json.loads(plan.exercises)
+        }
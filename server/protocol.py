@@ -0,0 +1,144 @@
+# protocol.py
+import json
+import zlib
+
+import compact
+from framing import FRAMINGS, FrameDecoder, encode_line
+
+COMPRESSIONS = ("zlib",)
+# Ответы короче порога (подтверждения, ошибки) не сжимаются
+COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 6
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def encode(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    @staticmethod
+    def decode(data):
+        return json.loads(data)
+
+    @staticmethod
+    def append_field(encoded, key, value):
+        """Добавляет поле в конец закодированного словаря - как если бы оно было в нем при encode."""
+        field = json.dumps(key).encode("utf-8") + b": " + json.dumps(value).encode("utf-8")
+        if encoded == b"{}":
+            return b"{" + field + b"}"
+        return encoded[:-1] + b", " + field + b"}"
+
+class CompactCodec:
+    name = "compact"
+    encode = staticmethod(compact.encode)
+    decode = staticmethod(compact.decode)
+    append_field = staticmethod(compact.append_field)
+
+CODECS = {codec.name: codec for codec in (JsonCodec, CompactCodec)}
+
+class ConnectionProtocol:
+    """Формат кадров и кодировка одного соединения.
+
+    Новое соединение всегда начинает с JSON-строк ("newline" + "json"), поэтому
+    старые клиенты работают как прежде. Клиент может прислать
+    {"action": "hello", "framing": "length", "encoding": "compact"}: ответ уходит
+    еще в старом формате, а все следующие кадры в обе стороны - в новом.
+
+    С кадрами "length" можно также запросить "compression": "zlib". Ответы
+    длиннее compress_threshold сжимаются одним потоковым контекстом на все
+    соединение (Z_SYNC_FLUSH после каждого кадра), поэтому повторяющиеся между
+    ответами названия упражнений сжимаются и в следующих кадрах.
+    """
+
+    def __init__(self, compress_threshold=COMPRESS_THRESHOLD):
+        self.framing = "newline"
+        self.codec = JsonCodec
+        self.decoder = FrameDecoder()
+        self._encode_frame = encode_line
+        self.compression = None
+        self.compress_threshold = compress_threshold
+        self._compressor = None
+
+    def decode(self, frame):
+        return self.codec.decode(frame)
+
+    def serialize(self, response):
+        """Кодирует ответ без кадра; можно вызывать из любого потока."""
+        return self.codec.encode(response)
+
+    def frame(self, payload):
+        """Оборачивает payload в кадр, при необходимости сжимая его.
+
+        Сжатие потоковое, поэтому кадры должны уходить в сокет в том же порядке,
+        в каком вызывается frame - вызывать под блокировкой отправки.
+        """
+        if self._compressor is not None and len(payload) >= self.compress_threshold:
+            data = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            return self._encode_frame(data, compressed=True)
+        return self._encode_frame(payload)
+
+    def encode(self, response):
+        """Кодирует ответ и оборачивает его в кадр текущего формата."""
+        return self.frame(self.serialize(response))
+
+    def decode_error(self):
+        """Ответ на кадр, который не удалось декодировать."""
+        if self.codec is JsonCodec:
+            return {"error": "Invalid JSON"}
+        return {"error": "Invalid frame"}
+
+    def negotiate(self, request):
+        """Обрабатывает hello; возвращает кадр ответа (в прежнем формате)."""
+        framing = request.get("framing", self.framing)
+        encoding = request.get("encoding", self.codec.name)
+        compression = request.get("compression", self.compression)
+
+        response = {
+            "action": "hello",
+            "framings": sorted(FRAMINGS),
+            "encodings": sorted(CODECS),
+            "compressions": list(COMPRESSIONS),
+        }
+        if "id" in request:
+            response["id"] = request["id"]
+
+        message = None
+        # Значения не строки (списки, словари) нельзя искать в словарях форматов
+        if not (isinstance(framing, str) and isinstance(encoding, str)
+                and framing in FRAMINGS and encoding in CODECS):
+            message = "Неподдерживаемый формат"
+        elif compression is not None and compression not in COMPRESSIONS:
+            message = "Неподдерживаемое сжатие"
+        elif compression is not None and framing != "length":
+            # В JSON-строке сжатые байты могут содержать перевод строки
+            message = "Сжатие доступно только с кадрами length"
+        if message:
+            response.update(success=False, framing=self.framing, encoding=self.codec.name,
+                            compression=self.compression, message=message)
+            return self.encode(response)
+
+        response.update(success=True, framing=framing, encoding=encoding, compression=compression)
+        if compression:
+            response["compress_threshold"] = self.compress_threshold
+        reply = self.encode(response)
+        self._switch(framing, CODECS[encoding], compression)
+        return reply
+
+    def _switch(self, framing, codec, compression):
+        self.codec = codec
+        if framing != self.framing:
+            decoder_class, self._encode_frame = FRAMINGS[framing]
+            # Байты, пришедшие следом за hello, уже относятся к новому формату
+            leftover = self.decoder.take_pending()
+            self.decoder = decoder_class(self.decoder.max_frame_size)
+            self.decoder.feed(leftover)
+            self.framing = framing
+        if compression != self.compression:
+            self.compression = compression
+            # Контексты создаются один раз на соединение и живут до его закрытия
+            self._compressor = zlib.compressobj(COMPRESS_LEVEL) if compression else None
+            self.decoder.decompressor = zlib.decompressobj() if compression else None
+
+def is_hello(request):
+    return isinstance(request, dict) and request.get("action") == "hello"
@@ -0,0 +1,135 @@
+# rate_limit.py
+# Ограничение частоты запросов "ведром токенов": отдельно для каждого соединения
+# и для каждого пользователя, с разными лимитами для чтения и записи.
+import math
+import threading
+import time
+
+# Классы действий без ограничения: server_stats с верным токеном администратора
+# (без токена routes.classify_request считает его чтением)
+UNLIMITED_KINDS = ("admin",)
+# Блокировки пользовательских ведер разбиты на полосы, чтобы потоки разных
+# пользователей не ждали друг друга
+USER_STRIPES = 32
+# Сколько ведер держать в одной полосе; полные (давно не использованные) удаляются
+MAX_USERS_PER_STRIPE = 1024
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst; каждый запрос забирает cost токенов."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, cost, now):
+        """Забирает токены; если их не хватает, возвращает, сколько секунд ждать."""
+        # Запрос дороже всего ведра (большой batch) проходит при полном ведре
+        cost = min(cost, self.burst)
+        self.refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def give_back(self, cost):
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+def rate_limited_response(wait, scope):
+    """Ответ на запрос сверх лимита; retry_after_ms - когда хватит токенов."""
+    retry_after_ms = max(1, math.ceil(wait * 1000))
+    return {
+        "action": "rate_limited",
+        "success": False,
+        "scope": scope,
+        "retry_after_ms": retry_after_ms,
+        "message": f"Слишком много запросов, повторите через {retry_after_ms} мс"
+    }
+
+class RateLimiter:
+    """Лимиты по классам действий: {"read": (rate, burst), "write": (rate, burst)}.
+
+    Ведра соединения (new_connection()) использует только поток или задача,
+    читающие это соединение, поэтому они без блокировок. Ведра пользователей
+    общие и защищены блокировкой своей полосы.
+    """
+
+    def __init__(self, limits):
+        # Класс с rate <= 0 не ограничивается
+        self.limits = {kind: limit for kind, limit in limits.items() if limit[0] > 0}
+        self._stripes = [({}, threading.Lock()) for _ in range(USER_STRIPES)]
+        self._counts_lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = {}
+
+    def new_connection(self):
+        now = time.monotonic()
+        return {kind: TokenBucket(rate, burst, now) for kind, (rate, burst) in self.limits.items()}
+
+    def check(self, connection_buckets, kind, username=None, cost=1):
+        """Возвращает None, если запрос можно выполнять, иначе ответ rate_limited."""
+        if kind in UNLIMITED_KINDS or kind not in self.limits:
+            return None
+        now = time.monotonic()
+
+        bucket = connection_buckets[kind]
+        wait = bucket.take(cost, now)
+        if wait:
+            return self._throttle("connection", kind, wait)
+
+        if isinstance(username, str) and username:
+            wait = self._take_user(username, kind, cost, now)
+            if wait:
+                # Запрос не выполняется - токены соединения возвращаем
+                bucket.give_back(cost)
+                return self._throttle("user", kind, wait)
+
+        # Счетчик без блокировки: под гонкой возможна небольшая неточность
+        self.allowed += 1
+        return None
+
+    def _take_user(self, username, kind, cost, now):
+        buckets, lock = self._stripes[hash(username) % USER_STRIPES]
+        key = (username, kind)
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= MAX_USERS_PER_STRIPE:
+                    self._prune(buckets, now)
+                rate, burst = self.limits[kind]
+                bucket = buckets[key] = TokenBucket(rate, burst, now)
+            return bucket.take(cost, now)
+
+    @staticmethod
+    def _prune(buckets, now):
+        # Полное ведро ничем не отличается от нового - его можно забыть
+        for key, bucket in list(buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del buckets[key]
+        if len(buckets) >= MAX_USERS_PER_STRIPE:
+            oldest = min(buckets, key=lambda k: buckets[k].updated)
+            del buckets[oldest]
+
+    def _throttle(self, scope, kind, wait):
+        key = f"{scope}.{kind}"
+        with self._counts_lock:
+            self.throttled[key] = self.throttled.get(key, 0) + 1
+        return rate_limited_response(wait, scope)
+
+    def stats(self):
+        with self._counts_lock:
+            throttled = dict(self.throttled)
+        return {
+            "limits": {kind: {"rate": rate, "burst": burst} for kind, (rate, burst) in self.limits.items()},
+            "allowed": self.allowed,
+            "throttled": throttled,
+            "users_tracked": sum(len(buckets) for buckets, _ in self._stripes),
+        }
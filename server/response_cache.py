@@ -0,0 +1,121 @@
+# response_cache.py
+# Кэш готовых ответов на справочные запросы (каталог упражнений, планы питания).
+# Эти данные меняются только при обновлении сервера, поэтому ответ хранится уже
+# закодированным: повторный запрос отправляется без сборки словаря и без json.dumps.
+import os
+import threading
+import time
+
+from metrics import registry as metrics
+
+# Действие -> поля запроса, от которых зависит ответ
+CACHEABLE_ACTIONS = {
+    "get_exercises": ("condition", "level", "goal"),
+    "get_nutrition_plan": ("goal",),
+}
+# Комбинаций условий, уровней и целей немного; сверх лимита ответы просто не кэшируются
+MAX_ENTRIES = 256
+# Как часто проверять, не изменились ли источники данных (сек)
+CHECK_INTERVAL = 1.0
+
+class ResponseCache:
+    """Закодированные ответы по ключу (кодировка, действие, параметры запроса).
+
+    Хранятся только успешные ответы и без id: id запроса дописывается в готовые
+    байты (append_field кодировки). Кэш сбрасывается целиком, если каталог
+    упражнений заменен (другой объект db_manager.exercises) или изменилось
+    время изменения файла планов питания.
+    """
+
+    def __init__(self, db_manager, nutrition_file, max_entries=MAX_ENTRIES):
+        self.db_manager = db_manager
+        self.nutrition_file = nutrition_file
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._version = self._source_version()
+        self._checked = time.monotonic()
+
+    def _source_version(self):
+        try:
+            mtime = os.stat(self.nutrition_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (id(self.db_manager.exercises), mtime)
+
+    def _check_sources(self, now):
+        if now - self._checked < CHECK_INTERVAL:
+            return
+        self._checked = now
+        version = self._source_version()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    @staticmethod
+    def key(request, codec):
+        """Ключ кэша или None, если ответ на запрос не кэшируется."""
+        if not isinstance(request, dict) or not isinstance(request.get("action"), str):
+            return None
+        params = CACHEABLE_ACTIONS.get(request["action"])
+        if params is None:
+            return None
+        values = tuple(request.get(param) for param in params)
+        if not all(value is None or isinstance(value, str) for value in values):
+            return None
+        return (codec.name, request["action"]) + values
+
+    def lookup(self, request, codec):
+        """Готовые байты ответа (с id запроса, если он был) или None."""
+        key = self.key(request, codec)
+        if key is None:
+            return None
+        started = time.perf_counter()
+        self._check_sources(time.monotonic())
+        payload = self.entries.get(key)
+        # Счетчики без блокировки: под гонкой возможна небольшая неточность
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if "id" in request:
+            payload = codec.append_field(payload, "id", request["id"])
+        metrics.action(key[1]).observe(time.perf_counter() - started)
+        return payload
+
+    def store(self, request, response, codec):
+        """Кодирует ответ на кэшируемый запрос и, если он успешный, запоминает.
+
+        Возвращает байты ответа или None, если запрос не кэшируется (тогда ответ
+        кодирует вызывающий).
+        """
+        key = self.key(request, codec)
+        if key is None or not isinstance(response, dict):
+            return None
+        payload = codec.encode({name: value for name, value in response.items() if name != "id"})
+        # Источник мог измениться, пока ответ собирался - такой ответ не запоминаем
+        if (response.get("success") is True and len(self.entries) < self.max_entries
+                and self._source_version() == self._version):
+            with self.lock:
+                self.entries[key] = payload
+        if "id" in response:
+            return codec.append_field(payload, "id", response["id"])
+        return payload
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
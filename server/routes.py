@@ -1,32 +1,104 @@
 # routes.py
+import base64
+import hmac
 import json
+import os
+import time
 from sqlalchemy.exc import IntegrityError
-from models import User, Progress, DatabaseManager, SavedPlan, WorkoutHistory
+from models import User, Progress, DatabaseManager
+from metrics import registry as metrics
+from idempotency import IDEMPOTENCY_FIELD, is_valid_key, store as idempotency
 from datetime import datetime
 
+# Максимум вложенных запросов в одном batch
+MAX_BATCH_SIZE = 100
+# Если задан, server_stats требует {"token": ...} с этим значением
+ADMIN_TOKEN_ENV = "FITNESS_ADMIN_TOKEN"
+# Списки (история, планы, прогресс) с полем limit отдаются страницами; limit
+# больше MAX_PAGE_SIZE уменьшается до него, cursor без limit - DEFAULT_PAGE_SIZE
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+MAX_CURSOR_LENGTH = 128
+# Планы питания читаются из этого файла при каждом запросе (кэш ответов следит за его изменением)
+NUTRITION_PLANS_FILE = "nutrition_plans.json"
+
+# --- РЕЕСТР ДЕЙСТВИЙ ПРОТОКОЛА ---
+# action -> Action; заполняется декоратором @action у обработчиков ниже
+ACTIONS = {}
+
+class Action:
+    """Обработчик действия: какие поля запроса он принимает и изменяет ли данные."""
+    
+    def __init__(self, name, handler, params, kind, idempotent):
+        self.name = name
+        self.handler = handler
+        self.params = params
+        # read - только чтение, write - изменяет базу, admin - служебное
+        self.kind = kind
+        # Принимает ли действие idempotency_key (ответы хранятся по username запроса)
+        self.idempotent = idempotent
+        self.metrics = metrics.action(name)
+    
+    def __call__(self, request, db_manager):
+        key = request.get(IDEMPOTENCY_FIELD) if self.kind == "write" else None
+        if key is None:
+            return self.run(request, db_manager)
+        if not self.idempotent:
+            return {"action": self.name, "success": False,
+                    "message": "Ключ идемпотентности здесь не принимается"}
+        if not is_valid_key(key):
+            return {"action": self.name, "success": False, "message": "Некорректный ключ идемпотентности"}
+        username = request.get("username")
+        if not isinstance(username, str):
+            # Без имени ключи разных клиентов попали бы в одно общее пространство
+            return self.run(request, db_manager)
+        # Повтор с тем же ключом получает первый ответ, а не выполняется второй раз
+        return idempotency.execute(username, self.name, key, lambda: self.run(request, db_manager))
+    
+    def run(self, request, db_manager):
+        args = [request.get(param) for param in self.params]
+        started = time.perf_counter()
+        try:
+            response = self.handler(db_manager, *args)
+        except Exception:
+            self.metrics.observe(time.perf_counter() - started, error=True)
+            raise
+        failure = isinstance(response, dict) and response.get("success") is False
+        self.metrics.observe(time.perf_counter() - started, failure=failure)
+        return response
+
+def action(name, *params, kind="read", idempotent=True):
+    """Регистрирует обработчик действия name; params - поля запроса по порядку аргументов."""
+    def decorator(handler):
+        ACTIONS[name] = Action(name, handler, params, kind, idempotent)
+        return handler
+    return decorator
+
+@action("login", "username", "password")
 def handle_login(db_manager: DatabaseManager, username, password):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    session.close()
+    generation = db_manager.user_ids.generation
+    with db_manager.unit_of_work() as session:
+        user = session.query(User).filter_by(username=username).first()
+        valid = user is not None and user.password == password
     
-    if user and user.password == password:
+    if user is not None:
+        # За входом обычно следуют действия этого пользователя: id уже известен
+        db_manager.user_ids.put(username, user.id, generation)
+    
+    if valid:
         return {"action": "auth", "success": True, "username": username}
     return {"action": "auth", "success": False, "message": "Неверный логин или пароль"}
 
+@action("register", "username", "password", "phone", "dob", kind="write")
 def handle_register(db_manager: DatabaseManager, username, password, phone, dob):
-    session = db_manager.Session()
-    new_user = User(username=username, password=password, phone=phone, dob=dob)
-    
     try:
-        session.add(new_user)
-        session.commit()
-        return {"action": "register", "success": True}
+        with db_manager.unit_of_work() as session:
+            session.add(User(username=username, password=password, phone=phone, dob=dob))
     except IntegrityError:
-        session.rollback()
         return {"action": "register", "success": False, "message": "Пользователь уже существует"}
-    finally:
-        session.close()
+    return {"action": "register", "success": True}
 
+@action("get_exercises", "condition", "level", "goal")
 def handle_get_exercises(db_manager: DatabaseManager, condition, level, goal):
     exercises = db_manager.get_exercises(condition, level, goal)
     
@@ -34,63 +106,170 @@ def handle_get_exercises(db_manager: DatabaseManager, condition, level, goal):
         return {"action": "exercises", "success": True, "exercises": exercises}
     return {"action": "exercises", "success": False, "message": "Неверный уровень, цель или условия"}
 
+@action("track_progress", "username", "exercise", kind="write")
 def handle_track_progress(db_manager: DatabaseManager, username, exercise_name):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        new_progress = Progress(user_id=user.id, exercise_name=exercise_name)
-        session.add(new_progress)
-        session.commit()
-        session.close()
-        return {"action": "progress", "success": True}
-    
-    session.close()
-    return {"action": "progress", "success": False, "message": "Пользователь не найден"}
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return {"action": "progress", "success": False, "message": "Пользователь не найден"}
+        session.add(Progress(user_id=user_id, exercise_name=exercise_name))
+    return {"action": "progress", "success": True}
+
+def handle_track_progress_many(db_manager: DatabaseManager, username, exercise_names):
+    """Отмечает несколько упражнений одной транзакцией: один поиск пользователя и один commit."""
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return [{"action": "progress", "success": False, "message": "Пользователь не найден"}
+                    for _ in exercise_names]
+        session.add_all([Progress(user_id=user_id, exercise_name=name) for name in exercise_names])
+    return [{"action": "progress", "success": True} for _ in exercise_names]
+
+# У batch нет своего username: ключ идемпотентности передается во вложенных запросах
+@action("batch", "requests", kind="write", idempotent=False)
+def handle_batch(db_manager: DatabaseManager, requests, dispatch=None):
+    """Выполняет список запросов за один обмен и возвращает список ответов в том же порядке.
+    
+    Подряд идущие track_progress одного пользователя объединяются в одну транзакцию.
+    """
+    if not isinstance(requests, list):
+        return {"action": "batch", "success": False, "message": "Поле requests должно быть списком"}
+    if len(requests) > MAX_BATCH_SIZE:
+        return {"action": "batch", "success": False, "message": f"Не более {MAX_BATCH_SIZE} запросов в пакете"}
+    
+    dispatch = dispatch or process_request
+    results = []
+    i = 0
+    while i < len(requests):
+        request = requests[i]
+        
+        if not isinstance(request, dict):
+            results.append({"error": "Invalid request"})
+            i += 1
+            continue
+        
+        action = request.get("action")
+        if action == "batch":
+            results.append(_with_id(request, {"error": "Nested batch is not allowed"}))
+            i += 1
+        elif action == "track_progress" and IDEMPOTENCY_FIELD not in request:
+            username = request.get("username")
+            group = [request]
+            i += 1
+            # Запросы с ключом идемпотентности выполняются по одному через dispatch
+            while (i < len(requests) and isinstance(requests[i], dict)
+                   and requests[i].get("action") == "track_progress"
+                   and requests[i].get("username") == username
+                   and IDEMPOTENCY_FIELD not in requests[i]):
+                group.append(requests[i])
+                i += 1
+            names = [r.get("exercise") for r in group]
+            for sub_request, result in zip(group, _track_progress_group(db_manager, username, names)):
+                results.append(_with_id(sub_request, result))
+        else:
+            results.append(_with_id(request, dispatch(request, db_manager)))
+            i += 1
+    
+    return {"action": "batch", "success": True, "results": results}
+
+def _track_progress_group(db_manager, username, names):
+    """handle_track_progress_many с учетом в показателях track_progress, как у отдельных запросов.
+
+    Время транзакции делится поровну между упражнениями группы.
+    """
+    stats = ACTIONS["track_progress"].metrics
+    started = time.perf_counter()
+    try:
+        responses = handle_track_progress_many(db_manager, username, names)
+    except Exception:
+        share = (time.perf_counter() - started) / len(names)
+        for _ in names:
+            stats.observe(share, error=True)
+        raise
+    share = (time.perf_counter() - started) / len(names)
+    for response in responses:
+        stats.observe(share, failure=response.get("success") is False)
+    return responses
+
+def _with_id(request, response):
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+def encode_cursor(key):
+    """Курсор следующей страницы: (время, id) последней отданной строки в непрозрачной строке."""
+    moment, row_id = key
+    raw = f"{moment.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
+def decode_cursor(cursor):
+    """Ключ (время, id) из курсора; ValueError, если курсор выдан не сервером."""
+    if not isinstance(cursor, str) or len(cursor) > MAX_CURSOR_LENGTH:
+        raise ValueError("cursor")
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    moment, row_id = raw.split("|")
+    return datetime.fromisoformat(moment), int(row_id)
+
+def _page_args(limit, cursor):
+    """(limit, ключ) из полей запроса; без limit и cursor - весь список, как раньше."""
+    if limit is None and cursor is None:
+        return None, None
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise ValueError("limit")
+    return min(limit, MAX_PAGE_SIZE), (decode_cursor(cursor) if cursor is not None else None)
+
+def _with_cursor(response, limit, next_key):
+    if limit is not None:
+        # None - страница последняя
+        response["next_cursor"] = encode_cursor(next_key) if next_key else None
+    return response
+
+@action("save_workout_history", "username", "workout_name", "exercises", "duration", kind="write")
 def handle_save_workout_history(db_manager: DatabaseManager, username, workout_name, exercises, duration):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        try:
-            history_id = db_manager.save_workout_history(user.id, workout_name, exercises, duration)
-            session.close()
-            return {"action": "workout_history_saved", "success": True, "history_id": history_id}
-        except Exception as e:
-            session.close()
-            return {"action": "workout_history_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
-    
-    session.close()
-    return {"action": "workout_history_saved", "success": False, "message": "Пользователь не найден"}
+    try:
+        with db_manager.unit_of_work() as session:
+            user_id = db_manager.get_user_id(username, session)
+            if user_id is None:
+                return {"action": "workout_history_saved", "success": False, "message": "Пользователь не найден"}
+            history_id = db_manager.save_workout_history(user_id, workout_name, exercises, duration, session=session)
+    except Exception as e:
+        return {"action": "workout_history_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
+    return {"action": "workout_history_saved", "success": True, "history_id": history_id}
 
-def handle_get_workout_history(db_manager: DatabaseManager, username):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        history = db_manager.get_workout_history(user.id)
-        session.close()
-        return {"action": "workout_history", "success": True, "history": history}
-    
-    session.close()
-    return {"action": "workout_history", "success": False, "message": "Пользователь не найден"}
+@action("get_workout_history", "username", "limit", "cursor")
+def handle_get_workout_history(db_manager: DatabaseManager, username, limit=None, cursor=None):
+    try:
+        limit, before = _page_args(limit, cursor)
+    except ValueError:
+        return {"action": "workout_history", "success": False, "message": "Некорректный limit или cursor"}
+    
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return {"action": "workout_history", "success": False, "message": "Пользователь не найден"}
+        history, next_key = db_manager.get_workout_history_page(user_id, limit, before, session=session)
+    return _with_cursor({"action": "workout_history", "success": True, "history": history}, limit, next_key)
 
-def handle_get_user_plans(db_manager: DatabaseManager, username):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        plans = db_manager.get_user_plans(user.id)
-        session.close()
-        return {"action": "user_plans", "success": True, "plans": plans}
-    
-    session.close()
-    return {"action": "user_plans", "success": False, "message": "Пользователь не найден"}
+@action("get_user_plans", "username", "limit", "cursor")
+def handle_get_user_plans(db_manager: DatabaseManager, username, limit=None, cursor=None):
+    try:
+        limit, before = _page_args(limit, cursor)
+    except ValueError:
+        return {"action": "user_plans", "success": False, "message": "Некорректный limit или cursor"}
+    
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return {"action": "user_plans", "success": False, "message": "Пользователь не найден"}
+        plans, next_key = db_manager.get_user_plans_page(user_id, limit, before, session=session)
+    return _with_cursor({"action": "user_plans", "success": True, "plans": plans}, limit, next_key)
 
+@action("get_nutrition_plan", "goal")
 def handle_get_nutrition_plan(db_manager: DatabaseManager, goal):
     try:
-        with open('nutrition_plans.json', 'r', encoding='utf-8') as f:
+        with open(NUTRITION_PLANS_FILE, 'r', encoding='utf-8') as f:
             plans = json.load(f)
         
         plan = plans.get(goal)
@@ -104,186 +283,114 @@ def handle_get_nutrition_plan(db_manager: DatabaseManager, goal):
     except Exception as e:
         return {"action": "nutrition_plan", "success": False, "message": f"Ошибка загрузки плана: {str(e)}"}
 
+@action("load_existing_plan", "username", "plan_id")
 def handle_load_existing_plan(db_manager: DatabaseManager, username, plan_id):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        plan = db_manager.get_saved_plan_by_id(plan_id, user.id)
-        session.close()
-        if plan:
-            return {"action": "existing_plan_loaded", "success": True, "plan": plan}
-        return {"action": "existing_plan_loaded", "success": False, "message": "План не найден"}
-    
-    session.close()
-    return {"action": "existing_plan_loaded", "success": False, "message": "Пользователь не найден"}
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return {"action": "existing_plan_loaded", "success": False, "message": "Пользователь не найден"}
+        plan = db_manager.get_saved_plan_by_id(plan_id, user_id, session=session)
+    
+    if plan:
+        return {"action": "existing_plan_loaded", "success": True, "plan": plan}
+    return {"action": "existing_plan_loaded", "success": False, "message": "План не найден"}
 
+@action("save_plan", "username", "plan_name", "level", "goal", "condition", "exercises", kind="write")
 def handle_save_plan(db_manager: DatabaseManager, username, plan_name, level, goal, condition, exercises):
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        try:
-            plan_id = db_manager.save_user_plan(user.id, plan_name, level, goal, condition, exercises)
-            session.close()
-            return {"action": "plan_saved", "success": True, "plan_id": plan_id}
-        except Exception as e:
-            session.close()
-            return {"action": "plan_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
-    
-    session.close()
-    return {"action": "plan_saved", "success": False, "message": "Пользователь не найден"}
+    try:
+        with db_manager.unit_of_work() as session:
+            user_id = db_manager.get_user_id(username, session)
+            if user_id is None:
+                return {"action": "plan_saved", "success": False, "message": "Пользователь не найден"}
+            plan_id = db_manager.save_user_plan(user_id, plan_name, level, goal, condition, exercises, session=session)
+    except Exception as e:
+        return {"action": "plan_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
+    return {"action": "plan_saved", "success": True, "plan_id": plan_id}
 
+@action("save_plan_with_history", "username", "plan_name", "level", "goal", "condition", "exercises", kind="write")
 def handle_save_plan_with_history(db_manager: DatabaseManager, username, plan_name, level, goal, condition, exercises):
-    """Сохраняет план тренировки и добавляет в историю."""
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        try:
+    """Сохраняет план тренировки и добавляет в историю одной транзакцией."""
+    try:
+        with db_manager.unit_of_work() as session:
+            user_id = db_manager.get_user_id(username, session)
+            if user_id is None:
+                return {"action": "plan_with_history_saved", "success": False, "message": "Пользователь не найден"}
+            
             # Сохраняем план тренировки
-            plan_id = db_manager.save_user_plan(user.id, plan_name, level, goal, condition, exercises)
+            plan_id = db_manager.save_user_plan(user_id, plan_name, level, goal, condition, exercises, session=session)
             
             # Сохраняем в историю тренировок
             history_id = db_manager.save_workout_history(
-                user.id, 
+                user_id, 
                 f"Сохраненный план: {plan_name}", 
                 exercises, 
-                0  # Длительность 0 для сохраненных планов
+                0,  # Длительность 0 для сохраненных планов
+                session=session
             )
-            
-            session.close()
-            return {
-                "action": "plan_with_history_saved", 
-                "success": True, 
-                "plan_id": plan_id, 
-                "history_id": history_id
-            }
-        except Exception as e:
-            session.close()
-            return {"action": "plan_with_history_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
-    
-    session.close()
-    return {"action": "plan_with_history_saved", "success": False, "message": "Пользователь не найден"}
+    except Exception as e:
+        # Ни план, ни запись истории не сохранены: откат всей транзакции
+        return {"action": "plan_with_history_saved", "success": False, "message": f"Ошибка сохранения: {str(e)}"}
+    
+    return {
+        "action": "plan_with_history_saved", 
+        "success": True, 
+        "plan_id": plan_id, 
+        "history_id": history_id
+    }
 
-def handle_get_progress_history(db_manager: DatabaseManager, username):
+@action("get_progress_history", "username", "limit", "cursor")
+def handle_get_progress_history(db_manager: DatabaseManager, username, limit=None, cursor=None):
     """Получает историю прогресса пользователя (выполненные упражнения)."""
-    session = db_manager.Session()
-    user = session.query(User).filter_by(username=username).first()
-    
-    if user:
-        progress_history = []
-        # Получаем прогресс пользователя
-        progress_records = session.query(Progress).filter_by(user_id=user.id).order_by(Progress.timestamp.desc()).all()
-        
-        for record in progress_records:
-            progress_history.append({
-                "exercise_name": record.exercise_name,
-                "timestamp": record.timestamp.strftime("%Y-%m-%d %H:%M")
-            })
-        
-        session.close()
-        return {"action": "progress_history", "success": True, "progress": progress_history}
-    
-    session.close()
-    return {"action": "progress_history", "success": False, "message": "Пользователь не найден"}
+    try:
+        limit, before = _page_args(limit, cursor)
+    except ValueError:
+        return {"action": "progress_history", "success": False, "message": "Некорректный limit или cursor"}
+    
+    with db_manager.unit_of_work() as session:
+        user_id = db_manager.get_user_id(username, session)
+        if user_id is None:
+            return {"action": "progress_history", "success": False, "message": "Пользователь не найден"}
+        progress_history, next_key = db_manager.get_progress_history_page(user_id, limit, before, session=session)
+    
+    return _with_cursor({"action": "progress_history", "success": True, "progress": progress_history},
+                        limit, next_key)
+
+def admin_token_matches(token):
+    """Токен совпадает с FITNESS_ADMIN_TOKEN; без заданной переменной - никогда."""
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    return (bool(expected) and isinstance(token, str)
+            and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")))
+
+@action("server_stats", "token", kind="admin")
+def handle_server_stats(db_manager: DatabaseManager, token):
+    """Снимок показателей процесса: задержки по действиям, соединения, пул, запросы к БД."""
+    if os.environ.get(ADMIN_TOKEN_ENV) and not admin_token_matches(token):
+        return {"action": "server_stats", "success": False, "message": "Доступ запрещен"}
+    return {"action": "server_stats", "success": True, "stats": metrics.snapshot()}
+
+def find_action(request):
+    """Зарегистрированное действие запроса или None (в том числе если action не строка)."""
+    name = request.get("action")
+    return ACTIONS.get(name) if isinstance(name, str) else None
+
+def classify_request(request):
+    """Класс действия (read/write/admin), пользователь и стоимость запроса - для ограничения частоты."""
+    # batch с requests не списком считается одним запросом: handle_batch ответит ошибкой
+    if request.get("action") == "batch" and isinstance(request.get("requests"), list):
+        items = [r for r in request["requests"] if isinstance(r, dict)]
+        kinds = {handler.kind for handler in map(find_action, items) if handler}
+        username = next((r.get("username") for r in items if r.get("username")), None)
+        return ("write" if "write" in kinds else "read"), username, max(1, len(items))
+    handler = find_action(request)
+    kind = handler.kind if handler else "read"
+    # Без лимита - только служебные запросы с верным токеном; иначе они дорогие чтения
+    if kind == "admin" and not admin_token_matches(request.get("token")):
+        kind = "read"
+    return kind, request.get("username"), 1
 
 def process_request(request, db_manager):
     """Основная функция обработки запросов."""
-    action = request.get("action")
-    
-    if action == "login":
-        return handle_login(
-            db_manager,
-            request.get("username"),
-            request.get("password")
-        )
-    
-    elif action == "register":
-        return handle_register(
-            db_manager,
-            request.get("username"),
-            request.get("password"),
-            request.get("phone"),
-            request.get("dob")
-        )
-    
-    elif action == "get_exercises":
-        return handle_get_exercises(
-            db_manager,
-            request.get("condition"),
-            request.get("level"),
-            request.get("goal")
-        )
-    
-    elif action == "track_progress":
-        return handle_track_progress(
-            db_manager,
-            request.get("username"),
-            request.get("exercise")
-        )
-    
-    elif action == "save_workout_history":
-        return handle_save_workout_history(
-            db_manager,
-            request.get("username"),
-            request.get("workout_name"),
-            request.get("exercises"),
-            request.get("duration")
-        )
-    
-    elif action == "get_workout_history":
-        return handle_get_workout_history(
-            db_manager,
-            request.get("username")
-        )
-    
-    elif action == "get_user_plans":
-        return handle_get_user_plans(
-            db_manager,
-            request.get("username")
-        )
-    
-    elif action == "get_nutrition_plan":
-        return handle_get_nutrition_plan(
-            db_manager,
-            request.get("goal")
-        )
-    
-    elif action == "load_existing_plan":
-        return handle_load_existing_plan(
-            db_manager,
-            request.get("username"),
-            request.get("plan_id")
-        )
-    
-    elif action == "save_plan":
-        return handle_save_plan(
-            db_manager,
-            request.get("username"),
-            request.get("plan_name"),
-            request.get("level"),
-            request.get("goal"),
-            request.get("condition"),
-            request.get("exercises")
-        )
-    
-    elif action == "save_plan_with_history":
-        return handle_save_plan_with_history(
-            db_manager,
-            request.get("username"),
-            request.get("plan_name"),
-            request.get("level"),
-            request.get("goal"),
-            request.get("condition"),
-            request.get("exercises")
-        )
-    
-    elif action == "get_progress_history":
-        return handle_get_progress_history(
-            db_manager,
-            request.get("username")
-        )
-    
-    else:
-        return {"error": "Unknown action", "action": action}
\ No newline at end of file
+    handler = find_action(request)
+    if handler is None:
+        return {"error": "Unknown action", "action": request.get("action")}
+    return handler(request, db_manager)
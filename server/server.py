@@ -1,12 +1,30 @@
 # server.py
+import select
 import socket
 import threading
+import time
 import json
 from models import DatabaseManager
 import routes as routes
+from config import HOST, PORT, ServerConfig
+from worker_pool import RequestWorkerPool, ServerBusy, busy_response
+from framing import FrameError
+from protocol import COMPRESS_THRESHOLD, ConnectionProtocol, is_hello
+from server_log import log
+from metrics import registry as metrics, SnapshotWriter
+from connections import ConnectionRegistry, configure_keepalive, raise_nofile_limit, server_full_response
+from rate_limit import RateLimiter
+from response_cache import ResponseCache
+from idempotency import store as idempotency
+from capture import TrafficCapture
 
-HOST = '0.0.0.0'
-PORT = 65432
+# Сколько ждать отправки уведомления об остановке одному клиенту (сек)
+DRAIN_SEND_TIMEOUT = 2.0
+# Клиент, который столько секунд не забирает ответ, отключается: в режиме
+# pipelining ответ пишет поток пула, и он не должен висеть на чужом сокете
+SEND_TIMEOUT = 5.0
+# Неблокирующая отправка; без флага (Windows) - обычный sendall без таймаута
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", None)
 
 class LoggerObserver:
     def __init__(self):
@@ -16,137 +34,339 @@ class LoggerObserver:
         self.observers.append(obs)
     
     def notify(self, msg):
+        # Наблюдатели вызываются в потоке журнала, а не в потоке запроса
+        if self.observers:
+            log.defer(self._deliver, msg)
+    
+    def _deliver(self, msg):
         for obs in self.observers:
             obs.update(msg)
 
-def handle_client(conn, addr, db_manager, logger):
-    print(f"[SERVER] Подключен {addr}")
+class ClientConnection:
+    """Сокет клиента: формат кадров, потокобезопасная отправка ответов и учет запросов "в полете"."""
+    
+    def __init__(self, sock, addr, max_inflight=1, compress_threshold=COMPRESS_THRESHOLD):
+        self.sock = sock
+        self.addr = addr
+        self.protocol = ConnectionProtocol(compress_threshold)
+        self.max_inflight = max_inflight
+        self.send_lock = threading.Lock()
+        self.inflight = 0
+        self.inflight_cond = threading.Condition()
+        self.last_activity = time.monotonic()
+        self.send_failed = False
+    
+    def touch(self):
+        self.last_activity = time.monotonic()
+    
+    def is_busy(self):
+        return self.inflight > 0
+    
+    def close_idle(self):
+        """Вызывается сборщиком простаивающих соединений: recv() в потоке соединения вернет 0."""
+        self.sock.shutdown(socket.SHUT_RDWR)
+    
+    def begin_drain(self, notice):
+        """Остановка сервера: уведомить клиента и перестать читать, ответы на принятые запросы дойдут."""
+        # Клиент, переставший читать, не должен задержать остановку остальных
+        self.sock.settimeout(DRAIN_SEND_TIMEOUT)
+        self.send(notice)
+        self.sock.shutdown(socket.SHUT_RD)
+    
+    def send(self, response):
+        """Отправляет ответ; возвращает размер кадра в байтах."""
+        return self.send_payload(self.protocol.serialize(response))
+    
+    def send_payload(self, payload):
+        """Отправляет уже закодированный ответ; возвращает размер кадра в байтах."""
+        # Потоковое сжатие зависит от порядка кадров, поэтому кадр собирается под блокировкой
+        with self.send_lock:
+            data = self.protocol.frame(payload)
+            self._sendall(data)
+        return len(data)
+    
+    def send_frame(self, data):
+        # Ответы конвейерных запросов пишут потоки пула - кадры не должны перемешаться
+        with self.send_lock:
+            self._sendall(data)
+    
+    def _sendall(self, data, timeout=SEND_TIMEOUT):
+        """sendall не дольше timeout секунд; если клиент не читает - соединение закрывается."""
+        if self.send_failed:
+            raise ConnectionError("Соединение закрыто после таймаута отправки")
+        if MSG_DONTWAIT is None:
+            self.sock.sendall(data)
+            return
+        view = memoryview(data)
+        deadline = time.monotonic() + timeout
+        while view:
+            try:
+                view = view[self.sock.send(view, MSG_DONTWAIT):]
+                continue
+            except BlockingIOError:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([], [self.sock], [], remaining)[1]:
+                self.send_failed = True
+                metrics.counter("send_timeouts").inc()
+                # recv() в потоке соединения вернет 0, и оно закроется как обычно
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                raise TimeoutError(f"Клиент не принимает ответ дольше {timeout} с")
     
+    def begin_request(self):
+        """Ждет свободного места среди запросов "в полете" (обратное давление на чтение)."""
+        with self.inflight_cond:
+            while self.inflight >= self.max_inflight:
+                self.inflight_cond.wait()
+            self.inflight += 1
+    
+    def finish_request(self):
+        with self.inflight_cond:
+            self.inflight -= 1
+            self.inflight_cond.notify_all()
+    
+    def wait_idle(self):
+        """Ждет завершения всех запросов "в полете"."""
+        with self.inflight_cond:
+            while self.inflight:
+                self.inflight_cond.wait()
+
+def attach_request_id(request, response):
+    """Возвращает в ответе id запроса, чтобы клиент мог сопоставить их."""
+    if isinstance(request, dict) and "id" in request:
+        response["id"] = request["id"]
+    return response
+
+def handler_error_response(request, error):
+    """Ответ на запрос, обработчик которого упал: в режиме pipelining клиент иначе ждал бы его id вечно."""
+    log.error("Ошибка обработки запроса", action=request.get("action"), error=error)
+    return attach_request_id(request, {"status": "error", "action": request.get("action"), "success": False,
+                                       "error": "Внутренняя ошибка сервера"})
+
+def encode_response(cache, codec, request, response):
+    """Кодирует ответ; успешные ответы на справочные запросы запоминаются в кэше."""
+    payload = cache.store(request, response, codec)
+    return payload if payload is not None else codec.encode(response)
+
+def execute_request(request, db_manager):
+    """Выполняет запрос в потоке пула; ответ содержит id запроса, если он был."""
+    return attach_request_id(request, process_request(request, db_manager))
+
+def _submit_pipelined(client, pool, request, db_manager, request_bytes):
+    """Запускает запрос с id, не дожидаясь ответа: ответ пишется, когда будет готов."""
+    client.begin_request()
     try:
-        buffer = ""
-        while True:
-            data = conn.recv(1024)
-            if not data:
-                break
-            
-            buffer += data.decode("utf-8")
-            
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                if line:
-                    try:
-                        request = json.loads(line)
-                        print(f"[SERVER] Получен запрос: {request}")
-                        response = process_request(request, db_manager)
-                        conn.sendall(json.dumps(response).encode("utf-8") + b"\n")
-                    except json.JSONDecodeError:
-                        conn.sendall(json.dumps({"error": "Invalid JSON"}).encode("utf-8") + b"\n")
+        future = pool.submit(execute_request, request, db_manager)
+    except ServerBusy as busy:
+        client.finish_request()
+        client.send(attach_request_id(request, busy_response(busy)))
+        return
+    
+    def on_done(done):
+        try:
+            try:
+                response = done.result()
+            except Exception as e:
+                response = handler_error_response(request, e)
+            payload = encode_response(client.cache, client.protocol.codec, request, response)
+            metrics.record_payload(request, request_bytes, client.send_payload(payload))
+        except Exception as e:
+            log.error("Ошибка отправки ответа", addr=client.addr, error=e)
+        finally:
+            client.finish_request()
+    
+    future.add_done_callback(on_done)
+
+def check_rate_limit(limiter, buckets, request):
+    """Ответ rate_limited (с id запроса) или None, если запрос можно выполнять."""
+    if not isinstance(request, dict):
+        return None
+    kind, username, cost = routes.classify_request(request)
+    response = limiter.check(buckets, kind, username, cost)
+    return attach_request_id(request, response) if response else None
+
+def _send_cached(client, request, request_bytes):
+    """Отвечает готовыми байтами из кэша; False, если ответа в кэше нет."""
+    payload = client.cache.lookup(request, client.protocol.codec)
+    if payload is None:
+        return False
+    metrics.record_payload(request, request_bytes, client.send_payload(payload))
+    return True
+
+def _handle_frame(client, frame, db_manager, pool, config, limiter):
+    try:
+        request = client.protocol.decode(frame)
+    except ValueError:
+        client.send(client.protocol.decode_error())
+        return
+    
+    log.info("Получен запрос", sampled=True, addr=client.addr, request=request)
+    if client.capture is not None and not is_hello(request):
+        client.capture.record(client.capture_id, request)
+    if is_hello(request):
+        # Смена формата: все ответы в старом формате должны уйти раньше
+        client.wait_idle()
+        client.send_frame(client.protocol.negotiate(request))
+        return
+    
+    if config.pipelining and isinstance(request, dict) and "id" in request:
+        throttled = check_rate_limit(limiter, client.rate_buckets, request)
+        if throttled:
+            client.send(throttled)
+        elif not _send_cached(client, request, len(frame)):
+            _submit_pipelined(client, pool, request, db_manager, len(frame))
+        return
+    
+    # Запрос без id выполняется строго после всех предыдущих
+    client.wait_idle()
+    throttled = check_rate_limit(limiter, client.rate_buckets, request)
+    if throttled:
+        client.send(throttled)
+        return
+    if _send_cached(client, request, len(frame)):
+        return
+    client.begin_request()
+    try:
+        # Поток соединения только читает сокет, запрос выполняет пул
+        response = pool.submit(execute_request, request, db_manager).result()
+    except ServerBusy as busy:
+        response = attach_request_id(request, busy_response(busy))
+    finally:
+        client.finish_request()
+    payload = encode_response(client.cache, client.protocol.codec, request, response)
+    metrics.record_payload(request, len(frame), client.send_payload(payload))
+
+def start_metrics(config, pool, connections, limiter, cache, capture=None, db_manager=None):
+    """Добавляет в снимок показателей пул, соединения, лимиты, кэш, пул БД и журнал; запускает файл снимков, если задан."""
+    metrics.started_at = time.time()
+    metrics.register_provider("pool", pool.stats)
+    metrics.register_provider("connections", connections.stats)
+    metrics.register_provider("rate_limits", limiter.stats)
+    metrics.register_provider("response_cache", cache.stats)
+    metrics.register_provider("idempotency", idempotency.stats)
+    if capture is not None:
+        metrics.register_provider("capture", capture.stats)
+    if db_manager is not None:
+        metrics.register_provider("database", db_manager.pool_stats)
+        metrics.register_provider("user_cache", db_manager.user_ids.stats)
+    metrics.register_provider("log", log.stats)
+    if config.stats_file:
+        return SnapshotWriter(metrics, config.stats_file, config.stats_interval).start()
+    return None
+
+def reject_connection(conn, config):
+    """Быстрый отказ сверх лимита соединений: ответ без потока и без ожидания."""
+    try:
+        conn.setblocking(False)
+        conn.send(json.dumps(server_full_response(config.retry_after_ms)).encode("utf-8") + b"\n")
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+def start_capture(config):
+    """Запись запросов в файл, если она включена (--capture-file)."""
+    return TrafficCapture(config.capture_file).start() if config.capture_file else None
+
+def handle_client(conn, addr, db_manager, logger, pool, config, connections, limiter, cache, capture=None):
+    """Поток соединения; место в connections уже занято вызывающим."""
+    log.info("Подключен", addr=addr, open=connections.count())
+    metrics.counter("connections_accepted").inc()
+    client = ClientConnection(conn, addr, config.max_inflight, config.compress_threshold)
+    # Ведра лимитов соединения трогает только этот поток
+    client.rate_buckets = limiter.new_connection()
+    client.cache = cache
+    client.capture = capture
+    client.capture_id = capture.new_connection() if capture is not None else None
+    connections.add(client)
+    
+    try:
+        # Декодер берется заново на каждой итерации: рукопожатие hello может его заменить
+        while client.protocol.decoder.recv_from(conn):
+            client.touch()
+            while True:
+                frame = client.protocol.decoder.next_frame()
+                if frame is None:
+                    break
+                _handle_frame(client, frame, db_manager, pool, config, limiter)
+    except FrameError as e:
+        try:
+            client.send({"error": e.message})
+        except OSError:
+            pass
     except Exception as e:
-        print(f"[SERVER] Ошибка с клиентом {addr}: {e}")
+        log.error("Ошибка с клиентом", addr=addr, error=e)
     finally:
+        client.wait_idle()
         conn.close()
-        print(f"[SERVER] Отключен {addr}")
+        connections.release(client)
+        log.info("Отключен", addr=addr)
 
 def process_request(request, db_manager):
-    action = request.get("action")
-    
-    if action == "login":
-        return routes.handle_login(
-            db_manager,
-            request.get("username"),
-            request.get("password")
-        )
-    
-    elif action == "register":
-        return routes.handle_register(
-            db_manager,
-            request.get("username"),
-            request.get("password"),
-            request.get("phone"),
-            request.get("dob")
-        )
-    
-    elif action == "get_exercises":
-        return routes.handle_get_exercises(
-            db_manager,
-            request.get("condition"),
-            request.get("level"),
-            request.get("goal")
-        )
-    
-    elif action == "track_progress":
-        return routes.handle_track_progress(
-            db_manager,
-            request.get("username"),
-            request.get("exercise")
-        )
-    
-    elif action == "save_workout_history":
-        return routes.handle_save_workout_history(
-            db_manager,
-            request.get("username"),
-            request.get("workout_name"),
-            request.get("exercises"),
-            request.get("duration")
-        )
-    
-    elif action == "get_workout_history":
-        return routes.handle_get_workout_history(
-            db_manager,
-            request.get("username")
-        )
-    
-    elif action == "get_user_plans":
-        return routes.handle_get_user_plans(
-            db_manager,
-            request.get("username")
-        )
-    
-    elif action == "get_nutrition_plan":
-        return routes.handle_get_nutrition_plan(
-            db_manager,
-            request.get("goal")
-        )
-    
-    elif action == "load_existing_plan":
-        return routes.handle_load_existing_plan(
-            db_manager,
-            request.get("username"),
-            request.get("plan_id")
-        )
-    
-    elif action == "save_plan":
-        return routes.handle_save_plan(
-            db_manager,
-            request.get("username"),
-            request.get("plan_name"),
-            request.get("level"),
-            request.get("goal"),
-            request.get("condition"),
-            request.get("exercises")
-        )
-    
-    else:
-        return {"error": "Unknown action", "action": action}
-
-def run_server(stop_event, logger_func):
-    db_manager = DatabaseManager()
+    # Все действия и их обработчики регистрируются в routes.ACTIONS
+    return routes.process_request(request, db_manager)
+
+def drain_connections(connections, config):
+    """Плавная остановка: клиенты получают server_shutdown, запросы в работе дорабатываются.
+    
+    Соединения, не закрывшиеся за config.drain_timeout, закрываются принудительно.
+    """
+    started = time.monotonic()
+    notified = connections.begin_drain(config.reconnect_jitter_ms)
+    remaining = connections.wait_closed(config.drain_timeout)
+    if remaining:
+        connections.abort_all()
+        connections.wait_closed(DRAIN_SEND_TIMEOUT)
+    log.info("Соединения закрыты", notified=notified, forced=remaining,
+             seconds=round(time.monotonic() - started, 3))
+
+def run_server(stop_event, logger_func, config=None):
+    config = config or ServerConfig()
+    log.configure(config.log_level, config.log_sample_rate)
+    idempotency.configure(config.idempotency_ttl)
+    
+    if config.engine == "asyncio":
+        # Импорт здесь, чтобы async_server мог импортировать process_request из этого модуля
+        from async_server import run_async_server
+        return run_async_server(stop_event, logger_func, config)
+    
+    limit = raise_nofile_limit()
+    if limit is not None:
+        log.info("Лимит открытых дескрипторов", limit=limit)
+    
+    db_manager = DatabaseManager(**config.database_options())
     logger = LoggerObserver()
+    pool = RequestWorkerPool(config.executor_workers, config.queue_size, config.retry_after_ms)
+    connections = ConnectionRegistry(config.connection_limit(limit), config.idle_timeout)
+    limiter = RateLimiter(config.rate_limits())
+    cache = ResponseCache(db_manager, routes.NUTRITION_PLANS_FILE)
+    capture = start_capture(config)
+    snapshots = start_metrics(config, pool, connections, limiter, cache, capture, db_manager)
+    connections.start_reaper(stop_event)
     
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, PORT))
-        s.listen()
+        if config.reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        s.bind((config.host, config.port))
+        s.listen(config.backlog)
         s.settimeout(1)
         
-        print(f"[SERVER] Сервер запущен на {HOST}:{PORT}")
+        log.info(f"Сервер запущен на {config.host}:{config.port} (threaded)")
         
         while not stop_event.is_set():
             try:
                 conn, addr = s.accept()
+                if not connections.acquire():
+                    reject_connection(conn, config)
+                    continue
+                configure_keepalive(conn, config.keepalive_idle)
                 client_thread = threading.Thread(
                     target=handle_client,
-                    args=(conn, addr, db_manager, logger),
+                    args=(conn, addr, db_manager, logger, pool, config, connections, limiter, cache, capture),
                     daemon=True
                 )
                 client_thread.start()
@@ -154,7 +374,20 @@ def run_server(stop_event, logger_func):
                 continue
             except Exception as e:
                 if not stop_event.is_set():
-                    print(f"[SERVER] Ошибка: {e}")
+                    log.error("Ошибка accept()", error=e)
                 break
         
-        print("[SERVER] Сервер остановлен")
\ No newline at end of file
+    # Прием закрыт; дорабатываем принятые запросы
+    drain_connections(connections, config)
+    pool.shutdown()
+    db_manager.engine.dispose()
+    if snapshots:
+        snapshots.stop()
+    if capture is not None:
+        capture.stop()
+    log.info("Пул запросов", **pool.stats())
+    log.info("Соединения", **connections.stats())
+    log.info("Кэш ответов", **cache.stats())
+    log.info("Задержки по действиям:\n" + metrics.format_action_table())
+    log.info("Сервер остановлен", log_dropped=log.dropped)
+    log.flush()
\ No newline at end of file
@@ -0,0 +1,169 @@
+# server_log.py
+# Асинхронный журнал сервера: обработчики кладут в очередь готовые структуры
+# (время, уровень, сообщение, поля), а форматирование и запись в stdout
+# выполняет фоновый поток. Медленный stdout не задерживает ответы клиентам.
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+# Поля запросов, которые не должны попадать в журнал и файл записи трафика
+# (token - токен администратора в server_stats)
+REDACTED_FIELDS = frozenset({"password", "phone", "token"})
+# Длинные значения (пакеты, списки упражнений) обрезаются
+MAX_VALUE_LENGTH = 500
+QUEUE_SIZE = 10000
+
+def redact(value):
+    """Копия значения с замененными секретными полями (во вложенных словарях тоже)."""
+    if isinstance(value, dict):
+        return {k: "***" if k in REDACTED_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+def _format_value(value):
+    text = repr(redact(value)) if isinstance(value, (dict, list)) else str(value)
+    if len(text) > MAX_VALUE_LENGTH:
+        text = text[:MAX_VALUE_LENGTH] + f"...(+{len(text) - MAX_VALUE_LENGTH})"
+    return text
+
+class AsyncLogger:
+    """Журнал с очередью и фоновым потоком записи.
+
+    level отсекает записи до постановки в очередь; sample_rate - доля записей
+    с sampled=True (журнал каждого запроса), которые вообще попадают в очередь.
+    Если очередь переполнена, запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, level=INFO, sample_rate=1.0, queue_size=QUEUE_SIZE, stream=None):
+        self.level = level
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self.stream = stream
+        self.dropped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def configure(self, level=None, sample_rate=None):
+        if level is not None:
+            self.level = LEVELS[level] if isinstance(level, str) else level
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, message, sampled=False, **fields):
+        if level < self.level:
+            return
+        if sampled and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._put((time.time(), level, message, fields))
+
+    def debug(self, message, **fields):
+        self.log(DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        self.log(INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        self.log(WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        self.log(ERROR, message, **fields)
+
+    def defer(self, fn, *args):
+        """Выполняет fn(*args) в потоке журнала (например, рассылку наблюдателям)."""
+        self._put((fn, args))
+
+    def flush(self, timeout=5.0):
+        """Ждет, пока фоновый поток запишет все, что уже в очереди."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        self._put((done.set, ()))
+        done.wait(timeout)
+
+    def stats(self):
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {"queue_depth": depth, "written": self.written, "dropped": self.dropped}
+
+    def _put(self, item):
+        q = self._ensure_started()
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # После fork() поток родителя в дочернем процессе не существует - запускаем свой
+        if self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.queue_size)
+                self.dropped = 0
+                self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="server-log", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+        return self._queue
+
+    def _run(self, q):
+        reported_drops = 0
+        while True:
+            item = q.get()
+            lines = []
+            # Забираем все, что накопилось, и пишем одним вызовом
+            while True:
+                if len(item) == 2:
+                    self._write(lines)
+                    lines = []
+                    fn, args = item
+                    try:
+                        fn(*args)
+                    except Exception as e:
+                        lines.append(self.format(time.time(), ERROR, "Ошибка наблюдателя журнала", {"error": e}))
+                else:
+                    lines.append(self.format(*item))
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+            if self.dropped != reported_drops:
+                lines.append(self.format(time.time(), WARNING, "Журнал переполнен, записи пропущены",
+                                         {"dropped": self.dropped - reported_drops}))
+                reported_drops = self.dropped
+            self._write(lines)
+
+    def _write(self, lines):
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+            self.written += len(lines)
+        except Exception:
+            pass
+
+    @staticmethod
+    def format(created, level, message, fields):
+        stamp = time.strftime("%H:%M:%S", time.localtime(created))
+        line = f"[SERVER] {stamp} {LEVEL_NAMES.get(level, level)} {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        return line + "\n"
+
+# Общий журнал процесса
+log = AsyncLogger()
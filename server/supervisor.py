@@ -0,0 +1,147 @@
+# supervisor.py
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+
+from server import run_server
+from server_log import log
+
+# Пауза перед перезапуском упавшего воркера растет до этого значения (сек)
+MAX_RESTART_DELAY = 30.0
+# Воркер, проработавший дольше этого, перезапускается без накопленной паузы (сек)
+STABLE_UPTIME = 60.0
+# Сколько ждать завершения воркеров после SIGTERM, прежде чем SIGKILL (сек)
+SHUTDOWN_TIMEOUT = 15.0
+
+class WorkerSupervisor:
+    """Запускает N процессов-воркеров, каждый со своим SO_REUSEPORT-сокетом на одном порту.
+
+    Перезапускает упавшие воркеры и останавливает их по SIGTERM/SIGINT.
+    """
+
+    def __init__(self, config, workers, logger_func):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Режим --workers требует os.fork() (Linux/macOS)")
+        self.config = config
+        self.config.reuse_port = True
+        self.workers = workers
+        self.logger_func = logger_func
+        self.children = {}  # pid -> номер воркера
+        self.restart_delay = {}  # номер воркера -> текущая пауза перед перезапуском
+        self.started_at = {}  # номер воркера -> время запуска
+        self.restart_at = {}  # номер упавшего воркера -> когда его перезапустить (monotonic)
+        self.stopping = False
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(index)  # не возвращается
+        self.children[pid] = index
+        self.started_at[index] = time.monotonic()
+        print(f"[SUPERVISOR] Воркер {index} запущен, pid {pid}")
+
+    def _run_worker(self, index):
+        """Тело дочернего процесса: свой DatabaseManager создается внутри run_server."""
+        exit_code = 0
+        try:
+            stop_event = threading.Event()
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            run_server(stop_event, self.logger_func, self.config)
+        except BaseException as e:
+            print(f"[SUPERVISOR] Воркер {index} упал: {e}")
+            exit_code = 1
+        finally:
+            log.flush()
+            sys.stdout.flush()
+            os._exit(exit_code)
+
+    def _on_signal(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self):
+        """Собирает завершившиеся процессы; упавшие, если это не остановка, ставит в очередь на перезапуск."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+
+            if time.monotonic() - self.started_at.get(index, 0) > STABLE_UPTIME:
+                self.restart_delay[index] = 0.5
+            delay = self.restart_delay.get(index, 0.5)
+            print(f"[SUPERVISOR] Воркер {index} (pid {pid}) завершился со статусом {status}, "
+                  f"перезапуск через {delay:.1f} с")
+            # Пауза не ждется здесь: остальные воркеры и сигналы обрабатываются, пока она идет
+            self.restart_at[index] = time.monotonic() + delay
+            self.restart_delay[index] = min(delay * 2, MAX_RESTART_DELAY)
+
+    def _restart_due(self):
+        """Запускает воркеры, пауза перед перезапуском которых истекла."""
+        now = time.monotonic()
+        for index, deadline in list(self.restart_at.items()):
+            if deadline <= now and not self.stopping:
+                del self.restart_at[index]
+                self._spawn(index)
+
+    def _sleep_interval(self):
+        """Сколько спать в основном цикле: до ближайшего перезапуска, но не больше секунды."""
+        if not self.restart_at:
+            return 1.0
+        return min(1.0, max(0.0, min(self.restart_at.values()) - time.monotonic()))
+
+    def _shutdown(self):
+        self.restart_at.clear()
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        # Воркерам нужно успеть доработать запросы (drain_timeout)
+        deadline = time.monotonic() + max(SHUTDOWN_TIMEOUT, self.config.drain_timeout + 5)
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            print(f"[SUPERVISOR] Воркер pid {pid} не остановился, SIGKILL")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+        # Все, что загружено до fork() (модули, каталог упражнений), переносим в
+        # постоянное поколение: сборщик не будет трогать эти объекты, и страницы
+        # памяти останутся общими между воркерами (copy-on-write).
+        gc.collect()
+        gc.freeze()
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            while not self.stopping:
+                self._reap()
+                self._restart_due()
+                time.sleep(self._sleep_interval())
+        finally:
+            print("[SUPERVISOR] Остановка воркеров...")
+            self._shutdown()
+            print("[SUPERVISOR] Все воркеры остановлены")
@@ -0,0 +1,87 @@
+# user_cache.py
+# Кэш username -> User.id перед самым частым запросом сервера: почти каждое
+# действие начинается с поиска пользователя по имени, а id после регистрации
+# не меняется. DatabaseManager сбрасывает записи после commit, в котором
+# пользователь добавлен, переименован или удален.
+import threading
+import time
+from collections import OrderedDict
+
+# Сколько имен помнить; сверх лимита вытесняются давно не использованные
+MAX_ENTRIES = 100000
+# Сколько секунд помнить, что пользователя нет. Регистрация в этом процессе
+# сбрасывает запись сразу, а в другом воркере (--workers) - нет, поэтому
+# отрицательный ответ живет недолго
+NEGATIVE_TTL = 2.0
+
+class UserIdCache:
+    """LRU-кэш username -> id (None - пользователя нет), общий для всех потоков.
+
+    Промах: get() возвращает поколение кэша, put() с этим поколением ничего не
+    запишет, если между ними был сброс, - ответ запроса, начатого до commit
+    регистрации или переименования, не останется в кэше.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, negative_ttl=NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, username):
+        """(найдено, id, поколение)."""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None:
+                user_id, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.entries.move_to_end(username)
+                    self.hits += 1
+                    return True, user_id, self.generation
+                del self.entries[username]
+            self.misses += 1
+            return False, None, self.generation
+
+    def put(self, username, user_id, generation=None):
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.negative_ttl if user_id is None else None
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[username] = (user_id, expires)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, usernames):
+        with self.lock:
+            self.generation += 1
+            for username in usernames:
+                if self.entries.pop(username, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
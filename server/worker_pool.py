@@ -0,0 +1,96 @@
+# worker_pool.py
+import queue
+import threading
+from concurrent.futures import Future
+
+class ServerBusy(Exception):
+    """Очередь запросов заполнена, запрос не принят."""
+
+    def __init__(self, retry_after_ms, queue_depth):
+        super().__init__(f"Очередь запросов заполнена ({queue_depth})")
+        self.retry_after_ms = retry_after_ms
+        self.queue_depth = queue_depth
+
+def busy_response(error):
+    """Ответ клиенту, когда сервер не может принять запрос."""
+    return {
+        "action": "busy",
+        "success": False,
+        "retry_after_ms": error.retry_after_ms,
+        "message": f"Сервер перегружен, повторите через {error.retry_after_ms} мс"
+    }
+
+class RequestWorkerPool:
+    """Фиксированный пул потоков с ограниченной очередью между чтением сокетов и process_request.
+
+    Если очередь заполнена, submit() сразу бросает ServerBusy, а не копит потоки.
+    """
+
+    def __init__(self, workers=16, queue_size=256, retry_after_ms=200, name="request-worker"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after_ms = retry_after_ms
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._threads = []
+
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args):
+        """Ставит вызов в очередь и возвращает concurrent.futures.Future."""
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise ServerBusy(self.retry_after_ms, self._queue.qsize())
+        return future
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._active += 1
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+
+    def stats(self):
+        """Текущее состояние пула: глубина очереди, занятые потоки, отказы."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "active": self._active,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait=True):
+        """Дорабатывает уже принятые запросы и останавливает потоки."""
+        for _ in self._threads:
+            # put() без таймаута: воркеры разбирают очередь, место освободится
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,44 @@
+"""
+Тесты записи входящих запросов TrafficCapture.
+"""
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from capture import TrafficCapture
+
+class TestTrafficCapture:
+    """Тесты TrafficCapture."""
+
+    def test_records_redacted_requests(self, tmp_path):
+        """В файл попадают время, id соединения и запрос без пароля, телефона и токена."""
+        capture = TrafficCapture(str(tmp_path / "capture-{pid}.jsonl")).start()
+        first, second = capture.new_connection(), capture.new_connection()
+        capture.record(first, {"action": "login", "username": "anna", "password": "secret"})
+        capture.record(second, {"action": "batch", "requests": [
+            {"action": "register", "username": "boris", "password": "pw", "phone": "+375291112233"}]})
+        capture.record(first, {"action": "server_stats", "token": "s3cret"})
+        capture.stop()
+
+        with open(tmp_path / f"capture-{os.getpid()}.jsonl", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["conn"] for r in records] == [first, second, first]
+        assert first != second
+        assert records[0]["request"] == {"action": "login", "username": "anna", "password": "***"}
+        assert records[1]["request"]["requests"][0]["phone"] == "***"
+        assert records[2]["request"]["token"] == "***"
+        assert records[0]["ts"] <= records[2]["ts"]
+        assert "secret" not in json.dumps(records)
+
+    def test_appends(self, tmp_path):
+        """Повторный запуск дописывает файл, а не перезаписывает."""
+        path = str(tmp_path / "capture.jsonl")
+        for _ in range(2):
+            capture = TrafficCapture(path).start()
+            capture.record(capture.new_connection(), {"action": "get_exercises"})
+            capture.stop()
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 2
+        assert capture.stats()["written"] == 1
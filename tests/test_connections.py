@@ -0,0 +1,62 @@
+"""
+Тесты учета соединений ConnectionRegistry.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from config import FD_RESERVE, ServerConfig
+from connections import ConnectionRegistry
+
+class FakeConnection:
+    def __init__(self, last_activity, busy=False):
+        self.last_activity = last_activity
+        self.busy = busy
+        self.closed = 0
+
+    def is_busy(self):
+        return self.busy
+
+    def close_idle(self):
+        self.closed += 1
+
+class TestConnectionRegistry:
+    """Тесты лимита и сборки простаивающих соединений."""
+
+    def test_limit(self):
+        """Сверх max_connections acquire() отказывает, release() освобождает место."""
+        registry = ConnectionRegistry(max_connections=2)
+        assert registry.acquire() and registry.acquire()
+        assert not registry.acquire()
+        registry.release()
+        assert registry.acquire()
+        assert registry.stats()["rejected"] == 1
+        assert registry.stats()["peak"] == 2
+
+    def test_default_limit_follows_nofile(self):
+        """Без --max-connections лимит - дескрипторы процесса минус запас; явное значение важнее."""
+        assert ServerConfig().connection_limit(65536) == 65536 - FD_RESERVE
+        assert ServerConfig().connection_limit(None) == 0
+        assert ServerConfig(max_connections=100).connection_limit(65536) == 100
+        assert ServerConfig(max_connections=0).connection_limit(1024) == 0
+
+    def test_reap_skips_busy_and_active(self):
+        """Закрываются только простаивающие соединения без запросов в работе, и только один раз."""
+        registry = ConnectionRegistry(idle_timeout=10)
+        idle, busy, active = FakeConnection(0), FakeConnection(0, busy=True), FakeConnection(95)
+        for connection in (idle, busy, active):
+            registry.acquire()
+            registry.add(connection)
+
+        assert registry.reap(now=100) == 1
+        assert registry.reap(now=100) == 0
+        assert (idle.closed, busy.closed, active.closed) == (1, 0, 0)
+
+    def test_no_timeout(self):
+        """idle_timeout=0 отключает закрытие."""
+        registry = ConnectionRegistry()
+        registry.acquire()
+        registry.add(FakeConnection(0))
+        assert registry.reap(now=10 ** 6) == 0
+        assert registry.start_reaper(None) is None
@@ -0,0 +1,74 @@
+"""
+Тесты настроек SQLite и пула соединений DatabaseManager.
+"""
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+pytest.importorskip("sqlalchemy")
+
+import routes
+from config import ServerConfig
+from models import DatabaseManager
+
+class TestSqliteSettings:
+    """Тесты PRAGMA на соединениях пула."""
+
+    def test_pragmas_applied_to_every_connection(self, temp_db_path):
+        """Каждое соединение пула получает WAL и остальные настройки, а не только первое."""
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+        try:
+            connections = [manager.engine.connect() for _ in range(3)]
+            for conn in connections:
+                assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+                assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+                assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+            for conn in connections:
+                conn.close()
+            assert manager.pool_stats()["idle"] == 3
+        finally:
+            manager.engine.dispose()
+
+    def test_override_and_disable(self, temp_db_path):
+        """pragmas дополняют настройки; {} оставляет умолчания SQLite."""
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}", pragmas={"busy_timeout": 250})
+        assert manager.sqlite_settings()["busy_timeout"] == 250
+        manager.engine.dispose()
+
+        plain = DatabaseManager("sqlite://", pragmas={})
+        assert plain.sqlite_settings()["journal_mode"] == "memory"
+        assert plain.pool_stats() == {"class": "SingletonThreadPool"}
+
+class TestPool:
+    """Тесты размера пула."""
+
+    def test_server_config_pool_follows_workers(self):
+        """По умолчанию соединений с БД столько же, сколько обработчиков."""
+        assert ServerConfig(executor_workers=24).database_options()["pool_size"] == 24
+        assert ServerConfig(executor_workers=24, db_pool_size=4).database_options()["pool_size"] == 4
+
+    def test_concurrent_writers(self, temp_db_path):
+        """Параллельные track_progress из многих потоков проходят без "database is locked"."""
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}", pool_size=8)
+        routes.handle_register(manager, "anna", "secret", "+375291112233", "1995-05-05")
+        results = []
+
+        def writer():
+            for _ in range(20):
+                results.append(routes.handle_track_progress(manager, "anna", "Планка")["success"])
+
+        threads = [threading.Thread(target=writer) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        try:
+            assert results == [True] * 160
+            assert len(routes.handle_get_progress_history(manager, "anna")["progress"]) == 160
+            assert manager.pool_stats()["checked_out"] == 0
+        finally:
+            manager.engine.dispose()
@@ -0,0 +1,78 @@
+"""
+Тесты инкрементального декодера кадров протокола.
+"""
+import sys
+import os
+import json
+import socket
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from framing import FrameDecoder, FrameTooLarge
+
+class TestFrameDecoder:
+    """Тесты FrameDecoder."""
+
+    def test_pipelined_frames(self):
+        """Несколько кадров в одном куске разбираются по порядку."""
+        decoder = FrameDecoder()
+        decoder.feed(b'{"a": 1}\n{"a": 2}\n{"a"')
+        assert [json.loads(f) for f in decoder.frames()] == [{"a": 1}, {"a": 2}]
+        decoder.feed(b': 3}\n')
+        assert [json.loads(f) for f in decoder.frames()] == [{"a": 3}]
+        assert decoder.pending() == 0
+
+    def test_split_cyrillic_character(self):
+        """Кириллический символ, разрезанный границей чтения, не портится."""
+        payload = json.dumps({"exercise": "Приседания"}, ensure_ascii=False).encode("utf-8") + b"\n"
+        cut = payload.index("П".encode("utf-8")) + 1  # посередине двухбайтового символа
+
+        decoder = FrameDecoder()
+        decoder.feed(payload[:cut])
+        assert decoder.frames() == []
+        decoder.feed(payload[cut:])
+        assert json.loads(decoder.frames()[0]) == {"exercise": "Приседания"}
+
+    def test_byte_by_byte(self):
+        """Поток по одному байту дает те же кадры."""
+        data = "".join(json.dumps({"i": i, "name": "Планка"}, ensure_ascii=False) + "\n" for i in range(20))
+        decoder = FrameDecoder()
+        frames = []
+        for byte in data.encode("utf-8"):
+            decoder.feed(bytes([byte]))
+            frames.extend(decoder.frames())
+        assert [json.loads(f)["i"] for f in frames] == list(range(20))
+
+    def test_empty_lines_skipped(self):
+        """Пустые строки между кадрами игнорируются."""
+        decoder = FrameDecoder()
+        decoder.feed(b"\n\n{}\n\n")
+        assert decoder.frames() == [b"{}"]
+
+    def test_max_frame_size(self):
+        """Кадр больше лимита - FrameTooLarge, даже без разделителя."""
+        decoder = FrameDecoder(max_frame_size=16)
+        decoder.feed(b"x" * 17)
+        with pytest.raises(FrameTooLarge):
+            decoder.frames()
+
+        decoder = FrameDecoder(max_frame_size=16)
+        decoder.feed(b"y" * 32 + b"\n")
+        with pytest.raises(FrameTooLarge):
+            decoder.frames()
+
+    def test_recv_from_socket(self):
+        """recv_from читает через recv_into и возвращает 0 при закрытии."""
+        left, right = socket.socketpair()
+        try:
+            decoder = FrameDecoder(recv_size=4)
+            left.sendall(b'{"ok": true}\n')
+            left.close()
+            frames = []
+            while decoder.recv_from(right):
+                frames.extend(decoder.frames())
+            assert frames == [b'{"ok": true}']
+        finally:
+            right.close()
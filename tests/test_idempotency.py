@@ -0,0 +1,136 @@
+"""
+Тесты ключей идемпотентности для изменяющих действий.
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+import idempotency
+from idempotency import IdempotencyStore
+
+class TestIdempotencyStore:
+    """Тесты IdempotencyStore."""
+
+    def test_replay_returns_first_response(self):
+        """Повтор с тем же ключом не выполняется, а получает копию первого ответа."""
+        store = IdempotencyStore(ttl=60)
+        calls = []
+
+        def run():
+            calls.append(1)
+            return {"action": "save_plan", "success": True, "plan_id": len(calls)}
+
+        first = store.execute("anna", "save_plan", "k1", run)
+        second = store.execute("anna", "save_plan", "k1", run)
+        assert len(calls) == 1
+        assert second == dict(first, replayed=True)
+        # Тот же ключ у другого пользователя или действия - другой запрос
+        store.execute("boris", "save_plan", "k1", run)
+        store.execute("anna", "save_workout_history", "k1", run)
+        assert len(calls) == 3
+        assert store.stats()["replayed"] == 1
+
+    def test_failure_not_remembered(self):
+        """После неуспешного ответа или исключения повтор выполняется заново."""
+        store = IdempotencyStore(ttl=60)
+        responses = iter([{"success": False}, {"success": True}])
+        assert store.execute("anna", "save_plan", "k", lambda: next(responses))["success"] is False
+        assert store.execute("anna", "save_plan", "k", lambda: next(responses))["success"] is True
+
+        def fail():
+            raise RuntimeError("db")
+        with pytest.raises(RuntimeError):
+            store.execute("anna", "register", "k", fail)
+        assert store.execute("anna", "register", "k", lambda: {"success": True}) == {"success": True}
+
+    def test_concurrent_retry_waits(self):
+        """Повтор, пришедший во время выполнения первого запроса, ждет его ответа."""
+        store = IdempotencyStore(ttl=60)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return {"success": True, "plan_id": 1}
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(store.execute("anna", "save_plan", "k", slow)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(
+            store.execute("anna", "save_plan", "k", lambda: {"success": True, "plan_id": 2})))
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+        assert sorted(r["plan_id"] for r in results) == [1, 1]
+
+    def test_bounded_per_user(self, monkeypatch):
+        """Число ключей пользователя ограничено, истекшие ключи удаляются."""
+        monkeypatch.setattr(idempotency, "MAX_KEYS_PER_USER", 5)
+        store = IdempotencyStore(ttl=60)
+        for i in range(20):
+            store.execute("anna", "save_plan", f"k{i}", lambda: {"success": True})
+        assert store.stats()["keys"] == 5
+
+        store.configure(ttl=0.001)
+        calls = []
+        for _ in range(2):
+            store.execute("anna", "save_plan", "k", lambda: calls.append(1) or {"success": True})
+            time.sleep(0.01)
+        assert len(calls) == 2
+
+class TestIdempotentRoutes:
+    """Ключ идемпотентности в обработчиках routes."""
+
+    @pytest.fixture
+    def db_manager(self, temp_db_path, monkeypatch):
+        pytest.importorskip("sqlalchemy")
+        import routes
+        from models import DatabaseManager
+        monkeypatch.setattr(routes, "idempotency", IdempotencyStore(ttl=60))
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+        routes.handle_register(manager, "anna", "secret", "+375291112233", "1995-05-05")
+        yield manager
+        manager.engine.dispose()
+
+    def test_retried_save_creates_one_row(self, db_manager):
+        """Повтор save_workout_history с тем же ключом не создает вторую запись."""
+        import routes
+        from models import WorkoutHistory
+        request = {"action": "save_workout_history", "username": "anna", "workout_name": "Утро",
+                   "exercises": ["Планка"], "duration": 600, "idempotency_key": "retry-1"}
+        first = routes.process_request(dict(request, id=1), db_manager)
+        second = routes.process_request(dict(request, id=2), db_manager)
+        assert first["success"] is True
+        assert second["history_id"] == first["history_id"]
+
+        session = db_manager.Session()
+        try:
+            assert session.query(WorkoutHistory).count() == 1
+        finally:
+            session.close()
+
+        invalid = routes.process_request(dict(request, idempotency_key=["x"]), db_manager)
+        assert invalid["success"] is False
+
+    def test_batch_key_not_shared_between_users(self, db_manager):
+        """Ключ на уровне batch отклоняется; ключи вложенных запросов - свои у каждого пользователя."""
+        import routes
+        routes.handle_register(db_manager, "boris", "secret", "+375291112244", "1990-01-01")
+        plan = {"action": "save_plan", "plan_name": "План", "level": "Новичок", "goal": "Похудение",
+                "condition": "Дом", "exercises": ["Планка"], "idempotency_key": "k1"}
+        rejected = routes.process_request(
+            {"action": "batch", "requests": [dict(plan, username="anna")], "idempotency_key": "k1"}, db_manager)
+        assert rejected["success"] is False
+
+        anna = routes.process_request({"action": "batch", "requests": [dict(plan, username="anna")]}, db_manager)
+        boris = routes.process_request({"action": "batch", "requests": [dict(plan, username="boris")]}, db_manager)
+        assert anna["results"][0]["success"] and boris["results"][0]["success"]
+        assert "replayed" not in boris["results"][0]
+        assert boris["results"][0]["plan_id"] != anna["results"][0]["plan_id"]
@@ -0,0 +1,101 @@
+"""
+Тесты показателей сервера: гистограммы, снимки и действие server_stats.
+"""
+import sys
+import os
+import json
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from metrics import LatencyHistogram, MetricsRegistry, SnapshotWriter, _bucket_index, _bucket_value
+
+class TestLatencyHistogram:
+    """Тесты LatencyHistogram."""
+
+    def test_buckets_cover_range(self):
+        """Корзины идут подряд, а значение корзины отличается от исходного не больше чем на 1/64."""
+        previous = -1
+        for value in list(range(0, 5000)) + [10 ** 6, 123456789]:
+            index = _bucket_index(value)
+            assert index >= previous
+            previous = index
+            assert abs(_bucket_value(index) - value) <= max(1, value / 64)
+
+    def test_percentiles(self):
+        """Перцентили совпадают с точными с точностью гистограммы."""
+        rng = random.Random(1)
+        samples = sorted(rng.expovariate(1 / 0.005) for _ in range(10000))
+        histogram = LatencyHistogram()
+        for seconds in samples:
+            histogram.record(seconds)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 10000
+        for p, key in ((50, "p50_ms"), (99, "p99_ms")):
+            exact_ms = samples[int(len(samples) * p / 100) - 1] * 1000
+            assert snapshot[key] == pytest.approx(exact_ms, rel=0.03)
+        assert snapshot["max_ms"] == pytest.approx(samples[-1] * 1000, abs=0.001)
+
+    def test_empty(self):
+        """Пустая гистограмма дает нули, а не ошибку."""
+        snapshot = LatencyHistogram().snapshot()
+        assert snapshot["count"] == 0
+        assert snapshot["p99_ms"] == 0.0
+
+class TestRegistry:
+    """Тесты MetricsRegistry и SnapshotWriter."""
+
+    def test_snapshot_totals_and_providers(self):
+        """Снимок суммирует действия и включает поставщиков."""
+        registry = MetricsRegistry()
+        registry.action("login").observe(0.002, failure=True)
+        registry.action("get_exercises").observe(0.001, error=True)
+        registry.gauge("connections").inc()
+        registry.register_provider("pool", lambda: {"queue_depth": 3})
+
+        snapshot = registry.snapshot()
+        assert snapshot["counters"]["requests"] == 2
+        assert snapshot["counters"]["errors"] == 1
+        assert snapshot["gauges"]["connections"] == 1
+        assert snapshot["gauges"]["threads"] >= 1
+        assert snapshot["pool"] == {"queue_depth": 3}
+        json.dumps(snapshot)
+
+    def test_snapshot_file(self, tmp_path):
+        """Файл снимков - валидный JSON, {pid} заменяется на pid."""
+        registry = MetricsRegistry()
+        registry.action("login").observe(0.001)
+        writer = SnapshotWriter(registry, str(tmp_path / "stats-{pid}.json"), interval=60)
+        writer.write()
+        with open(tmp_path / f"stats-{os.getpid()}.json", encoding="utf-8") as f:
+            assert json.load(f)["actions"]["login"]["count"] == 1
+
+class TestServerStatsAction:
+    """Тесты действия server_stats."""
+
+    @pytest.fixture
+    def db_manager(self, temp_db_path):
+        pytest.importorskip("sqlalchemy")
+        from models import DatabaseManager
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+        yield manager
+        manager.engine.dispose()
+
+    def test_stats_include_db_queries(self, db_manager):
+        """После запроса к БД в снимке есть гистограмма db.select."""
+        import routes
+        routes.process_request({"action": "login", "username": "nobody", "password": "x"}, db_manager)
+        response = routes.process_request({"action": "server_stats"}, db_manager)
+        assert response["success"] is True
+        assert response["stats"]["histograms"]["db.select"]["count"] >= 1
+        assert response["stats"]["actions"]["login"]["count"] >= 1
+
+    def test_token_required_when_configured(self, db_manager, monkeypatch):
+        """С переменной окружения FITNESS_ADMIN_TOKEN нужен правильный token."""
+        import routes
+        monkeypatch.setenv(routes.ADMIN_TOKEN_ENV, "s3cret")
+        assert routes.process_request({"action": "server_stats"}, db_manager)["success"] is False
+        assert routes.process_request({"action": "server_stats", "token": "s3cret"}, db_manager)["success"] is True
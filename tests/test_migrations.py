@@ -0,0 +1,85 @@
+"""
+Тесты миграций схемы (server/migrations.py).
+"""
+import sys
+import os
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+pytest.importorskip("sqlalchemy")
+
+import migrations
+from models import DatabaseManager
+
+USER_TIME_INDEXES = {"ix_progress_user_timestamp", "ix_saved_plans_user_created_at",
+                     "ix_workout_history_user_completed_at"}
+
+def indexes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+@pytest.fixture
+def old_db(temp_db_path):
+    """База в схеме до миграций: таблицы есть, индексов и номера версии нет."""
+    DatabaseManager(f"sqlite:///{temp_db_path}").engine.dispose()
+    conn = sqlite3.connect(temp_db_path)
+    for name in USER_TIME_INDEXES:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+    return temp_db_path
+
+class TestMigrations:
+    """Тесты обновления существующих баз."""
+
+    def test_new_database_is_current(self, temp_db_path):
+        """Новая база создается с индексами и сразу получает последний номер."""
+        DatabaseManager(f"sqlite:///{temp_db_path}").engine.dispose()
+        assert USER_TIME_INDEXES <= indexes(temp_db_path)
+        assert user_version(temp_db_path) == migrations.LATEST_VERSION
+
+    def test_existing_database_upgraded_in_place(self, old_db):
+        """DatabaseManager добавляет индексы в старую базу; повторный запуск ничего не делает."""
+        assert not USER_TIME_INDEXES & indexes(old_db)
+        manager = DatabaseManager(f"sqlite:///{old_db}")
+        try:
+            assert USER_TIME_INDEXES <= indexes(old_db)
+            assert user_version(old_db) == migrations.LATEST_VERSION
+            assert migrations.pending(manager.engine) == []
+            assert migrations.upgrade(manager.engine) == migrations.LATEST_VERSION
+
+            with manager.engine.connect() as conn:
+                plan = conn.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT * FROM workout_history WHERE user_id = 1 "
+                    "ORDER BY completed_at DESC").fetchall()
+            # Строки идут из индекса в нужном порядке, без сортировки
+            assert any("ix_workout_history_user_completed_at" in row[-1] for row in plan)
+            assert not any("TEMP B-TREE" in row[-1] for row in plan)
+        finally:
+            manager.engine.dispose()
+
+    def test_add_column_is_idempotent(self, temp_db_path):
+        """add_column добавляет столбец один раз; существующие строки получают значение по умолчанию."""
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+        try:
+            with manager.engine.begin() as conn:
+                conn.exec_driver_sql("INSERT INTO users (username, password) VALUES ('anna', 'pw')")
+                migrations.add_column(conn, "users", "timezone", "TEXT DEFAULT 'UTC'")
+                migrations.add_column(conn, "users", "timezone", "TEXT DEFAULT 'UTC'")
+                assert conn.exec_driver_sql("SELECT timezone FROM users").scalar() == "UTC"
+        finally:
+            manager.engine.dispose()
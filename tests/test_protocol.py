@@ -0,0 +1,161 @@
+"""
+Тесты компактной кодировки, кадров с префиксом длины и рукопожатия hello.
+"""
+import sys
+import os
+import json
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+import compact
+from framing import LengthPrefixDecoder, encode_length_prefixed, FrameError, FrameTooLarge
+from protocol import ConnectionProtocol
+
+class TestCompactCodec:
+    """Тесты compact.encode/decode."""
+
+    def test_roundtrip(self):
+        """Все JSON-типы проходят кодирование без потерь."""
+        value = {
+            "action": "workout_history",
+            "success": True,
+            "none": None,
+            "flag": False,
+            "numbers": [0, 1, -1, 63, -64, 2 ** 40, -(2 ** 70), 3.25],
+            "history": [{"workout_name": "Тренировка", "exercises": ["🔥 РАЗМИНКА: Бег", "Планка"]}] * 3,
+        }
+        assert compact.decode(compact.encode(value)) == value
+
+    def test_repeated_strings_are_references(self):
+        """Повторяющиеся строки кодируются ссылками и занимают меньше JSON."""
+        record = {"exercises": ["⚡ ОСНОВНАЯ ТРЕНИРОВКА: Становая тяга (4x8)"] * 10}
+        payload = {"history": [record] * 50}
+        encoded = compact.encode(payload)
+        assert len(encoded) * 10 < len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    def test_append_field(self):
+        """Поле, дописанное в закодированный словарь, декодируется вместе с остальными."""
+        from protocol import JsonCodec
+        response = {"action": "exercises", "exercises": ["Планка", "Планка"]}
+        for request_id in (5, "Планка", [1, "x", "x"]):
+            encoded = compact.append_field(compact.encode(response), "id", request_id)
+            assert compact.decode(encoded) == dict(response, id=request_id)
+            assert JsonCodec.append_field(JsonCodec.encode(response), "id", request_id) == \
+                JsonCodec.encode(dict(response, id=request_id))
+        assert JsonCodec.append_field(b"{}", "id", 1) == JsonCodec.encode({"id": 1})
+
+    def test_truncated_and_garbage(self):
+        """Обрезанные и мусорные данные дают CompactDecodeError, а не зависание."""
+        encoded = compact.encode({"a": [1, 2, 3], "b": "строка"})
+        with pytest.raises(compact.CompactDecodeError):
+            compact.decode(encoded[:-2])
+        with pytest.raises(compact.CompactDecodeError):
+            compact.decode(b"\x07\xff\xff\xff\xff\x0f")  # список на 4 млрд элементов
+        with pytest.raises(compact.CompactDecodeError):
+            compact.decode(b"\x06\x05")  # ссылка на несуществующую строку
+
+class TestLengthPrefixDecoder:
+    """Тесты кадров с префиксом длины."""
+
+    def test_split_frames(self):
+        """Кадры собираются из кусков произвольной длины."""
+        stream = encode_length_prefixed(b"first\n") + encode_length_prefixed(b"second")
+        decoder = LengthPrefixDecoder()
+        frames = []
+        for i in range(len(stream)):
+            decoder.feed(stream[i:i + 1])
+            frames.extend(decoder.frames())
+        assert frames == [b"first\n", b"second"]
+
+    def test_declared_size_limit(self):
+        """Слишком большая заявленная длина отклоняется до получения данных."""
+        decoder = LengthPrefixDecoder(max_frame_size=100)
+        decoder.feed((101).to_bytes(4, "big"))
+        with pytest.raises(FrameTooLarge):
+            decoder.next_frame()
+
+class TestHandshake:
+    """Тесты ConnectionProtocol.negotiate."""
+
+    def test_switch_keeps_following_bytes(self):
+        """Байты нового формата, пришедшие вместе с hello, не теряются."""
+        protocol = ConnectionProtocol()
+        hello = json.dumps({"action": "hello", "framing": "length", "encoding": "compact", "id": 1})
+        protocol.decoder.feed(hello.encode("utf-8") + b"\n" + encode_length_prefixed(compact.encode({"action": "x"})))
+
+        request = protocol.decode(protocol.decoder.next_frame())
+        reply = protocol.negotiate(request)
+
+        # Ответ на hello еще в JSON-строке
+        assert json.loads(reply)["success"] is True
+        assert json.loads(reply)["id"] == 1
+        assert protocol.decode(protocol.decoder.next_frame()) == {"action": "x"}
+        assert protocol.encode({"ok": True}) == encode_length_prefixed(compact.encode({"ok": True}))
+
+    def test_unsupported_format(self):
+        """Неизвестный формат оставляет соединение в JSON-строках."""
+        protocol = ConnectionProtocol()
+        reply = json.loads(protocol.negotiate({"action": "hello", "encoding": "xml"}))
+        assert reply["success"] is False
+        assert protocol.framing == "newline"
+        assert protocol.codec.name == "json"
+
+    def test_non_string_format(self):
+        """Список или словарь вместо имени формата - тот же отказ, а не исключение."""
+        protocol = ConnectionProtocol()
+        for field, value in (("framing", ["x"]), ("encoding", {}), ("compression", ["zlib"])):
+            reply = json.loads(protocol.negotiate({"action": "hello", "framing": "length", field: value}))
+            assert reply["success"] is False
+        assert protocol.framing == "newline"
+
+class TestCompression:
+    """Тесты сжатия кадров zlib."""
+
+    def _negotiated(self, threshold):
+        protocol = ConnectionProtocol(compress_threshold=threshold)
+        reply = json.loads(protocol.negotiate({"action": "hello", "framing": "length", "compression": "zlib"}))
+        assert reply["success"] is True
+        assert reply["compress_threshold"] == threshold
+        return protocol
+
+    def test_large_frames_compressed_small_not(self):
+        """Большие ответы сжимаются, короткие уходят как есть; декодер читает оба."""
+        protocol = self._negotiated(threshold=64)
+        small = {"success": True}
+        large = {"exercises": ["🔥 РАЗМИНКА: Бег на месте (5 мин)"] * 50}
+
+        stream = protocol.encode(small) + protocol.encode(large) + protocol.encode(large)
+        assert protocol.encode(small) == encode_length_prefixed(json.dumps(small).encode("utf-8"))
+
+        decoder = LengthPrefixDecoder()
+        decoder.decompressor = zlib.decompressobj()
+        decoder.feed(stream)
+        frames = [json.loads(frame) for frame in decoder.frames()]
+        assert frames == [small, large, large]
+        # Второй такой же ответ сжимается по словарю первого
+        assert len(stream) < 3 * 200
+
+    def test_compression_requires_length_framing(self):
+        """В JSON-строках сжатие не включается."""
+        protocol = ConnectionProtocol()
+        reply = json.loads(protocol.negotiate({"action": "hello", "compression": "zlib"}))
+        assert reply["success"] is False
+        assert protocol.compression is None
+
+    def test_compressed_frame_without_negotiation(self):
+        """Сжатый кадр без согласованного сжатия - ошибка формата."""
+        decoder = LengthPrefixDecoder()
+        decoder.feed(encode_length_prefixed(zlib.compress(b"{}"), compressed=True))
+        with pytest.raises(FrameError):
+            decoder.next_frame()
+
+    def test_decompressed_size_limit(self):
+        """Распакованный размер ограничен max_frame_size."""
+        decoder = LengthPrefixDecoder(max_frame_size=1000)
+        decoder.decompressor = zlib.decompressobj()
+        decoder.feed(encode_length_prefixed(zlib.compress(b"a" * 10000), compressed=True))
+        with pytest.raises(FrameTooLarge):
+            decoder.next_frame()
@@ -0,0 +1,66 @@
+"""
+Тесты ограничения частоты запросов.
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+import rate_limit
+from rate_limit import RateLimiter, TokenBucket
+
+class TestTokenBucket:
+    """Тесты TokenBucket."""
+
+    def test_burst_then_refill(self):
+        """Запас расходуется сразу, дальше токены приходят со скоростью rate."""
+        bucket = TokenBucket(rate=10, burst=3, now=0.0)
+        assert [bucket.take(1, 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert bucket.take(1, 0.0) == pytest.approx(0.1)
+        assert bucket.take(1, 0.1) == 0.0
+
+    def test_cost_above_burst(self):
+        """Запрос дороже всего ведра проходит при полном ведре, а не никогда."""
+        bucket = TokenBucket(rate=1, burst=5, now=0.0)
+        assert bucket.take(50, 0.0) == 0.0
+        assert bucket.take(50, 1.0) == pytest.approx(4.0)
+
+class TestRateLimiter:
+    """Тесты RateLimiter."""
+
+    def test_connection_and_user_scopes(self):
+        """Пользователя ограничивает общий лимит, даже если он открыл несколько соединений."""
+        limiter = RateLimiter({"read": (1000, 1000), "write": (0.001, 2)})
+        first, second = limiter.new_connection(), limiter.new_connection()
+
+        assert limiter.check(first, "write", "anna") is None
+        assert limiter.check(second, "write", "anna") is None
+        response = limiter.check(second, "write", "anna")
+        assert response["action"] == "rate_limited"
+        assert response["scope"] == "user"
+        # Другой пользователь по тому же соединению не затронут (токены соединения вернулись)
+        assert limiter.check(second, "write", "boris") is None
+        assert limiter.check(second, "write", "boris")["scope"] == "connection"
+        assert limiter.stats()["throttled"] == {"user.write": 1, "connection.write": 1}
+
+    def test_reads_not_limited_by_writes(self):
+        """Исчерпанный лимит записи не мешает чтению; admin и выключенные классы не ограничены."""
+        limiter = RateLimiter({"read": (100, 100), "write": (0, 0)})
+        buckets = limiter.new_connection()
+        for _ in range(50):
+            assert limiter.check(buckets, "write", "anna") is None
+            assert limiter.check(buckets, "admin") is None
+        assert limiter.check(buckets, "read", "anna") is None
+
+    def test_user_buckets_bounded(self, monkeypatch):
+        """Число запомненных пользователей ограничено."""
+        monkeypatch.setattr(rate_limit, "USER_STRIPES", 1)
+        monkeypatch.setattr(rate_limit, "MAX_USERS_PER_STRIPE", 10)
+        limiter = RateLimiter({"read": (1, 5)})
+        buckets = limiter.new_connection()
+        for i in range(100):
+            buckets["read"].tokens = 5
+            limiter.check(buckets, "read", f"user{i}")
+        assert limiter.stats()["users_tracked"] <= 10
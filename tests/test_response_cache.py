@@ -0,0 +1,65 @@
+"""
+Тесты кэша готовых ответов ResponseCache.
+"""
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+import response_cache
+from protocol import CompactCodec, JsonCodec
+from response_cache import ResponseCache
+
+class FakeDatabase:
+    def __init__(self):
+        self.exercises = {"Новичок": {}}
+
+EXERCISES_REQUEST = {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"}
+EXERCISES_RESPONSE = {"action": "exercises", "success": True, "exercises": ["Планка", "Приседания"]}
+
+class TestResponseCache:
+    """Тесты ResponseCache."""
+
+    def test_hit_splices_request_id(self, tmp_path):
+        """Повторный запрос получает те же байты, id запроса дописывается в них."""
+        cache = ResponseCache(FakeDatabase(), str(tmp_path / "plans.json"))
+        assert cache.lookup(EXERCISES_REQUEST, JsonCodec) is None
+        payload = cache.store(EXERCISES_REQUEST, EXERCISES_RESPONSE, JsonCodec)
+        assert payload == json.dumps(EXERCISES_RESPONSE).encode("utf-8")
+
+        assert cache.lookup(EXERCISES_REQUEST, JsonCodec) == payload
+        request = dict(EXERCISES_REQUEST, id=7)
+        assert json.loads(cache.lookup(request, JsonCodec)) == dict(EXERCISES_RESPONSE, id=7)
+        # Другая кодировка - другой ключ
+        assert cache.lookup(request, CompactCodec) is None
+        assert cache.stats()["hits"] == 2
+
+    def test_failures_and_other_actions_not_cached(self, tmp_path):
+        """Ошибки и изменяющие данные действия в кэш не попадают."""
+        cache = ResponseCache(FakeDatabase(), str(tmp_path / "plans.json"))
+        failure = {"action": "exercises", "success": False, "message": "Неверный уровень"}
+        assert cache.store(EXERCISES_REQUEST, failure, JsonCodec) is not None
+        assert cache.lookup(EXERCISES_REQUEST, JsonCodec) is None
+        assert cache.store({"action": "track_progress"}, {"success": True}, JsonCodec) is None
+        assert cache.lookup({"action": ["get_exercises"]}, JsonCodec) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_invalidated_when_sources_change(self, tmp_path, monkeypatch):
+        """Новый файл планов питания или новый каталог сбрасывают кэш."""
+        monkeypatch.setattr(response_cache, "CHECK_INTERVAL", 0)
+        plans = tmp_path / "plans.json"
+        plans.write_text("{}", encoding="utf-8")
+        db_manager = FakeDatabase()
+        cache = ResponseCache(db_manager, str(plans))
+        request = {"action": "get_nutrition_plan", "goal": "Похудение"}
+
+        cache.store(request, {"action": "nutrition_plan", "success": True, "plan": {}}, JsonCodec)
+        assert cache.lookup(request, JsonCodec) is not None
+        os.utime(plans, ns=(0, 10 ** 9))
+        assert cache.lookup(request, JsonCodec) is None
+
+        cache.store(request, {"action": "nutrition_plan", "success": True, "plan": {}}, JsonCodec)
+        db_manager.exercises = {}
+        assert cache.lookup(request, JsonCodec) is None
+        assert cache.stats()["invalidations"] == 2
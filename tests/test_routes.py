@@ -0,0 +1,252 @@
+"""
+Тесты обработчиков routes.py на временной SQLite базе.
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import event
+
+import routes
+from models import DatabaseManager, Progress, SavedPlan, WorkoutHistory
+
+@pytest.fixture
+def db_manager(temp_db_path):
+    """DatabaseManager на временном файле с одним пользователем."""
+    manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+    routes.handle_register(manager, "anna", "secret", "+375291112233", "1995-05-05")
+    yield manager
+    manager.engine.dispose()
+
+class TestBatch:
+    """Тесты действия batch."""
+
+    def test_track_progress_batch(self, db_manager):
+        """Пакет track_progress сохраняет все упражнения и возвращает ответы по порядку."""
+        response = routes.process_request({
+            "action": "batch",
+            "requests": [
+                {"action": "track_progress", "username": "anna", "exercise": "Планка", "id": 1},
+                {"action": "track_progress", "username": "anna", "exercise": "Выпады", "id": 2},
+                {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"},
+            ]
+        }, db_manager)
+
+        assert response["success"] is True
+        results = response["results"]
+        assert [r["action"] for r in results] == ["progress", "progress", "exercises"]
+        assert [r.get("id") for r in results] == [1, 2, None]
+
+        session = db_manager.Session()
+        try:
+            names = sorted(p.exercise_name for p in session.query(Progress).all())
+        finally:
+            session.close()
+        assert names == ["Выпады", "Планка"]
+
+    def test_unknown_user_in_batch(self, db_manager):
+        """Неизвестный пользователь дает ошибку на каждый элемент, а не на весь пакет."""
+        stats = routes.ACTIONS["track_progress"].metrics
+        before = stats.snapshot()
+        response = routes.process_request({
+            "action": "batch",
+            "requests": [
+                {"action": "track_progress", "username": "nobody", "exercise": "Планка"},
+                {"action": "track_progress", "username": "anna", "exercise": "Планка"},
+            ]
+        }, db_manager)
+        assert [r["success"] for r in response["results"]] == [False, True]
+        # Сгруппированные элементы учитываются в показателях track_progress
+        after = stats.snapshot()
+        assert after["count"] == before["count"] + 2
+        assert after["failures"] == before["failures"] + 1
+
+    def test_invalid_batch(self, db_manager):
+        """Не список, слишком длинный пакет и вложенный batch отклоняются."""
+        assert routes.process_request({"action": "batch", "requests": "x"}, db_manager)["success"] is False
+
+        too_many = [{"action": "get_exercises"}] * (routes.MAX_BATCH_SIZE + 1)
+        assert routes.process_request({"action": "batch", "requests": too_many}, db_manager)["success"] is False
+
+        nested = routes.process_request({"action": "batch", "requests": [{"action": "batch"}]}, db_manager)
+        assert "error" in nested["results"][0]
+
+class TestActionRegistry:
+    """Тесты реестра действий routes.ACTIONS."""
+
+    def test_all_actions_registered(self):
+        """Все действия протокола доступны через один реестр."""
+        assert {"login", "register", "get_exercises", "track_progress", "save_workout_history",
+                "get_workout_history", "get_user_plans", "get_nutrition_plan", "load_existing_plan",
+                "save_plan", "save_plan_with_history", "get_progress_history", "batch"} <= set(routes.ACTIONS)
+        assert routes.ACTIONS["save_plan"].kind == "write"
+        assert routes.ACTIONS["get_user_plans"].kind == "read"
+
+    def test_params_passed_in_order(self, db_manager):
+        """Поля запроса передаются обработчику по объявленным параметрам."""
+        response = routes.process_request({
+            "action": "get_exercises", "goal": "Похудение", "condition": "Дом", "level": "Новичок"
+        }, db_manager)
+        assert response["success"] is True
+
+        routes.process_request({"action": "track_progress", "username": "anna", "exercise": "Планка"}, db_manager)
+        progress = routes.process_request({"action": "get_progress_history", "username": "anna"}, db_manager)
+        assert [p["exercise_name"] for p in progress["progress"]] == ["Планка"]
+
+    def test_classify_request(self):
+        """Класс, пользователь и стоимость запроса для ограничения частоты."""
+        assert routes.classify_request({"action": "get_user_plans", "username": "anna"}) == ("read", "anna", 1)
+        # server_stats без лимита только с верным токеном администратора
+        assert routes.classify_request({"action": "server_stats"})[0] == "read"
+        batch = {"action": "batch", "requests": [
+            {"action": "get_exercises"},
+            {"action": "track_progress", "username": "anna", "exercise": "Планка"},
+        ]}
+        assert routes.classify_request(batch) == ("write", "anna", 2)
+        assert routes.classify_request({"action": "batch", "requests": 5}) == ("write", None, 1)
+
+    def test_admin_token(self, db_manager, monkeypatch):
+        """Верный токен снимает лимит и открывает server_stats, неверный - нет."""
+        monkeypatch.setenv(routes.ADMIN_TOKEN_ENV, "s3cret")
+        assert routes.classify_request({"action": "server_stats", "token": "s3cret"})[0] == "admin"
+        assert routes.classify_request({"action": "server_stats", "token": "пароль"})[0] == "read"
+        assert routes.classify_request({"action": "server_stats", "token": ["s3cret"]})[0] == "read"
+        denied = routes.process_request({"action": "server_stats", "token": "wrong"}, db_manager)
+        assert denied["success"] is False
+        assert routes.process_request({"action": "server_stats", "token": "s3cret"}, db_manager)["success"]
+
+    def test_unknown_action(self, db_manager):
+        """Неизвестное действие дает ошибку, а не исключение."""
+        assert routes.process_request({"action": "fly"}, db_manager) == {"error": "Unknown action", "action": "fly"}
+
+    def test_unhashable_action(self, db_manager):
+        """action-список тоже неизвестное действие: ни TypeError, ни закрытого соединения."""
+        request = {"action": ["x"], "username": "anna"}
+        assert routes.process_request(request, db_manager) == {"error": "Unknown action", "action": ["x"]}
+        assert routes.classify_request(request) == ("read", "anna", 1)
+        batch = {"action": "batch", "requests": [{"action": {"a": 1}}, {"action": "get_exercises"}]}
+        assert routes.classify_request(batch) == ("read", None, 2)
+
+    def test_metrics_recorded(self, db_manager):
+        """Вызовы, неуспешные ответы и исключения учитываются по действию."""
+        stats = routes.ACTIONS["login"].metrics
+        before = stats.snapshot()
+        routes.process_request({"action": "login", "username": "anna", "password": "secret"}, db_manager)
+        routes.process_request({"action": "login", "username": "anna", "password": "wrong"}, db_manager)
+        after = stats.snapshot()
+        assert after["count"] == before["count"] + 2
+        assert after["failures"] == before["failures"] + 1
+
+        @routes.action("test_broken", "username")
+        def handle_broken(db_manager, username):
+            raise RuntimeError(username)
+        try:
+            with pytest.raises(RuntimeError):
+                routes.process_request({"action": "test_broken", "username": "anna"}, db_manager)
+            assert routes.ACTIONS["test_broken"].metrics.errors == 1
+        finally:
+            del routes.ACTIONS["test_broken"]
+
+class TestUnitOfWork:
+    """Одна сессия и один commit на запрос."""
+
+    @staticmethod
+    def count_events(db_manager):
+        counts = {"checkout": 0, "commit": 0}
+        event.listen(db_manager.engine, "checkout", lambda *a: counts.__setitem__("checkout", counts["checkout"] + 1))
+        event.listen(db_manager.engine, "commit", lambda *a: counts.__setitem__("commit", counts["commit"] + 1))
+        return counts
+
+    def test_one_checkout_and_commit_per_write(self, db_manager):
+        """Составное действие берет одно соединение из пула и делает один commit."""
+        counts = self.count_events(db_manager)
+        response = routes.handle_save_plan_with_history(
+            db_manager, "anna", "План", "Новичок", "Похудение", "Дом", ["Планка"])
+        assert response["success"] is True
+        assert counts == {"checkout": 1, "commit": 1}
+
+        response = routes.handle_save_workout_history(db_manager, "anna", "Тренировка", ["Планка"], 30)
+        assert response["success"] is True
+        assert counts == {"checkout": 2, "commit": 2}
+
+    def test_failed_write_rolls_back_everything(self, db_manager, monkeypatch):
+        """Ошибка второй записи отменяет и первую; соединение возвращается в пул."""
+        def broken(*args, **kwargs):
+            raise RuntimeError("disk full")
+        monkeypatch.setattr(db_manager, "save_workout_history", broken)
+
+        response = routes.handle_save_plan_with_history(
+            db_manager, "anna", "План", "Новичок", "Похудение", "Дом", ["Планка"])
+        assert response["success"] is False
+        assert "disk full" in response["message"]
+
+        session = db_manager.Session()
+        try:
+            assert session.query(SavedPlan).count() == 0
+            assert session.query(WorkoutHistory).count() == 0
+        finally:
+            session.close()
+        assert db_manager.pool_stats()["checked_out"] == 0
+
+class TestPagination:
+    """Постраничная выдача истории, планов и прогресса (keyset по времени и id)."""
+
+    @staticmethod
+    def fill_history(db_manager, count):
+        """count записей истории, у трех подряд одинаковое время."""
+        from datetime import datetime, timedelta
+        user_id = db_manager.get_user_id("anna")
+        started = datetime(2024, 1, 1)
+        with db_manager.unit_of_work() as session:
+            session.add_all([WorkoutHistory(user_id=user_id, workout_name=f"Тренировка {n}", exercises="[]",
+                                            duration=30, completed_at=started + timedelta(hours=n // 3))
+                             for n in range(count)])
+
+    def test_pages_cover_history_once(self, db_manager):
+        """Страницы по курсору дают ту же историю, что и полный список, без повторов и пропусков."""
+        self.fill_history(db_manager, 11)
+        full = routes.handle_get_workout_history(db_manager, "anna")
+        assert "next_cursor" not in full
+
+        names, cursor = [], None
+        for _ in range(10):
+            page = routes.handle_get_workout_history(db_manager, "anna", limit=4, cursor=cursor)
+            assert page["success"] is True
+            assert len(page["history"]) <= 4
+            names.extend(record["workout_name"] for record in page["history"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert names == [record["workout_name"] for record in full["history"]]
+        assert len(set(names)) == 11
+
+    def test_progress_and_plans_pages(self, db_manager):
+        """Прогресс и планы отдаются страницами через process_request."""
+        for name in ("Планка", "Выпады", "Скручивания"):
+            routes.handle_track_progress(db_manager, "anna", name)
+            routes.handle_save_plan(db_manager, "anna", name, "Новичок", "Похудение", "Дом", [name])
+
+        first = routes.process_request({"action": "get_progress_history", "username": "anna", "limit": 2}, db_manager)
+        assert [p["exercise_name"] for p in first["progress"]] == ["Скручивания", "Выпады"]
+        rest = routes.process_request({"action": "get_progress_history", "username": "anna", "limit": 2,
+                                       "cursor": first["next_cursor"]}, db_manager)
+        assert [p["exercise_name"] for p in rest["progress"]] == ["Планка"]
+        assert rest["next_cursor"] is None
+
+        plans = routes.process_request({"action": "get_user_plans", "username": "anna", "limit": 5}, db_manager)
+        assert [p["name"] for p in plans["plans"]] == ["Скручивания", "Выпады", "Планка"]
+        assert plans["next_cursor"] is None
+
+    def test_invalid_page_args(self, db_manager):
+        """Чужой курсор и некорректный limit дают ошибку, а не исключение."""
+        for limit, cursor in ((0, None), ("10", None), (True, None), (5, "not a cursor"), (5, "x" * 500)):
+            response = routes.handle_get_workout_history(db_manager, "anna", limit=limit, cursor=cursor)
+            assert response["success"] is False
+        # Слишком большой limit уменьшается до MAX_PAGE_SIZE
+        assert routes.handle_get_user_plans(db_manager, "anna", limit=10 ** 6)["success"] is True
+
@@ -0,0 +1,413 @@
+"""
+Тесты движков сервера (threaded и asyncio) на реальных сокетах.
+"""
+import sys
+import os
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+pytest.importorskip("sqlalchemy")
+
+from config import ServerConfig
+from server import ClientConnection, run_server
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _connect(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection(("127.0.0.1", port), timeout=5)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def _read_line(sock):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data)
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        assert chunk
+        data += chunk
+    return data
+
+def _start(config):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=run_server, args=(stop_event, print, config), daemon=True)
+    thread.start()
+    return stop_event, thread
+
+@pytest.fixture(params=["threaded", "asyncio"])
+def running_server(request, tmp_path, monkeypatch):
+    """Запускает сервер выбранного движка во временном каталоге."""
+    monkeypatch.chdir(tmp_path)
+    config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=request.param, executor_workers=4)
+    stop_event, thread = _start(config)
+    yield config
+    stop_event.set()
+    thread.join(timeout=10)
+
+@pytest.fixture(params=["threaded", "asyncio"])
+def pipelined_server(request, tmp_path, monkeypatch):
+    """Сервер в режиме pipelining."""
+    monkeypatch.chdir(tmp_path)
+    config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=request.param,
+                          executor_workers=4, pipelining=True, max_inflight=8)
+    stop_event, thread = _start(config)
+    yield config
+    stop_event.set()
+    thread.join(timeout=10)
+
+@pytest.fixture(params=["threaded", "asyncio"])
+def limited_server(request, tmp_path, monkeypatch):
+    """Сервер с лимитом в одно соединение и коротким таймаутом простоя."""
+    monkeypatch.chdir(tmp_path)
+    config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=request.param,
+                          executor_workers=2, max_connections=1, idle_timeout=0.5)
+    stop_event, thread = _start(config)
+    yield config
+    stop_event.set()
+    thread.join(timeout=10)
+
+def _read_lines(sock, count):
+    data = b""
+    while data.count(b"\n") < count:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return [json.loads(line) for line in data.split(b"\n") if line]
+
+class TestServerEngines:
+    """Оба движка должны одинаково обслуживать протокол JSON-строк."""
+
+    def test_register_and_login(self, running_server):
+        """Регистрация и вход через сокет."""
+        sock = _connect(running_server.port)
+        try:
+            sock.sendall(json.dumps({"action": "register", "username": "ivan", "password": "pw",
+                                     "phone": "+375291234567", "dob": "1990-01-01"}).encode("utf-8") + b"\n")
+            assert _read_line(sock)["success"] is True
+
+            sock.sendall(json.dumps({"action": "login", "username": "ivan", "password": "pw"}).encode("utf-8") + b"\n")
+            response = _read_line(sock)
+            assert response["action"] == "auth"
+            assert response["success"] is True
+        finally:
+            sock.close()
+
+    def test_cyrillic_exercises(self, running_server):
+        """Кириллические упражнения проходят через сокет без искажений."""
+        sock = _connect(running_server.port)
+        try:
+            request = {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"}
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            response = _read_line(sock)
+            assert response["success"] is True
+            assert response["exercises"][0].startswith("🔥 РАЗМИНКА")
+        finally:
+            sock.close()
+
+    def test_cached_exercises(self, running_server):
+        """Повторный запрос каталога отвечается из кэша готовых ответов с id своего запроса."""
+        sock = _connect(running_server.port)
+        try:
+            request = {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"}
+            responses = []
+            for request_id in (1, 2):
+                sock.sendall(json.dumps(dict(request, id=request_id)).encode("utf-8") + b"\n")
+                responses.append(_read_line(sock))
+            assert responses[1] == dict(responses[0], id=2)
+
+            sock.sendall(json.dumps({"action": "server_stats"}).encode("utf-8") + b"\n")
+            stats = _read_line(sock)["stats"]
+            assert stats["response_cache"]["hits"] == 1
+            assert stats["actions"]["get_exercises"]["count"] >= 2
+        finally:
+            sock.close()
+
+    def test_invalid_json(self, running_server):
+        """Некорректный JSON не рвет соединение."""
+        sock = _connect(running_server.port)
+        try:
+            sock.sendall(b"{not json}\n")
+            assert _read_line(sock) == {"error": "Invalid JSON"}
+        finally:
+            sock.close()
+
+    def test_request_id_echoed(self, running_server):
+        """id запроса возвращается в ответе."""
+        sock = _connect(running_server.port)
+        try:
+            sock.sendall(json.dumps({"action": "get_nutrition_plan", "goal": "?", "id": "req-7"}).encode("utf-8") + b"\n")
+            assert _read_line(sock)["id"] == "req-7"
+        finally:
+            sock.close()
+
+    def test_server_stats(self, running_server):
+        """server_stats видит открытое соединение и статистику пула."""
+        sock = _connect(running_server.port)
+        try:
+            sock.sendall(json.dumps({"action": "server_stats"}).encode("utf-8") + b"\n")
+            stats = _read_line(sock)["stats"]
+            assert stats["gauges"]["connections"] >= 1
+            assert stats["pool"]["workers"] == 4
+            assert "server_stats" in stats["actions"]
+        finally:
+            sock.close()
+
+    def test_binary_handshake(self, running_server):
+        """После hello соединение переходит на кадры с длиной и компактную кодировку."""
+        import compact
+        from framing import LengthPrefixDecoder, encode_length_prefixed
+
+        sock = _connect(running_server.port)
+        try:
+            sock.sendall(json.dumps({"action": "hello", "framing": "length", "encoding": "compact"}).encode("utf-8") + b"\n")
+            assert _read_line(sock)["success"] is True
+
+            request = {"action": "get_exercises", "level": "Средний", "goal": "Набор мышц", "condition": "Зал", "id": 5}
+            sock.sendall(encode_length_prefixed(compact.encode(request)))
+            decoder = LengthPrefixDecoder()
+            frame = None
+            while frame is None:
+                assert decoder.recv_from(sock)
+                frame = decoder.next_frame()
+            response = compact.decode(frame)
+            assert response["id"] == 5
+            assert response["exercises"][1].startswith("⚡ ОСНОВНАЯ ТРЕНИРОВКА")
+        finally:
+            sock.close()
+
+    def test_compressed_responses(self, running_server):
+        """С согласованным zlib ответы приходят сжатыми одним потоком на соединение."""
+        import zlib
+        from framing import COMPRESSED_FLAG, encode_length_prefixed
+
+        running_server.compress_threshold = 0
+        sock = _connect(running_server.port)
+        try:
+            hello = {"action": "hello", "framing": "length", "encoding": "json", "compression": "zlib"}
+            sock.sendall(json.dumps(hello).encode("utf-8") + b"\n")
+            assert _read_line(sock)["compression"] == "zlib"
+
+            inflate = zlib.decompressobj()
+            for request_id in (1, 2):
+                request = {"action": "get_exercises", "level": "Новичок", "goal": "Похудение",
+                           "condition": "Дом", "id": request_id}
+                sock.sendall(encode_length_prefixed(json.dumps(request).encode("utf-8")))
+                header = int.from_bytes(_recv_exact(sock, 4), "big")
+                assert header & COMPRESSED_FLAG
+                body = _recv_exact(sock, header & ~COMPRESSED_FLAG)
+                assert json.loads(inflate.decompress(body))["id"] == request_id
+        finally:
+            sock.close()
+
+class TestPipelining:
+    """Параллельные запросы в одном соединении."""
+
+    def test_all_ids_answered(self, pipelined_server):
+        """Все запросы с id получают ответы, запрос без id отвечает последним."""
+        sock = _connect(pipelined_server.port)
+        try:
+            payload = b"".join(
+                json.dumps({"action": "get_exercises", "level": "Новичок", "goal": "Похудение",
+                            "condition": "Зал", "id": i}).encode("utf-8") + b"\n"
+                for i in range(20)
+            )
+            payload += json.dumps({"action": "unknown_action"}).encode("utf-8") + b"\n"
+            sock.sendall(payload)
+
+            responses = _read_lines(sock, 21)
+            assert sorted(r["id"] for r in responses[:-1]) == list(range(20))
+            assert all(r["success"] for r in responses[:-1])
+            assert responses[-1] == {"error": "Unknown action", "action": "unknown_action"}
+        finally:
+            sock.close()
+
+    def test_handler_error_answered(self, pipelined_server):
+        """Упавший обработчик не оставляет запрос без ответа: приходит ошибка с его id."""
+        sock = _connect(pipelined_server.port)
+        try:
+            payload = (json.dumps({"action": "track_progress", "username": ["x"], "exercise": "Планка",
+                                   "id": 1}).encode("utf-8") + b"\n"
+                       + json.dumps({"action": "unknown_action", "id": 2}).encode("utf-8") + b"\n")
+            sock.sendall(payload)
+
+            responses = {r["id"]: r for r in _read_lines(sock, 2)}
+            assert responses[1]["status"] == "error"
+            assert responses[1]["success"] is False
+            assert responses[2]["error"] == "Unknown action"
+        finally:
+            sock.close()
+
+class TestSendTimeout:
+    """Клиент, переставший читать ответы, не держит поток отправки."""
+
+    @pytest.mark.skipif(not hasattr(socket, "MSG_DONTWAIT"), reason="Нужен MSG_DONTWAIT")
+    def test_stalled_reader_disconnected(self):
+        """Отправка в непрочитываемый сокет прерывается по таймауту, соединение закрывается."""
+        server_sock, client_sock = socket.socketpair()
+        try:
+            client = ClientConnection(server_sock, "test")
+            started = time.monotonic()
+            with pytest.raises(TimeoutError):
+                client._sendall(b"x" * (16 * 1024 * 1024), timeout=0.3)
+            assert time.monotonic() - started < 3
+            with pytest.raises(ConnectionError):
+                client.send({"action": "progress", "success": True})
+        finally:
+            server_sock.close()
+            client_sock.close()
+
+class TestConnectionLimits:
+    """Лимит соединений и закрытие простаивающих."""
+
+    def test_server_full_and_idle_reaping(self, limited_server):
+        """Второе соединение получает server_full; простаивающее первое закрывается сервером."""
+        first = _connect(limited_server.port)
+        try:
+            first.sendall(json.dumps({"action": "get_nutrition_plan", "goal": "x"}).encode("utf-8") + b"\n")
+            _read_line(first)
+
+            second = _connect(limited_server.port)
+            try:
+                response = _read_line(second)
+                assert response["action"] == "server_full"
+                assert response["retry_after_ms"] > 0
+            finally:
+                second.close()
+
+            # Простой дольше idle_timeout - сервер закрывает соединение
+            first.settimeout(10)
+            assert first.recv(1) == b""
+        finally:
+            first.close()
+
+        # Место освобождается, когда поток (задача) соединения завершится
+        deadline = time.monotonic() + 5
+        while True:
+            third = _connect(limited_server.port)
+            try:
+                third.sendall(json.dumps({"action": "server_stats"}).encode("utf-8") + b"\n")
+                response = _read_line(third)
+            finally:
+                third.close()
+            if response.get("action") != "server_full" or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        stats = response["stats"]["connections"]
+        assert stats["reaped"] >= 1
+        assert stats["rejected"] >= 1
+
+class TestTrafficCapture:
+    """Запись запросов --capture-file."""
+
+    @pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+    def test_capture_file(self, engine, tmp_path, monkeypatch):
+        """Запросы соединения записываются по порядку, hello не записывается."""
+        monkeypatch.chdir(tmp_path)
+        config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=engine, executor_workers=2,
+                              capture_file=str(tmp_path / "capture.jsonl"))
+        stop_event, thread = _start(config)
+        sock = _connect(config.port)
+        try:
+            for request in ({"action": "hello", "framing": "newline"},
+                            {"action": "login", "username": "anna", "password": "secret"},
+                            {"action": "get_exercises", "level": "Новичок", "goal": "Похудение", "condition": "Дом"}):
+                sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                _read_line(sock)
+        finally:
+            sock.close()
+            stop_event.set()
+            thread.join(timeout=10)
+
+        with open(tmp_path / "capture.jsonl", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["request"]["action"] for r in records] == ["login", "get_exercises"]
+        assert records[0]["request"]["password"] == "***"
+        assert records[0]["conn"] == records[1]["conn"]
+
+class TestRateLimits:
+    """Ограничение частоты запросов записи."""
+
+    @pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+    def test_write_rate_limited(self, engine, tmp_path, monkeypatch):
+        """Сверх лимита записи приходит rate_limited с id запроса, чтение при этом работает."""
+        monkeypatch.chdir(tmp_path)
+        config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=engine, executor_workers=2,
+                              write_rate=0.01, rate_burst_seconds=200)
+        stop_event, thread = _start(config)
+        sock = _connect(config.port)
+        try:
+            for request_id in (1, 2, 3):
+                request = {"action": "track_progress", "username": "anna", "exercise": "Планка", "id": request_id}
+                sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                response = _read_line(sock)
+            assert response["action"] == "rate_limited"
+            assert response["id"] == 3
+            assert response["retry_after_ms"] > 0
+
+            sock.sendall(json.dumps({"action": "server_stats"}).encode("utf-8") + b"\n")
+            assert _read_line(sock)["stats"]["rate_limits"]["throttled"] == {"connection.write": 1}
+        finally:
+            sock.close()
+            stop_event.set()
+            thread.join(timeout=10)
+
+class TestGracefulDrain:
+    """Плавная остановка сервера."""
+
+    @pytest.fixture
+    def slow_action(self):
+        """Временное действие, которое выполняется заметное время."""
+        import routes
+
+        @routes.action("test_slow", "seconds", kind="write")
+        def handle_slow(db_manager, seconds):
+            time.sleep(seconds)
+            return {"action": "test_slow", "success": True}
+        yield "test_slow"
+        del routes.ACTIONS["test_slow"]
+
+    @pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+    def test_inflight_request_finishes(self, engine, slow_action, tmp_path, monkeypatch):
+        """Клиент получает server_shutdown и ответ на запрос, который выполнялся при остановке."""
+        monkeypatch.chdir(tmp_path)
+        config = ServerConfig(host="127.0.0.1", port=_free_port(), engine=engine,
+                              executor_workers=2, drain_timeout=5, reconnect_jitter_ms=1000)
+        stop_event, thread = _start(config)
+        sock = _connect(config.port)
+        try:
+            sock.sendall(json.dumps({"action": slow_action, "seconds": 0.5, "id": 1}).encode("utf-8") + b"\n")
+            time.sleep(0.1)
+            stop_event.set()
+
+            responses = {r["action"]: r for r in _read_lines(sock, 2)}
+            assert responses[slow_action]["success"] is True
+            assert 100 <= responses["server_shutdown"]["retry_after_ms"] <= 1000
+            # После ответов сервер закрывает соединение
+            sock.settimeout(10)
+            assert sock.recv(1) == b""
+        finally:
+            sock.close()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
@@ -0,0 +1,71 @@
+"""
+Тесты асинхронного журнала сервера.
+"""
+import sys
+import os
+import io
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from server_log import AsyncLogger, DEBUG, INFO, WARNING, redact
+
+class TestAsyncLogger:
+    """Тесты AsyncLogger."""
+
+    def test_records_written_in_background(self):
+        """Записи форматируются фоновым потоком и появляются после flush."""
+        stream = io.StringIO()
+        logger = AsyncLogger(stream=stream)
+        logger.info("Подключен", addr=("127.0.0.1", 5000))
+        logger.flush()
+        line = stream.getvalue()
+        assert "INFO Подключен addr=('127.0.0.1', 5000)" in line
+        assert line.startswith("[SERVER]")
+
+    def test_password_redacted(self):
+        """Пароль, телефон и токен не попадают в журнал, в том числе внутри batch."""
+        stream = io.StringIO()
+        logger = AsyncLogger(stream=stream)
+        request = {"action": "batch", "requests": [{"action": "login", "username": "anna", "password": "secret"}],
+                   "phone": "+375291112233"}
+        logger.info("Получен запрос", request=request)
+        logger.flush()
+        assert "secret" not in stream.getvalue()
+        assert "+375291112233" not in stream.getvalue()
+        assert "anna" in stream.getvalue()
+        # Исходный запрос не меняется
+        assert request["requests"][0]["password"] == "secret"
+        assert redact({"password": "x"}) == {"password": "***"}
+        assert redact({"action": "server_stats", "token": "admin-secret"})["token"] == "***"
+
+    def test_level_and_sampling(self):
+        """Записи ниже уровня и не попавшие в выборку не ставятся в очередь."""
+        stream = io.StringIO()
+        logger = AsyncLogger(level=INFO, sample_rate=0.0, stream=stream)
+        logger.log(DEBUG, "отладка")
+        logger.info("запрос", sampled=True)
+        logger.log(WARNING, "важное", sampled=False)
+        logger.flush()
+        assert stream.getvalue().count("\n") == 1
+        assert "важное" in stream.getvalue()
+
+    def test_full_queue_drops(self):
+        """Переполненная очередь не блокирует вызывающего, потери считаются."""
+        gate = threading.Event()
+        logger = AsyncLogger(queue_size=2, stream=io.StringIO())
+        logger.defer(gate.wait)
+        for i in range(50):
+            logger.info("запрос", n=i)
+        assert logger.dropped > 0
+        gate.set()
+        logger.flush()
+        assert "записи пропущены" in logger.stream.getvalue()
+
+    def test_defer_runs_in_logger_thread(self):
+        """defer выполняет функцию в потоке журнала."""
+        seen = []
+        logger = AsyncLogger(stream=io.StringIO())
+        logger.defer(lambda: seen.append(threading.current_thread().name))
+        logger.flush()
+        assert seen == ["server-log"]
@@ -0,0 +1,67 @@
+"""
+Тесты перезапуска воркеров WorkerSupervisor без настоящих fork().
+"""
+import sys
+import os
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+pytest.importorskip("sqlalchemy")
+
+import supervisor
+from config import ServerConfig
+
+@pytest.fixture
+def sup(monkeypatch):
+    """Супервизор с двумя "воркерами"; _spawn только запоминает, кого запустили."""
+    if not hasattr(os, "fork"):
+        pytest.skip("Нужен os.fork()")
+    result = supervisor.WorkerSupervisor(ServerConfig(), 2, print)
+    result.spawned = []
+    monkeypatch.setattr(result, "_spawn", result.spawned.append)
+    result.children = {101: 0, 102: 1}
+    result.started_at = {0: time.monotonic(), 1: time.monotonic()}
+    return result
+
+def _exits(monkeypatch, pids):
+    """os.waitpid, возвращающий завершения pids по одному, затем "никого"."""
+    pending = list(pids)
+    monkeypatch.setattr(supervisor.os, "waitpid",
+                        lambda pid, options: (pending.pop(0), 256) if pending else (0, 0))
+
+class TestRestart:
+    """Пауза перед перезапуском не блокирует сбор остальных воркеров."""
+
+    def test_reap_does_not_sleep(self, sup, monkeypatch):
+        """Оба упавших воркера собраны сразу, каждый ждет свою паузу."""
+        sup.restart_delay = {0: supervisor.MAX_RESTART_DELAY, 1: 0.5}
+        _exits(monkeypatch, [101, 102])
+
+        started = time.monotonic()
+        sup._reap()
+        assert time.monotonic() - started < 0.5
+        assert sup.children == {}
+        assert sorted(sup.restart_at) == [0, 1]
+        assert sup.restart_at[0] - sup.restart_at[1] > 20
+        assert sup.restart_delay[1] == 1.0
+
+        sup._restart_due()
+        assert sup.spawned == []
+        assert sup._sleep_interval() <= 0.5
+
+        sup.restart_at[1] = time.monotonic() - 0.01
+        sup._restart_due()
+        assert sup.spawned == [1]
+        assert list(sup.restart_at) == [0]
+
+    def test_no_restart_when_stopping(self, sup, monkeypatch):
+        """После SIGTERM отложенный перезапуск не выполняется."""
+        _exits(monkeypatch, [101])
+        sup._reap()
+        sup.restart_at[0] = time.monotonic() - 0.01
+        sup.stopping = True
+        sup._restart_due()
+        assert sup.spawned == []
@@ -0,0 +1,120 @@
+"""
+Тесты кэша username -> id (server/user_cache.py) и его сброса в DatabaseManager.
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from user_cache import UserIdCache
+
+class TestUserIdCache:
+    """Тесты самого кэша."""
+
+    def test_lru_eviction(self):
+        """Сверх лимита вытесняется давно не использованное имя."""
+        cache = UserIdCache(max_entries=2)
+        cache.put("anna", 1)
+        cache.put("boris", 2)
+        assert cache.get("anna")[:2] == (True, 1)
+        cache.put("vera", 3)
+        assert cache.get("boris")[0] is False
+        assert cache.get("anna")[:2] == (True, 1)
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 1
+        assert stats["hit_rate"] == round(2 / 3, 4)
+
+    def test_negative_entries_expire(self):
+        """"Пользователя нет" помнится только negative_ttl секунд."""
+        cache = UserIdCache(negative_ttl=0.01)
+        cache.put("ghost", None)
+        assert cache.get("ghost")[:2] == (True, None)
+        time.sleep(0.02)
+        assert cache.get("ghost")[0] is False
+
+    def test_stale_put_after_invalidate(self):
+        """Ответ запроса, начатого до сброса, в кэш не попадает."""
+        cache = UserIdCache()
+        found, _, generation = cache.get("anna")
+        assert found is False
+        cache.invalidate(["anna"])
+        cache.put("anna", None, generation)
+        assert cache.get("anna")[0] is False
+
+    def test_concurrent_access(self):
+        """Параллельные get/put/invalidate из многих потоков не ломают кэш."""
+        cache = UserIdCache(max_entries=50)
+
+        def worker(n):
+            for i in range(2000):
+                name = f"user-{(n * 31 + i) % 100}"
+                if not cache.get(name)[0]:
+                    cache.put(name, i)
+                if i % 97 == 0:
+                    cache.invalidate([name])
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        assert stats["entries"] <= 50
+        assert stats["hits"] + stats["misses"] == 8 * 2000
+
+class TestDatabaseInvalidation:
+    """Сброс записей при изменении пользователей через DatabaseManager."""
+
+    @pytest.fixture
+    def db_manager(self, temp_db_path):
+        """DatabaseManager на временном файле с одним пользователем."""
+        pytest.importorskip("sqlalchemy")
+        import routes
+        from models import DatabaseManager
+        manager = DatabaseManager(f"sqlite:///{temp_db_path}")
+        routes.handle_register(manager, "anna", "secret", "+375291112233", "1995-05-05")
+        yield manager
+        manager.engine.dispose()
+
+    def test_repeated_lookup_hits_cache(self, db_manager):
+        """Второй поиск того же имени обходится без запроса к БД."""
+        user_id = db_manager.get_user_id("anna")
+        assert user_id is not None
+        assert db_manager.get_user_id("anna") == user_id
+        assert db_manager.user_ids.stats()["hits"] == 1
+
+    def test_registration_clears_negative_entry(self, db_manager):
+        """После регистрации имя сразу находится, хотя только что его не было."""
+        import routes
+        assert db_manager.get_user_id("boris") is None
+        routes.handle_register(db_manager, "boris", "secret", "+375291112233", "1990-01-01")
+        assert db_manager.get_user_id("boris") is not None
+
+    def test_rename_and_delete(self, db_manager):
+        """Переименование сбрасывает старое и новое имя, удаление - имя пользователя."""
+        from models import User
+        user_id = db_manager.get_user_id("anna")
+        with db_manager.unit_of_work() as session:
+            session.get(User, user_id).username = "anna2"
+        assert db_manager.get_user_id("anna") is None
+        assert db_manager.get_user_id("anna2") == user_id
+
+        with db_manager.unit_of_work() as session:
+            session.delete(session.get(User, user_id))
+        assert db_manager.get_user_id("anna2") is None
+
+    def test_rollback_drops_uncommitted_id(self, db_manager):
+        """id, увиденный только внутри откаченной транзакции, не остается в кэше."""
+        from models import User
+        with pytest.raises(RuntimeError):
+            with db_manager.unit_of_work() as session:
+                session.add(User(username="temp", password="pw"))
+                session.flush()
+                assert db_manager.get_user_id("temp", session) is not None
+                raise RuntimeError("abort")
+        assert db_manager.get_user_id("temp") is None
@@ -0,0 +1,65 @@
+"""
+Тесты пула обработчиков запросов с ограниченной очередью.
+"""
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
+
+from worker_pool import RequestWorkerPool, ServerBusy, busy_response
+
+class TestRequestWorkerPool:
+    """Тесты RequestWorkerPool."""
+
+    def test_submit_returns_result(self):
+        """Результат обработчика возвращается через Future."""
+        pool = RequestWorkerPool(workers=2, queue_size=4)
+        try:
+            assert pool.submit(lambda a, b: a + b, 2, 3).result(timeout=5) == 5
+        finally:
+            pool.shutdown()
+        assert pool.stats()["completed"] == 1
+
+    def test_exception_propagates(self):
+        """Исключение обработчика пробрасывается вызывающему."""
+        pool = RequestWorkerPool(workers=1, queue_size=1)
+        try:
+            future = pool.submit(lambda: 1 / 0)
+            with pytest.raises(ZeroDivisionError):
+                future.result(timeout=5)
+        finally:
+            pool.shutdown()
+
+    def test_full_queue_rejects(self):
+        """Переполненная очередь дает ServerBusy, а не новый поток."""
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        pool = RequestWorkerPool(workers=1, queue_size=1, retry_after_ms=150)
+        try:
+            pool.submit(blocker)
+            started.wait(5)
+            pool.submit(blocker)  # занимает единственное место в очереди
+
+            with pytest.raises(ServerBusy) as exc_info:
+                pool.submit(blocker)
+
+            stats = pool.stats()
+            assert stats["queue_depth"] == 1
+            assert stats["active"] == 1
+            assert stats["rejected"] == 1
+
+            response = busy_response(exc_info.value)
+            assert response["action"] == "busy"
+            assert response["success"] is False
+            assert response["retry_after_ms"] == 150
+        finally:
+            release.set()
+            pool.shutdown()